@@ -1,5 +1,8 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from typing import Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from fastapi.responses import StreamingResponse
+import json
+import asyncio
+from typing import Optional, Literal
 import shutil
 import uuid
 import os
@@ -9,53 +12,60 @@ router = APIRouter()
 
 class JobRequest(BaseModel):
     video_path: str
-    mode: str = "auto" # auto, manual, fixed
+    mode: Literal["auto", "manual", "merge"] = "auto"
     duration: int = 60
     captions: bool = False
     manual_start: Optional[str] = None
     manual_end: Optional[str] = None
-    manual_end: Optional[str] = None
     enhance_4k: bool = False
-    merge_segments: Optional[list[dict]] = None # List of {start: "00:00", end: "00:10"}
+    reframe: bool = False # crop to vertical 9:16, following motion (and faces with OpenCV installed)
+    # balanced is a two-stage scaler; skipped for sources already at 4k
+    upscale_quality: Literal["high", "balanced", "fast"] = "high"
+    merge_segments: Optional[list[dict]] = None # List of {start: "00:00", end: "00:10.5"}; times are [HH:]MM:SS[.mmm]
+    cut_mode: Literal["auto", "reencode", "copy", "smart", "defer"] = "auto"
+    render_mode: Literal["single_pass", "staged"] = "single_pass"
+    priority: int = 0 # higher runs first
+    highlight_clips: int = 0 # auto mode: keep only the N best-scoring clips (0 = every part)
+    scene_detection: bool = False # add ffmpeg scene-change scores to highlight scoring
+    caption_profile: Literal["standard", "fast"] = "standard" # fast: greedy decoding on a smaller model, for drafts
+    beam_size: Optional[int] = None # overrides the profile's beam size
+    vad: Optional[bool] = None # overrides the profile's voice-activity filtering
+    # adaptive: standard quality with the preset picked from measured speed
+    encoder_profile: Literal["draft", "standard", "archival", "4k", "adaptive"] = "standard"
 
 class UrlRequest(BaseModel):
     url: str
+    job: Optional[dict] = None # JobRequest options (minus video_path) to start once the download lands
+
+from core.jobstore import job_store
+from core.progress import ProgressHub
+from core.storage import storage
 
-jobs = {}
+progress_hub = ProgressHub(job_store)
 
-import yt_dlp
+from core.ingest import start_ingest
 
 @router.post("/process-url")
-async def process_url(req: UrlRequest):
-    try:
-        url = req.url
-        file_id = str(uuid.uuid4())
-        
-        ydl_opts = {
-            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-            'outtmpl': f'temp/uploads/{file_id}_%(title)s.%(ext)s',
-            'noplaylist': True,
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            filename = ydl.prepare_filename(info)
-            # Ensure we get the actual filename if it changed during download (e.g. sanitization)
-            # yt-dlp might sanitize characters differently. 
-            # A safer way relies on the output template but let's trust prepare_filename mostly.
-            # But the path needs to be relative to CWD if possible or absolute. 
-            # prepare_filename returns relative path if we set outtmpl relative.
-            
-            # Since sanitization happens, let's normalize. 
-            # However, we need to pass the path to the frontend so it can call /job.
-        
-        # We need the basename for display
-        final_filename = os.path.basename(filename)
-        
-        return {"id": file_id, "path": filename, "filename": final_filename}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def process_url(req: UrlRequest):
+    # Downloads run in the background; poll GET /job/{ingest_id} for progress and the
+    # resulting {id, path, filename}. With `job` set, a processing job is queued as soon
+    # as the file lands and its id shows up in the ingest record's job_ids.
+    on_complete = None
+    if req.job is not None:
+        try:
+            options = JobRequest(**{**req.job, "video_path": ""}).dict()
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+        def on_complete(ingest_id, result):
+            job_id = str(uuid.uuid4())
+            config = {**options, "video_path": result["path"], "filename": result["filename"]}
+            job_store.create(job_id, config, priority=options["priority"])
+            record = job_store[ingest_id]
+            record["job_ids"] = record.get("job_ids", []) + [job_id]
+
+    ingest_id = start_ingest(req.url, on_complete)
+    return {"ingest_id": ingest_id, "status": "ingesting"}
 
 @router.post("/upload")
 async def upload_video(file: UploadFile = File(...)):
@@ -64,12 +74,100 @@ async def upload_video(file: UploadFile = File(...)):
         file_path = f"temp/uploads/{file_id}_{file.filename}"
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
+        # New uploads may push usage over the quota; older finished jobs make room
+        storage.enforce_quota(job_store.active())
         return {"id": file_id, "path": file_path, "filename": file.filename}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-from core.processing import process_job
-from core.metadata import generate_viral_metadata
+from core.uploads import create_session, get_session, drop_session
+
+class UploadInitRequest(BaseModel):
+    filename: str
+    size: Optional[int] = None # total bytes, if known
+
+class UploadFinalizeRequest(BaseModel):
+    sha256: Optional[str] = None # whole-file checksum to verify against
+
+# Chunked, resumable uploads: init -> PUT chunks at the current offset -> finalize.
+# GET returns the committed offset so an interrupted client can resume from it.
+
+@router.post("/uploads")
+def init_upload(req: UploadInitRequest):
+    return create_session(req.filename, req.size).info()
+
+@router.get("/uploads/{upload_id}")
+def get_upload(upload_id: str):
+    session = get_session(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session.info()
+
+# Body bytes are collected up to this much before each write to disk
+UPLOAD_WRITE_BYTES = 1024 * 1024
+
+@router.put("/uploads/{upload_id}")
+async def append_upload(upload_id: str, request: Request, offset: int, checksum: Optional[str] = None):
+    # Body is the raw chunk bytes, streamed straight to disk (no multipart spooling). The
+    # body is read on the event loop; disk writes and hashing (including re-hashing the
+    # part file after a restart) run on worker threads so other requests keep flowing.
+    session = await asyncio.to_thread(get_session, upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if not session.lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="Another chunk is being written")
+    try:
+        try:
+            snapshot, chunk_hasher = await asyncio.to_thread(session.begin_chunk, offset)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        written = 0
+        try:
+            f = await asyncio.to_thread(open, session.part_path, "r+b")
+            try:
+                f.seek(offset)
+                buffer = bytearray()
+                async for data in request.stream():
+                    buffer += data
+                    if len(buffer) >= UPLOAD_WRITE_BYTES:
+                        await asyncio.to_thread(session.write, f, bytes(buffer), chunk_hasher)
+                        written += len(buffer)
+                        buffer.clear()
+                if buffer:
+                    await asyncio.to_thread(session.write, f, bytes(buffer), chunk_hasher)
+                    written += len(buffer)
+            finally:
+                await asyncio.to_thread(f.close)
+        except Exception:
+            await asyncio.to_thread(session.abort_chunk, snapshot)
+            raise
+        try:
+            await asyncio.to_thread(session.end_chunk, written, snapshot, chunk_hasher, checksum)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return session.info()
+    finally:
+        session.lock.release()
+
+@router.post("/uploads/{upload_id}/finalize")
+def finalize_upload(upload_id: str, req: UploadFinalizeRequest):
+    session = get_session(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    # Never rename or verify the part file while a chunk is still being written into it
+    if not session.lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A chunk is still being written")
+    try:
+        digest = session.finalize(req.sha256)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        session.lock.release()
+    drop_session(upload_id)
+    storage.enforce_quota(job_store.active())
+    return {"id": upload_id, "path": session.path, "filename": session.filename, "sha256": digest, "probe": session.probe}
+
+from core.metadata import metadata_service, srt_text
 
 class ShareRequest(BaseModel):
     clip_path: str
@@ -87,42 +185,125 @@ async def share_clip(req: ShareRequest):
                 "description": "Watch this video!",
                 "hashtags": "#shorts"
             }
-            
-        with open(srt_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            
-        # Basic SRT parsing to get just text
-        transcript_lines = []
-        for line in lines:
-            line = line.strip()
-            if not line: continue
-            if line.isdigit(): continue
-            if "-->" in line: continue
-            transcript_lines.append(line)
-            
-        transcript_text = " ".join(transcript_lines)
-
-        data = generate_viral_metadata(transcript_text)
-        return data
+
+        # File reading and the (cached, coalesced, rate-limited) model call block, so they
+        # run off the event loop; the model call on the metadata service's own threads, so
+        # requests waiting on its rate limit can't starve the default executor (SSE polls)
+        transcript_text = await asyncio.to_thread(srt_text, srt_path)
+        return await metadata_service.agenerate(transcript_text)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/metadata/stats")
+def metadata_stats():
+    return metadata_service.stats()
+
 @router.post("/job")
-async def create_job(job: JobRequest, background_tasks: BackgroundTasks):
+def create_job(job: JobRequest):
     job_id = str(uuid.uuid4())
     # We need to ensure we have the correct path. 
     # In endpoints, we are just receiving the path from the frontend (which got it from upload response).
     
-    # Store job
-    jobs[job_id] = {"status": "queued", "config": job.dict()}
-    
-    # Add background task
-    background_tasks.add_task(process_job, job_id, job.dict(), jobs)
+    # Queue the job; a worker (core/worker.py) leases and runs it
+    job_store.create(job_id, job.dict(), priority=job.priority)
     
     return {"job_id": job_id, "status": "queued"}
 
+class BatchSource(BaseModel):
+    video_path: str
+    filename: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    sources: list[BatchSource]
+    clips: list[dict] # JobRequest options (minus video_path); every spec runs on every source
+    priority: int = 0 # applies to every job of the batch
+
+from core.batch import plan_batch, batch_status
+from core.ffmpeg_utils import probe_media
+
+@router.post("/batch")
+def create_batch(req: BatchRequest):
+    # Queues sources x clips as ordinary jobs, grouped per source so transcripts and cached
+    # cuts are shared. Poll GET /batch/{batch_id} for aggregate progress.
+    if not req.sources or not req.clips:
+        raise HTTPException(status_code=422, detail="A batch needs at least one source and one clip spec")
+    try:
+        specs = [JobRequest(**{**spec, "video_path": ""}).dict() for spec in req.clips]
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    sources = []
+    for source in req.sources:
+        if not os.path.exists(source.video_path):
+            raise HTTPException(status_code=422, detail=f"Video file not found: {source.video_path}")
+        # Probed up front so an unreadable source fails the request before anything is queued;
+        # workers probe it again (they may be separate processes)
+        media = probe_media(source.video_path)
+        if media.duration <= 0:
+            raise HTTPException(status_code=422, detail=f"Unreadable media: {source.video_path}")
+        sources.append({"video_path": source.video_path, "filename": source.filename,
+                        "duration": media.duration, "width": media.width, "height": media.height})
+    try:
+        configs = plan_batch([s.dict() for s in req.sources], specs)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    batch_id = str(uuid.uuid4())
+    jobs = [(str(uuid.uuid4()), {**config, "batch_id": batch_id}, req.priority) for config in configs]
+    # The batch record is never leased (state "batch"); its status is derived from its jobs
+    job_store.create(batch_id, {"clips": specs}, state="batch", batch_id=batch_id,
+                     job_ids=[job_id for job_id, _, _ in jobs], sources=sources)
+    job_store.create_many(jobs)
+    return {"batch_id": batch_id, "job_ids": [job_id for job_id, _, _ in jobs], "status": "queued"}
+
+@router.get("/batch/{batch_id}")
+def get_batch(batch_id: str):
+    batch = job_store.get(batch_id)
+    if batch is None or "job_ids" not in batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch_status(batch, job_store.get_many(batch["job_ids"]))
+
 @router.get("/job/{job_id}")
-async def get_job_status(job_id: str):
-    if job_id not in jobs:
+def get_job_status(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/job/{job_id}/events")
+async def job_events(job_id: str):
+    # Server-sent events: one `data:` message per change of the job record
+    # (status, clip_status, per-clip percent, transcription position), ending with the job.
+    if await asyncio.to_thread(job_store.get, job_id) is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    return jobs[job_id]
+
+    async def stream():
+        async for data in progress_hub.subscribe(job_id):
+            yield f"data: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+from core.cache import artifact_cache, merge_cache_stats
+
+@router.get("/transcription/stats")
+def transcription_stats():
+    # Batched transcription throughput of this process and the separate worker processes
+    from core.transcription_service import transcription_service, merge_stats
+    others = [p["transcription"] for p in job_store.process_stats()]
+    return merge_stats([transcription_service.stats(), *others])
+
+@router.get("/encoders")
+def encoder_profiles():
+    # Profiles a job can pick, plus the speed history adaptive mode picks presets from
+    from core.encoders import ENCODER_PROFILES, speed_history
+    return {"profiles": ENCODER_PROFILES, "measured_speed_1080p": speed_history.stats()}
+
+@router.get("/cache/stats")
+def cache_stats():
+    # This process's counters plus those the separate worker processes publish
+    others = [p["cache"] for p in job_store.process_stats()]
+    return merge_cache_stats([artifact_cache.stats(), *others])
+
+@router.get("/storage/stats")
+def storage_stats():
+    # Uploads + outputs against the quota, plus what release and eviction have freed
+    return storage.stats()
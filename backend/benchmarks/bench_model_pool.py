@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+import subprocess
+sys.stdout.reconfigure(encoding='utf-8')
+
+# Run from the backend directory: python benchmarks/bench_model_pool.py [num_clips]
+sys.path.append(os.getcwd())
+
+from faster_whisper import WhisperModel
+from core import transcription
+from core.transcription import transcribe_audio, model_pool, MODEL_SIZE, DEVICE, COMPUTE_TYPE
+
+NUM_CLIPS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+CLIP_SECONDS = 10
+
+os.makedirs("temp", exist_ok=True)
+audio_path = "temp/bench_model_pool.wav"
+
+# Synthetic 16k mono clip; content doesn't matter, we're timing load vs inference.
+subprocess.run([
+    "ffmpeg", "-y", "-f", "lavfi", "-i", f"sine=frequency=440:duration={CLIP_SECONDS}",
+    "-ac", "1", "-ar", "16000", audio_path
+], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def run_job(label):
+    start = time.perf_counter()
+    for _ in range(NUM_CLIPS):
+        transcribe_audio(audio_path)
+    elapsed = time.perf_counter() - start
+    print(f"{label}: {NUM_CLIPS} clips in {elapsed:.2f}s ({elapsed / NUM_CLIPS:.2f}s/clip)")
+    return elapsed
+
+
+# Before: a fresh model per clip, as transcribe_audio used to do.
+original_get_model = transcription.get_model
+transcription.get_model = lambda *args: WhisperModel(MODEL_SIZE, device=DEVICE, compute_type=COMPUTE_TYPE)
+before = run_job("per-clip load")
+transcription.get_model = original_get_model
+
+# After: the pool loads once and every clip reuses the warm instance.
+model_pool.clear()
+after = run_job("pooled model ")
+print(f"model loads: {model_pool.loads}, speedup: {before / after:.2f}x")
+
+if os.path.exists(audio_path): os.remove(audio_path)
@@ -0,0 +1,391 @@
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import argparse
+import platform
+import subprocess
+sys.stdout.reconfigure(encoding='utf-8')
+
+# Run from the backend directory:
+#   python benchmarks/bench_suite.py [--quick] [--only cut_] [--repeat 3] [--save]
+# Generates deterministic lavfi sources (testsrc2 video with a sine tone or a speech-like
+# synthetic voice), runs the ffmpeg_utils functions and every process_job mode on them, and
+# reports throughput (source seconds per wall second), peak RSS and bytes written to disk.
+# --save writes the results as the baseline; later runs are compared against it and exit
+# non-zero on a regression beyond --tolerance. Each case runs in its own process with its
+# own cache/scratch/output directories, so nothing is served from an earlier run's cache.
+sys.path.append(os.getcwd())
+
+BENCH_DIR = os.path.abspath("temp/bench")
+SOURCE_DIR = os.path.join(BENCH_DIR, "sources")
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+# name -> (seconds, width, height, audio)
+SOURCES = {
+    "tone_720p": (30, 1280, 720, "tone"),
+    "speech_1080p": (60, 1920, 1080, "speech"),
+    "speech_vertical": (45, 1080, 1920, "speech"),
+    "tone_480p_long": (300, 854, 480, "tone"),
+}
+QUICK_SCALE = 1 / 3 # --quick shortens every source (and the ranges cut from it)
+
+AUDIO = {
+    "tone": "sine=frequency=440:sample_rate=48000",
+    # Harmonic voice with a drifting pitch, ~4 syllables/s, word gaps and phrase pauses;
+    # close enough to speech for VAD and Whisper to do their usual work
+    "speech": ("aevalsrc='(sin(2*PI*(140+30*sin(2*PI*0.7*t))*t)+0.5*sin(4*PI*(140+30*sin(2*PI*0.7*t))*t)"
+               "+0.25*sin(6*PI*(140+30*sin(2*PI*0.7*t))*t))*0.3*pow(sin(4*PI*t),2)"
+               "*gt(mod(t,2.5),0.4)*gt(mod(t,11),1.5)':s=48000"),
+}
+
+
+def source_path(name: str, quick: bool) -> str:
+    seconds, width, height, audio = SOURCES[name]
+    if quick:
+        seconds = max(10, int(seconds * QUICK_SCALE))
+    path = os.path.join(SOURCE_DIR, f"{name}_{seconds}s.mp4")
+    if not os.path.exists(path):
+        os.makedirs(SOURCE_DIR, exist_ok=True)
+        tmp_path = path.replace(".mp4", ".tmp.mp4")
+        subprocess.run([
+            "ffmpeg", "-y",
+            "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate=30",
+            "-f", "lavfi", "-i", AUDIO[audio],
+            "-t", str(seconds),
+            "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-ac", "2",
+            "-fflags", "+bitexact", "-flags", "+bitexact",
+            tmp_path
+        ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        os.replace(tmp_path, path)
+    return path
+
+
+# Cases: fn(source, out, quick) does any setup untimed and returns
+# (source seconds processed, callable to time)
+
+def window(quick: bool, start: float, end: float):
+    # Cut ranges shrink with the sources in quick mode
+    scale = QUICK_SCALE if quick else 1
+    return start * scale, end * scale
+
+
+def case_probe(source, out, quick):
+    from core import ffmpeg_utils
+    seconds = probe_media_seconds(source)
+
+    def run():
+        # Cold: forget the memoized probe taken for the duration above
+        ffmpeg_utils._probes.clear()
+        ffmpeg_utils.probe_media(source).keyframes
+    return seconds, run
+
+
+def probe_media_seconds(source):
+    from core.ffmpeg_utils import probe_media
+    return probe_media(source).duration
+
+
+def cut_case(mode):
+    def case(source, out, quick):
+        from core.ffmpeg_utils import cut_video
+        start, end = window(quick, 10, 40)
+        return end - start, lambda: cut_video(source, out("cut.mp4"), start, end, mode=mode)
+    return case
+
+
+def case_read_audio(source, out, quick):
+    from core.ffmpeg_utils import read_audio
+    return probe_media_seconds(source), lambda: read_audio(source)
+
+
+def case_highlights(source, out, quick):
+    from core.highlights import find_highlights
+    duration = probe_media_seconds(source)
+    return duration, lambda: find_highlights(source, duration / 6, 3, duration)
+
+
+def case_upscale(source, out, quick):
+    from core.ffmpeg_utils import probe_media, upscale_video, upscale_filter
+    start, end = window(quick, 0, 15)
+    media = probe_media(source)
+    scale_filter = upscale_filter(media.width, media.height)
+    return end - start, lambda: upscale_video(source, out("4k.mp4"), start=start, end=end, scale_filter=scale_filter)
+
+
+def write_srt(path: str, seconds: float):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(int(seconds // 2)):
+            f.write(f"{i + 1}\n00:00:{i * 2:02},000 --> 00:00:{i * 2 + 1:02},500\nBenchmark caption {i + 1}\n\n")
+
+
+def case_burn(source, out, quick):
+    from core.ffmpeg_utils import burn_subtitles
+    start, end = window(quick, 10, 40)
+    srt_path = out("captions.srt")
+    write_srt(srt_path, end - start)
+    return end - start, lambda: burn_subtitles(source, srt_path, out("burned.mp4"), start=start, end=end)
+
+
+def case_render(source, out, quick):
+    # Single pass: seek + upscale + captions in one encode
+    from core.ffmpeg_utils import render_clip
+    start, end = window(quick, 10, 40)
+    srt_path = out("captions.srt")
+    write_srt(srt_path, end - start)
+    return end - start, lambda: render_clip(source, out("render.mp4"), start, end, upscale=True, srt_path=srt_path)
+
+
+def case_reframe(source, out, quick):
+    from core.ffmpeg_utils import probe_media, reframe_video
+    from core.reframe import plan_reframe
+    start, end = window(quick, 10, 40)
+    media = probe_media(source)
+
+    def run():
+        crop = plan_reframe(source, out("crop.txt"), (media.width, media.height), start, end)
+        reframe_video(source, out("9x16.mp4"), crop, start=start, end=end)
+    return end - start, run
+
+
+def case_split(source, out, quick):
+    from core.ffmpeg_utils import split_video
+    duration = probe_media_seconds(source)
+    times = [t for t in range(int(duration / 5), int(duration), int(duration / 5))]
+    return duration, lambda: split_video(source, out("part_%d.mp4"), times)
+
+
+def case_concat(source, out, quick):
+    from core.ffmpeg_utils import cut_video, concat_videos
+    parts = []
+    for i, (start, end) in enumerate([window(quick, 0, 10), window(quick, 20, 30), window(quick, 40, 50)]):
+        parts.append(out(f"seg_{i}.mp4"))
+        cut_video(source, parts[-1], start, end, mode="copy")
+    return sum(probe_media_seconds(p) for p in parts), lambda: concat_videos(parts, out("merged.mp4"))
+
+
+def job_case(mode, captions=False, enhance_4k=False, **options):
+    def case(source, out, quick):
+        from core.processing import process_job
+        config = {"video_path": source, "filename": os.path.basename(source), "mode": mode,
+                  "captions": captions, "enhance_4k": enhance_4k, **options}
+        duration = probe_media_seconds(source)
+        if mode == "auto":
+            config["duration"] = int(duration // 3)
+            seconds = duration
+        elif mode == "manual":
+            start, end = window(quick, 10, 40)
+            config["manual_start"], config["manual_end"] = f"00:{int(start):02}", f"00:{int(end):02}"
+            seconds = int(end) - int(start)
+        else:
+            ranges = [window(quick, 0, 10), window(quick, 20, 30), window(quick, 40, 50)]
+            config["merge_segments"] = [{"start": f"00:{int(a):02}", "end": f"00:{int(b):02}"} for a, b in ranges]
+            seconds = sum(int(b) - int(a) for a, b in ranges)
+        job_id = str(uuid.uuid4())
+        store = {job_id: {}}
+
+        def run():
+            process_job(job_id, config, store)
+            if store[job_id].get("status") != "completed":
+                raise RuntimeError(store[job_id].get("error") or store[job_id].get("status"))
+        return seconds, run
+    return case
+
+
+# name -> (source, case)
+CASES = {
+    "probe": ("speech_1080p", case_probe),
+    "cut_reencode": ("speech_1080p", cut_case("reencode")),
+    "cut_copy": ("speech_1080p", cut_case("copy")),
+    "cut_smart": ("speech_1080p", cut_case("smart")),
+    "read_audio": ("tone_480p_long", case_read_audio),
+    "highlights": ("tone_480p_long", case_highlights),
+    "upscale_720p": ("tone_720p", case_upscale),
+    "upscale_vertical": ("speech_vertical", case_upscale),
+    "burn_subtitles": ("speech_1080p", case_burn),
+    "render_clip_4k_captions": ("speech_1080p", case_render),
+    "reframe": ("speech_1080p", case_reframe),
+    "split_video": ("tone_480p_long", case_split),
+    "concat_videos": ("speech_1080p", case_concat),
+    "job_auto": ("speech_1080p", job_case("auto")),
+    "job_auto_captions": ("speech_1080p", job_case("auto", captions=True)),
+    "job_auto_4k": ("tone_720p", job_case("auto", enhance_4k=True)),
+    "job_auto_staged_4k_captions": ("speech_1080p", job_case("auto", captions=True, enhance_4k=True,
+                                                             render_mode="staged")),
+    "job_manual": ("speech_1080p", job_case("manual")),
+    "job_manual_4k_captions": ("speech_1080p", job_case("manual", captions=True, enhance_4k=True)),
+    "job_merge": ("speech_1080p", job_case("merge")),
+    "job_merge_captions": ("speech_1080p", job_case("merge", captions=True)),
+}
+
+
+def disk_write_bytes():
+    # Bytes this process (and the children it has reaped, i.e. ffmpeg) sent to storage
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("write_bytes:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def peak_rss():
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    # ru_maxrss is bytes on macOS, KiB elsewhere; CHILDREN is the largest reaped child
+    scale = 1 if sys.platform == "darwin" else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
+
+
+def run_case(name: str, quick: bool):
+    # Child process side: the environment already points core at this case's directories
+    source_name, case = CASES[name]
+    work_dir = os.environ["BENCH_WORK_DIR"]
+    seconds, fn = case(source_path(source_name, quick), lambda n: os.path.join(work_dir, n), quick)
+    written = disk_write_bytes()
+    start = time.perf_counter()
+    fn()
+    wall = time.perf_counter() - start
+    python_rss, ffmpeg_rss = peak_rss()
+    print(json.dumps({
+        "source": source_name,
+        "source_seconds": round(seconds, 3),
+        "wall_seconds": round(wall, 3),
+        "throughput": round(seconds / wall, 3) if wall > 0 else None,
+        "peak_rss_bytes": python_rss,
+        "peak_ffmpeg_rss_bytes": ffmpeg_rss,
+        "disk_write_bytes": disk_write_bytes() - written if written is not None else None
+    }))
+
+
+def spawn_case(name: str, quick: bool) -> dict:
+    work_dir = os.path.join(BENCH_DIR, "run", name)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    env = {
+        **os.environ,
+        "BENCH_WORK_DIR": work_dir,
+        "ARTIFACT_CACHE_DIR": os.path.join(work_dir, "cache"),
+        "SCRATCH_DIR": os.path.join(work_dir, "scratch"),
+        "OUTPUT_DIR": os.path.join(work_dir, "output"),
+        "ENCODER_SPEED_PATH": os.path.join(work_dir, "encoder_speed.json"),
+        "JOB_DB_PATH": os.path.join(work_dir, "jobs.db"),
+        "WHISPER_WARMUP": "0",
+    }
+    cmd = [sys.executable, os.path.abspath(__file__), "--run-case", name] + (["--quick"] if quick else [])
+    result = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    if result.returncode != 0:
+        error = (result.stderr.strip().splitlines() or ["exit code %d" % result.returncode])[-1]
+        return {"error": error}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def host_info() -> dict:
+    version = subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "ffmpeg": (version.stdout.splitlines() or ["unknown"])[0],
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    # Throughput may not drop, and peak RSS / bytes written may not grow, by more than tolerance
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or "error" in base:
+            continue
+        if "error" in result:
+            regressions.append(f"{name}: failed ({result['error']}), baseline passed")
+            continue
+        checks = [("throughput", -1), ("peak_rss_bytes", 1), ("peak_ffmpeg_rss_bytes", 1), ("disk_write_bytes", 1)]
+        for key, direction in checks:
+            now, then = result.get(key), base.get(key)
+            if not now or not then:
+                continue
+            change = (now - then) / then
+            if change * direction > tolerance:
+                regressions.append(f"{name}: {key} {then} -> {now} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks on synthetic media")
+    parser.add_argument("--quick", action="store_true", help="shorter sources, for a fast smoke run")
+    parser.add_argument("--only", default="", help="run the cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case; the fastest is kept")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="write these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        run_case(args.run_case, args.quick)
+        return 0
+
+    suite = "quick" if args.quick else "full"
+    names = [n for n in CASES if args.only in n]
+    # Sources are generated once up front so their encode never lands in a measurement
+    for source_name in sorted({CASES[n][0] for n in names}):
+        source_path(source_name, args.quick)
+
+    results = {}
+    for name in names:
+        runs = [spawn_case(name, args.quick) for _ in range(max(1, args.repeat))]
+        ok = [r for r in runs if "error" not in r]
+        result = max(ok, key=lambda r: r["throughput"] or 0) if ok else runs[-1]
+        results[name] = result
+        if "error" in result:
+            print(f"{name:30} FAILED: {result['error']}")
+            continue
+        rss = result["peak_rss_bytes"] or 0
+        ffmpeg_rss = result["peak_ffmpeg_rss_bytes"] or 0
+        written = result["disk_write_bytes"]
+        print(f"{name:30} {result['throughput']:7.2f}x  {result['wall_seconds']:7.2f}s  "
+              f"rss {rss / 1e6:6.0f} MB (ffmpeg {ffmpeg_rss / 1e6:5.0f} MB)  "
+              f"written {written / 1e6 if written is not None else float('nan'):7.1f} MB")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baselines = json.load(f)
+    host = host_info()
+    base = baselines.get(suite)
+
+    status = 0
+    if base:
+        if base.get("host") != host:
+            print(f"Note: baseline was recorded on a different host/ffmpeg ({base.get('host')})")
+        regressions = compare(results, base["cases"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if not regressions:
+            print(f"No regressions beyond {args.tolerance:.0%} against the {suite} baseline")
+        status = 1 if regressions else 0
+    elif not args.save:
+        print(f"No {suite} baseline at {args.baseline}; run with --save to record one")
+
+    if args.save:
+        cases = {**(base or {}).get("cases", {}), **results}
+        baselines[suite] = {"host": host, "recorded": time.strftime("%Y-%m-%d %H:%M:%S"), "cases": cases}
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Saved {suite} baseline to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
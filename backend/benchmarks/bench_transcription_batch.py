@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import subprocess
+sys.stdout.reconfigure(encoding='utf-8')
+
+# Run from the backend directory:
+#   python benchmarks/bench_transcription_batch.py [audio files...]
+# Without arguments it synthesizes short clips; pass real speech recordings for meaningful numbers.
+sys.path.append(os.getcwd())
+
+from core.transcription import transcribe_words, caption_settings, get_model
+from core.transcription_service import TranscriptionService
+
+NUM_CLIPS = 8
+CLIP_SECONDS = 20
+
+os.makedirs("temp", exist_ok=True)
+paths = sys.argv[1:]
+generated = []
+if not paths:
+    for i in range(NUM_CLIPS):
+        path = f"temp/bench_batch_{i}.wav"
+        # Amplitude-modulated tones so VAD doesn't discard everything as silence
+        subprocess.run([
+            "ffmpeg", "-y", "-f", "lavfi",
+            "-i", f"sine=frequency={200 + 40 * i}:duration={CLIP_SECONDS},volume='0.5+0.5*sin(2*PI*3*t)':eval=frame",
+            "-ac", "1", "-ar", "16000", path
+        ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        generated.append(path)
+    paths = generated
+
+settings = caption_settings()
+get_model(settings["model"]) # load outside the timed sections
+
+
+def timed(label, fn):
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    audio_seconds = fn()
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    print(f"{label}: {audio_seconds:.0f}s audio, wall {wall:.2f}s, cpu {cpu:.2f}s, "
+          f"{audio_seconds / cpu:.2f} audio-s per cpu-s, {audio_seconds / wall:.2f}x realtime")
+    return audio_seconds / cpu
+
+
+def sequential():
+    total = 0.0
+    for path in paths:
+        _, _, stats = transcribe_words(path, settings=settings)
+        total += stats["audio_seconds"]
+    return total
+
+
+def batched():
+    # Everything is submitted at once, as if from many concurrent jobs
+    service = TranscriptionService()
+    futures = [service.submit(path, settings) for path in paths]
+    return sum(f.result()[2]["audio_seconds"] for f in futures)
+
+
+before = timed("sequential", sequential)
+after = timed("batched   ", batched)
+print(f"throughput gain: {after / before:.2f}x")
+
+for path in generated:
+    if os.path.exists(path): os.remove(path)
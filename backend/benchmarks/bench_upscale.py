@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import subprocess
+sys.stdout.reconfigure(encoding='utf-8')
+
+# Run from the backend directory: python benchmarks/bench_upscale.py [seconds]
+# Upscales synthetic testsrc2 footage (landscape and vertical) at every quality level and
+# reports encode speed plus SSIM against the "high" output.
+sys.path.append(os.getcwd())
+
+from core.ffmpeg_utils import upscale_video, upscale_filter, probe_media, UPSCALE_QUALITIES
+
+SECONDS = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+SOURCES = {"landscape": (1920, 1080), "vertical": (1080, 1920)}
+
+os.makedirs("temp", exist_ok=True)
+
+
+def ssim(distorted: str, reference: str) -> float:
+    cmd = ["ffmpeg", "-i", distorted, "-i", reference, "-lavfi", "ssim", "-f", "null", "-"]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    for line in result.stderr.splitlines():
+        if "All:" in line:
+            return float(line.split("All:")[1].split()[0])
+    return float("nan")
+
+
+generated = []
+for name, (width, height) in SOURCES.items():
+    source = f"temp/bench_upscale_{name}.mp4"
+    subprocess.run([
+        "ffmpeg", "-y", "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate=30:duration={SECONDS}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", source
+    ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    generated.append(source)
+
+    outputs = {}
+    for quality in UPSCALE_QUALITIES:
+        output = f"temp/bench_upscale_{name}_{quality}.mp4"
+        start = time.perf_counter()
+        upscale_video(source, output, scale_filter=upscale_filter(width, height, quality))
+        elapsed = time.perf_counter() - start
+        info = probe_media(output)
+        outputs[quality] = output
+        generated.append(output)
+        print(f"{name} {quality:9}: {info.width}x{info.height} in {elapsed:.2f}s "
+              f"({SECONDS / elapsed:.2f}x realtime), {os.path.getsize(output) / 1e6:.1f} MB")
+
+    for quality in UPSCALE_QUALITIES[1:]:
+        print(f"{name} {quality:9}: SSIM vs high {ssim(outputs[quality], outputs['high']):.4f}")
+
+for path in generated:
+    if os.path.exists(path): os.remove(path)
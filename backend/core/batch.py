@@ -0,0 +1,83 @@
+import os
+
+# Largest sources x clip specs product a single batch may expand to
+MAX_BATCH_JOBS = int(os.getenv("MAX_BATCH_JOBS", "1000"))
+
+
+def plan_batch(sources: list[dict], specs: list[dict]) -> list[dict]:
+    """
+    Expands sources x clip specs into job configs, in the order they should run: all of a
+    source's jobs back to back, so its probe, transcript and cached cuts are reused while
+    they're warm, and within a source the captioned specs first, so the transcript they
+    share starts as early as possible. Each config records its batch_item (source, spec).
+    """
+    if len(sources) * len(specs) > MAX_BATCH_JOBS:
+        raise ValueError(f"Batch expands to {len(sources) * len(specs)} jobs (limit {MAX_BATCH_JOBS})")
+    # The same file listed twice still runs as one group
+    groups = {}
+    for index, source in enumerate(sources):
+        groups.setdefault(os.path.abspath(source["video_path"]), []).append((index, source))
+    ordered_specs = sorted(enumerate(specs), key=lambda item: not item[1].get("captions"))
+
+    jobs = []
+    for group in groups.values():
+        for source_index, source in group:
+            filename = source.get("filename") or os.path.basename(source["video_path"])
+            for spec_index, spec in ordered_specs:
+                jobs.append({**spec, "video_path": source["video_path"], "filename": filename,
+                             "batch_item": {"source": source_index, "spec": spec_index}})
+    return jobs
+
+
+def _job_progress(job: dict) -> float:
+    # 0..1 for one job: finished (or gone), or the share of its clips done
+    if not job:
+        return 1.0
+    status = job.get("status") or ""
+    if status in ("completed", "failed"):
+        return 1.0
+    clip_status = job.get("clip_status") or []
+    if clip_status:
+        return clip_status.count("done") / len(clip_status)
+    return 0.0
+
+
+def batch_status(batch: dict, jobs: dict) -> dict:
+    """
+    Aggregate view of a batch from its job records: overall status and progress, counts
+    per state, and one result per item (in submission order).
+    """
+    items = []
+    counts = {}
+    for job_id in batch.get("job_ids", []):
+        job = jobs.get(job_id) or {}
+        status = job.get("status") or "missing"
+        # A job record that has gone missing will never finish; count it as failed
+        state = status if status in ("queued", "completed", "failed") else "failed" if not job else "running"
+        counts[state] = counts.get(state, 0) + 1
+        items.append({
+            "job_id": job_id,
+            **((job.get("config") or {}).get("batch_item") or {}),
+            "status": status,
+            "progress": round(_job_progress(job), 3),
+            "output_files": job.get("output_files", []),
+            "error": job.get("error")
+        })
+    items.sort(key=lambda item: (item.get("source", 0), item.get("spec", 0)))
+
+    total = len(items)
+    done = counts.get("completed", 0) + counts.get("failed", 0)
+    if done < total:
+        status = "queued" if counts.get("queued", 0) == total else "running"
+    elif counts.get("failed", 0) == 0:
+        status = "completed"
+    else:
+        status = "failed" if counts.get("failed") == total else "completed_with_errors"
+    return {
+        "batch_id": batch.get("batch_id"),
+        "status": status,
+        "progress": round(sum(item["progress"] for item in items) / total, 3) if total else 1.0,
+        "counts": counts,
+        "sources": batch.get("sources", []),
+        "items": items
+    }
@@ -0,0 +1,175 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", "temp/cache")
+CACHE_MAX_BYTES = int(float(os.getenv("ARTIFACT_CACHE_MAX_GB", "20")) * 1024 ** 3)
+
+# Sampled source hashing: reading a multi-GB upload end to end on every job would cost
+# more than some of the stages we're trying to skip.
+HASH_SAMPLE_BYTES = 1024 * 1024
+HASH_SAMPLES = 16
+
+_source_hashes = {} # (path, size, mtime) -> hash
+
+
+def source_hash(path: str) -> str:
+    """
+    Content hash of a media file: its size plus evenly spaced 1 MB samples (always
+    including the head and tail). Memoized per (path, size, mtime).
+    """
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime)
+    if memo_key in _source_hashes:
+        return _source_hashes[memo_key]
+
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(st.st_size).encode())
+    with open(path, "rb") as f:
+        if st.st_size <= HASH_SAMPLE_BYTES * HASH_SAMPLES:
+            for chunk in iter(lambda: f.read(HASH_SAMPLE_BYTES), b""):
+                h.update(chunk)
+        else:
+            step = (st.st_size - HASH_SAMPLE_BYTES) // (HASH_SAMPLES - 1)
+            for i in range(HASH_SAMPLES):
+                f.seek(i * step)
+                h.update(f.read(HASH_SAMPLE_BYTES))
+
+    digest = h.hexdigest()
+    _source_hashes[memo_key] = digest
+    return digest
+
+
+def file_hash(path: str) -> str:
+    # Full hash for small artifacts like SRTs
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_SAMPLE_BYTES), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ArtifactCache:
+    """
+    Content-addressed store for intermediate artifacts (cuts, upscales, audio, transcripts,
+    burned clips). Keys are derived from the upstream key or source hash, the stage name and
+    the stage parameters, so changing one option only misses for the stages it feeds.
+    Least recently used artifacts are evicted once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(upstream: str, stage: str, **params) -> str:
+        payload = json.dumps({"upstream": upstream, "stage": stage, "params": params}, sort_keys=True)
+        return f"{stage}-{hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()}"
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.root, key + ext)
+
+    @staticmethod
+    def _link(src: str, dst: str):
+        # Hardlink when possible (same filesystem), copy otherwise. Built under a temp name
+        # and renamed over dst, so readers in other processes never see it missing or partial.
+        tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copy2(src, tmp)
+        try:
+            os.replace(tmp, dst)
+        except OSError:
+            os.remove(tmp)
+            raise
+
+    def contains(self, key: str, ext: str) -> bool:
+        return os.path.exists(self._path(key, ext))
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """
+        Materializes a cached artifact at output_path. Returns False on a miss.
+        """
+        stage = key.split("-", 1)[0]
+        cached = self._path(key, os.path.splitext(output_path)[1])
+        with self._lock:
+            try:
+                # mtime doubles as the LRU clock
+                os.utime(cached)
+                self._link(cached, output_path)
+            except FileNotFoundError:
+                # Missing, or evicted by another worker process just now
+                self.misses[stage] = self.misses.get(stage, 0) + 1
+                return False
+            self.hits[stage] = self.hits.get(stage, 0) + 1
+        return True
+
+    def store(self, key: str, output_path: str):
+        if not os.path.exists(output_path):
+            return
+        cached = self._path(key, os.path.splitext(output_path)[1])
+        with self._lock:
+            self._link(output_path, cached)
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.root):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                # Another worker process evicted or replaced it meanwhile
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": dict(self.hits), "misses": dict(self.misses)}
+
+
+artifact_cache = ArtifactCache()
+
+
+def merge_cache_stats(stats: list[dict]) -> dict:
+    # Hit/miss counters of several processes (ArtifactCache.stats()) summed per stage
+    merged = {"hits": {}, "misses": {}}
+    for s in stats:
+        for kind in ("hits", "misses"):
+            for stage, count in s.get(kind, {}).items():
+                merged[kind][stage] = merged[kind].get(stage, 0) + count
+    return merged
+
+
+def cached(key: str, output_path: str, produce):
+    """
+    Runs produce() to build output_path unless the cache already has it.
+    Returns True on a cache hit.
+    """
+    if artifact_cache.fetch(key, output_path):
+        return True
+    # A stale file here may be a hardlink into the cache; never let ffmpeg write through it
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    produce()
+    artifact_cache.store(key, output_path)
+    return False
@@ -0,0 +1,159 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+# Named x264 settings a job can pick with `encoder_profile`. threads caps the share the
+# pipeline hands each ffmpeg process (0 = use the whole share). Draft encodes are cheap
+# per thread, so they use few and leave the rest to other clips; archival stays at a
+# few threads because x264's frame threading costs compression at high counts.
+ENCODER_PROFILES = {
+    "draft": {"preset": "ultrafast", "crf": 28, "tune": None, "threads": 2},
+    "standard": {"preset": "veryfast", "crf": 23, "tune": None, "threads": 0},
+    "archival": {"preset": "slow", "crf": 18, "tune": "film", "threads": 4},
+    "4k": {"preset": "veryfast", "crf": 20, "tune": None, "threads": 0}, # slightly better quality for 4k
+}
+# A job may also ask for "adaptive": standard's (or 4k's) quality, with the preset picked
+# from measured speed.
+
+# x264 presets from fastest to best compression, with their typical speed relative to
+# ultrafast. Used to extrapolate from whichever presets have actually been measured.
+PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower", "veryslow"]
+RELATIVE_SPEED = [1.0, 0.75, 0.55, 0.4, 0.32, 0.25, 0.13, 0.06, 0.025]
+
+# Adaptive mode aims for at least this many seconds of output per wall second
+ADAPTIVE_TARGET_SPEED = float(os.getenv("ENCODER_TARGET_SPEED", "2.0"))
+SPEED_HISTORY_PATH = os.getenv("ENCODER_SPEED_PATH", "temp/encoder_speed.json")
+REFERENCE_PIXELS = 1920 * 1080
+
+
+class SpeedHistory:
+    """
+    Encode speed measured on this host, per preset, as a moving average of the realtime
+    factor normalised to 1080p (a 4k encode at 0.5x counts as 2x). Persisted so adaptive
+    jobs benefit from every earlier job, including ones run by other worker processes.
+    """
+
+    def __init__(self, path: str = SPEED_HISTORY_PATH, smoothing: float = 0.3):
+        self.path = path
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._speeds = None
+        self._mtime = None
+
+    @contextmanager
+    def _file_lock(self):
+        # Worker processes share the file; a read-merge-write holds this across all of them
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".lock", "a+") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _load(self) -> dict:
+        # Re-read whenever another process has rewritten the file
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if self._speeds is None or mtime != self._mtime:
+            try:
+                with open(self.path, "r") as f:
+                    self._speeds = json.load(f)
+            except (OSError, ValueError):
+                self._speeds = {}
+            self._mtime = mtime
+        return self._speeds
+
+    def record(self, preset: str, media_seconds: float, wall_seconds: float, pixels: int):
+        if preset not in PRESETS or media_seconds <= 0 or wall_seconds <= 0 or pixels <= 0:
+            return
+        speed = media_seconds / wall_seconds * pixels / REFERENCE_PIXELS
+        with self._lock, self._file_lock():
+            # Merge into what is on disk now, not into this process's last read of it
+            speeds = self._load()
+            previous = speeds.get(preset)
+            speeds[preset] = speed if previous is None else previous + self.smoothing * (speed - previous)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(speeds, f)
+            os.replace(tmp_path, self.path)
+            self._mtime = os.stat(self.path).st_mtime_ns
+
+    def estimate(self, preset: str, pixels: int):
+        # Measured speed for the preset, or one extrapolated from the measured presets
+        with self._lock:
+            speeds = dict(self._load())
+        pixels_scale = REFERENCE_PIXELS / max(pixels, 1)
+        if preset in speeds:
+            return speeds[preset] * pixels_scale
+        measured = [(PRESETS.index(p), s) for p, s in speeds.items() if p in PRESETS]
+        if not measured:
+            return None
+        # Scale each measurement by the relative speed table and average them
+        i = PRESETS.index(preset)
+        guesses = [s * RELATIVE_SPEED[i] / RELATIVE_SPEED[j] for j, s in measured]
+        return sum(guesses) / len(guesses) * pixels_scale
+
+    def pick_preset(self, pixels: int, target: float = ADAPTIVE_TARGET_SPEED, default: str = "veryfast") -> str:
+        """
+        Slowest (best compressing) preset expected to encode `pixels`-sized frames at
+        `target`x realtime or better. Falls back to `default` until anything is measured.
+        """
+        chosen = None
+        for preset in PRESETS:
+            speed = self.estimate(preset, pixels)
+            if speed is None:
+                return default
+            if speed >= target:
+                chosen = preset
+        return chosen or PRESETS[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {preset: round(speed, 2) for preset, speed in self._load().items()}
+
+
+speed_history = SpeedHistory()
+
+
+def resolve_encoder(profile: str = "standard", pixels: int = REFERENCE_PIXELS, upscale: bool = False) -> dict:
+    """
+    Concrete {"preset", "crf", "tune", "threads"} for a job's profile. Standard
+    and adaptive use the 4k quality level when the output is upscaled, as before.
+    """
+    base = "4k" if upscale and profile in ("standard", "adaptive") else profile
+    encoder = dict(ENCODER_PROFILES.get(base) or ENCODER_PROFILES["standard"])
+    if profile == "adaptive":
+        encoder["preset"] = speed_history.pick_preset(pixels)
+    return encoder
+
+
+def encoder_args(encoder: dict = None, threads: int = 0) -> list[str]:
+    # x264 arguments for an encoder from resolve_encoder(); threads is the pipeline's share
+    encoder = encoder or ENCODER_PROFILES["standard"]
+    args = ["-c:v", "libx264", "-preset", encoder["preset"], "-crf", str(encoder["crf"])]
+    if encoder.get("tune"):
+        args += ["-tune", encoder["tune"]]
+    cap = encoder.get("threads") or 0
+    if cap > 0:
+        threads = min(threads, cap) if threads > 0 else cap
+    if threads > 0:
+        args += ["-threads", str(threads)]
+    return args
@@ -1,20 +1,223 @@
 import subprocess
+import bisect
 import json
+import mmap
 import os
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+from .encoders import resolve_encoder, encoder_args, speed_history
+from .metrics import ffmpeg_finished, input_bytes
 
-def get_video_duration(path: str) -> float:
+# Cut modes for cut_video:
+#   reencode - frame-accurate cut, full libx264 encode (original behaviour)
+#   copy     - stream copy, start snapped back to the previous keyframe
+#   smart    - re-encode only the head up to the first keyframe, stream copy the rest
+#   defer    - don't cut at all; the next encoding stage seeks into the source itself
+CUT_MODES = ("reencode", "copy", "smart", "defer")
+
+# Whisper's input format: 16 kHz mono float32 PCM
+AUDIO_RATE = 16000
+# Sources longer than this decode into an anonymous memory map rather than a heap array
+# (~230 MB per hour of audio)
+AUDIO_MMAP_SECONDS = float(os.getenv("AUDIO_MMAP_SECONDS", "3600"))
+
+class MediaInfo:
+    """
+    What the pipeline needs to know about a media file (duration, resolution, frame rate,
+    codecs, pixel format), parsed from a single ffprobe JSON call. The keyframe index
+    needs a packet scan, so it's only read the first time .keyframes is asked for and
+    then kept with the rest.
+    """
+
+    def __init__(self, path: str, data: dict):
+        self.path = path
+        streams = data.get("streams") or []
+        video = next((s for s in streams if s.get("codec_type") == "video"), {})
+        audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+        fmt = data.get("format") or {}
+
+        self.duration = _to_float(fmt.get("duration")) or _to_float(video.get("duration"))
+        self.bit_rate = int(_to_float(fmt.get("bit_rate")))
+        self.width = int(video.get("width") or 0)
+        self.height = int(video.get("height") or 0)
+        # Phone footage is often stored landscape with a rotation flag; report what plays back
+        rotation = abs(int(_to_float((video.get("tags") or {}).get("rotate"))))
+        for side_data in video.get("side_data_list") or []:
+            rotation = abs(int(_to_float(side_data.get("rotation")))) or rotation
+        if rotation % 180 == 90:
+            self.width, self.height = self.height, self.width
+        self.fps = _to_fraction(video.get("avg_frame_rate")) or _to_fraction(video.get("r_frame_rate"))
+        self.video_codec = video.get("codec_name", "")
+        self.video_profile = video.get("profile", "")
+        self.pix_fmt = video.get("pix_fmt", "")
+        # Ticks per second of the video stream ("1/15360" -> 15360), kept by smart cuts
+        num, _, den = str(video.get("time_base") or "").partition("/")
+        self.video_timescale = int(den) if num == "1" and den.isdigit() else 0
+        self.audio_codec = audio.get("codec_name", "")
+        self.audio_profile = audio.get("profile", "")
+        self.sample_rate = int(_to_float(audio.get("sample_rate")))
+        self.channels = int(audio.get("channels") or 0)
+        self.channel_layout = audio.get("channel_layout", "")
+        self.has_audio = bool(audio)
+        self._keyframes = None
+        self._lock = threading.Lock()
+
+    @property
+    def keyframes(self) -> list[float]:
+        with self._lock:
+            if self._keyframes is None:
+                self._keyframes = get_keyframes(self.path)
+            return self._keyframes
+
+    @property
+    def is_4k(self) -> bool:
+        # Either orientation: a 2160x3840 vertical source doesn't need upscaling either
+        return min(self.width, self.height) >= UPSCALE_HEIGHT
+
+    def to_dict(self) -> dict:
+        return {
+            "duration": self.duration, "width": self.width, "height": self.height,
+            "fps": round(self.fps, 3), "video_codec": self.video_codec, "pix_fmt": self.pix_fmt,
+            "audio_codec": self.audio_codec, "bit_rate": self.bit_rate
+        }
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _to_fraction(value) -> float:
+    # ffprobe rates look like "30000/1001"
+    num, _, den = str(value or "").partition("/")
+    if not den:
+        return _to_float(num)
+    return _to_float(num) / _to_float(den) if _to_float(den) else 0.0
+
+
+# Probes kept in memory: sources stay warm across jobs while scratch parts and outputs,
+# which are probed once and then deleted, age out instead of accumulating
+PROBE_CACHE_ENTRIES = int(os.getenv("PROBE_CACHE_ENTRIES", "256"))
+_probes = OrderedDict() # (path, size, mtime) -> MediaInfo, least recently used first
+_probes_lock = threading.Lock()
+
+def probe_media(path: str) -> MediaInfo:
+    """
+    Probes a file once per (path, size, mtime); every later call for the same file version
+    returns the same MediaInfo, keyframe index included once it has been read.
+    """
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime)
+    with _probes_lock:
+        if memo_key in _probes:
+            _probes.move_to_end(memo_key)
+            return _probes[memo_key]
     cmd = [
         "ffprobe",
         "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
+        "-show_format", "-show_streams",
+        "-of", "json",
         path
     ]
     result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
     try:
-        return float(result.stdout.strip())
+        data = json.loads(result.stdout or "{}")
     except ValueError:
-        return 0.0
+        data = {}
+    info = MediaInfo(path, data)
+    with _probes_lock:
+        info = _probes.setdefault(memo_key, info)
+        while len(_probes) > PROBE_CACHE_ENTRIES:
+            _probes.popitem(last=False)
+        return info
+
+def get_video_duration(path: str) -> float:
+    return probe_media(path).duration
+
+def get_video_codec(path: str) -> str:
+    return probe_media(path).video_codec
+
+def get_keyframes(path: str) -> list[float]:
+    # Reads packet flags only (no decoding), so this is cheap even for long sources.
+    # Build it once per source and pass it to every cut_video call.
+    cmd = [
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        path
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    keyframes = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(",")
+        if len(parts) >= 2 and "K" in parts[1]:
+            try:
+                keyframes.append(float(parts[0]))
+            except ValueError:
+                continue
+    return sorted(keyframes)
+
+def wait_ffmpeg(proc, cmd: list[str], report: dict = None, bytes_in: int = None, bytes_out: int = 0) -> int:
+    """
+    Reaps an ffmpeg process and credits it to the open metrics span: CPU time (from
+    wait4 where the OS has it), bytes, and the speed/output time from its -progress
+    report. Returns the exit code.
+    """
+    cpu = 0.0
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        cpu = usage.ru_utime + usage.ru_stime
+    else:
+        proc.wait()
+    report = report or {}
+    # out_time_ms is (despite the name) microseconds too; out_time_us is the newer spelling
+    out_time = _to_float(report.get("out_time_us") or report.get("out_time_ms")) / 1_000_000
+    ffmpeg_finished(cpu, input_bytes(cmd) if bytes_in is None else bytes_in,
+                    int(_to_float(report.get("total_size"))) or bytes_out,
+                    _to_float(str(report.get("speed", "")).rstrip("x")) or None, out_time,
+                    failed=proc.returncode != 0)
+    return proc.returncode
+
+def run_ffmpeg(cmd: list[str], on_progress=None, quiet: bool = True):
+    """
+    Runs an ffmpeg command. ffmpeg's machine-readable -progress output is parsed for the
+    stage metrics, and on_progress(seconds_of_output_written) is called as the encode advances.
+    """
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL if quiet else None, text=True)
+    report = {}
+    for line in proc.stdout:
+        key, _, value = line.strip().partition("=")
+        report[key] = value
+        if on_progress and key in ("out_time_us", "out_time_ms"):
+            try:
+                on_progress(int(value) / 1_000_000)
+            except ValueError:
+                continue
+    if wait_ffmpeg(proc, cmd, report) != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+def run_encode(cmd: list[str], encoder: dict, output_path: str, on_progress=None, quiet: bool = True):
+    # run_ffmpeg for x264 encodes; the measured speed feeds adaptive preset selection
+    start = time.perf_counter()
+    run_ffmpeg(cmd, on_progress, quiet)
+    # Only the encode counts; probing the output afterwards would penalise short clips
+    wall = time.perf_counter() - start
+    output = probe_media(output_path)
+    speed_history.record(encoder["preset"], output.duration, wall, output.width * output.height)
+
+def pix_fmt_args(input_path: str) -> list[str]:
+    # libx264 keeps 10-bit / 4:2:2 / 4:4:4 input as-is, which most phones and browsers
+    # won't play; only convert when the source isn't already 8-bit 4:2:0
+    if probe_media(input_path).pix_fmt in ("yuv420p", "yuvj420p", ""):
+        return []
+    return ["-pix_fmt", "yuv420p"]
 
 def extract_audio(video_path: str, audio_path: str):
     # Extract audio at 16k for Whisper
@@ -26,52 +229,458 @@ def extract_audio(video_path: str, audio_path: str):
     ]
     subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
-def cut_video(input_path: str, output_path: str, start: float, end: float):
+def stream_audio(video_path: str, rate: int = AUDIO_RATE, chunk_seconds: float = 60.0):
+    """
+    Yields the audio track as mono float32 PCM straight from ffmpeg's stdout, in chunks of
+    about chunk_seconds. Nothing is written to disk.
+    """
+    cmd = [
+        "ffmpeg", "-nostdin",
+        "-i", video_path,
+        "-vn", "-ac", "1", "-ar", str(rate),
+        "-f", "f32le", "pipe:1"
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    chunk_bytes = int(rate * chunk_seconds) * 4
+    streamed = 0
+    try:
+        while True:
+            # Buffered read blocks for the full chunk, so it is always whole samples
+            raw = proc.stdout.read(chunk_bytes)
+            if not raw:
+                break
+            streamed += len(raw)
+            yield np.frombuffer(raw, dtype=np.float32)
+    finally:
+        # Closing the pipe early (consumer stopped) makes ffmpeg exit on EPIPE
+        proc.stdout.close()
+        returncode = wait_ffmpeg(proc, cmd, bytes_out=streamed)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+def _audio_buffer(samples: int, mapped: bool) -> np.ndarray:
+    if mapped:
+        # Anonymous mapping: pages are committed only as they're written, so sizing
+        # from a rounded-up duration costs nothing
+        return np.frombuffer(mmap.mmap(-1, max(samples, 1) * 4), dtype=np.float32)
+    return np.empty(samples, dtype=np.float32)
+
+def read_audio(video_path: str, rate: int = AUDIO_RATE, duration: float = None) -> np.ndarray:
+    """
+    Decodes the whole audio track into memory as mono float32 PCM, ready to hand to
+    Whisper without a WAV round trip. The buffer is preallocated from the container
+    duration and grown if the stream turns out longer.
+    """
+    if duration is None:
+        duration = get_video_duration(video_path)
+    mapped = duration > AUDIO_MMAP_SECONDS
+    buffer = _audio_buffer(int((duration + 1) * rate), mapped)
+    filled = 0
+    for chunk in stream_audio(video_path, rate):
+        if filled + len(chunk) > len(buffer):
+            grown = _audio_buffer(max(2 * len(buffer), filled + len(chunk)), mapped)
+            grown[:filled] = buffer[:filled]
+            buffer = grown
+        buffer[filled:filled + len(chunk)] = chunk
+        filled += len(chunk)
+    return buffer[:filled]
+
+def seek_args(start=None, end=None) -> list[str]:
+    # Input-side seek so later stages can read a range straight from the source
+    if start is None:
+        return []
+    return ["-ss", str(start), "-to", str(end)]
+
+def _encode_cut(input_path: str, output_path: str, start: float, end: float, threads: int = 0, on_progress=None,
+                encoder: dict = None, extra_args: list[str] = None):
     # Fast cut with re-encoding to ensure compatibility (or copy if precise enough? safe to re-encode for shorts)
-    # Using 'veryfast' preset for speed.
+    # The standard profile uses 'veryfast' for speed.
+    encoder = encoder or resolve_encoder()
     cmd = [
         "ffmpeg", "-y",
-        "-ss", str(start),
-        "-to", str(end),
+        *seek_args(start, end),
         "-i", input_path,
-        "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
+        *encoder_args(encoder, threads),
+        *pix_fmt_args(input_path),
         "-c:a", "aac",
+        *(extra_args or []),
         output_path
     ]
-    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    run_encode(cmd, encoder, output_path, on_progress)
 
-def burn_subtitles(video_path: str, srt_path: str, output_path: str, font_size: int = 26):
-    # Hard burn subtitles
+# ffprobe's H.264 profile -> libx264's -profile:v. Other profiles (10-bit, 4:2:2, ...)
+# aren't smart-cut.
+SMART_CUT_PROFILES = {"Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high"}
+
+def smart_cut_args(media: MediaInfo):
+    """
+    Encoder arguments that make a re-encoded head match the source's streams, so it can be
+    joined to a stream-copied tail: same H.264 profile, pixel format and timescale, and AAC-LC
+    audio at the source's sample rate and channel count. None when the source has anything
+    a libx264/aac head couldn't match; the caller then re-encodes the whole range.
+    """
+    if media.video_codec != "h264" or media.pix_fmt not in ("yuv420p", "yuvj420p"):
+        return None
+    profile = SMART_CUT_PROFILES.get(media.video_profile)
+    if profile is None:
+        return None
+    args = ["-profile:v", profile]
+    if media.video_timescale:
+        args += ["-video_track_timescale", str(media.video_timescale)]
+    if media.has_audio:
+        if media.audio_codec != "aac" or media.audio_profile != "LC" or not media.sample_rate:
+            return None
+        # -ac gives the default layout for the count, so only those layouts match
+        if (media.channels, media.channel_layout) not in ((1, "mono"), (2, "stereo"), (1, ""), (2, "")):
+            return None
+        args += ["-ar", str(media.sample_rate), "-ac", str(media.channels)]
+    return args
+
+def _copy_cut(input_path: str, output_path: str, start: float, end: float):
+    cmd = [
+        "ffmpeg", "-y",
+        *seek_args(start, end),
+        "-i", input_path,
+        "-c", "copy",
+        "-avoid_negative_ts", "make_zero",
+        output_path
+    ]
+    run_ffmpeg(cmd)
+
+def snap_to_keyframe(keyframes: list[float], t: float) -> float:
+    # Snap back to the keyframe at or before t so a copied clip doesn't open on a broken GOP
+    i = bisect.bisect_right(keyframes, t + 0.001) - 1
+    return keyframes[i] if i >= 0 else 0.0
+
+def cut_video(input_path: str, output_path: str, start: float, end: float, threads: int = 0,
+              mode: str = "reencode", keyframes: list[float] = None, on_progress=None, encoder: dict = None) -> float:
+    """
+    Cuts [start, end) out of input_path. Returns the source time the output actually
+    starts at, which differs from `start` only in copy mode (snapped to a keyframe).
+    `keyframes` is the index from get_keyframes(); copy/smart fall back to a full
+    re-encode without it. `encoder` comes from resolve_encoder() (standard by default).
+    """
+    if mode not in ("copy", "smart") or not keyframes:
+        _encode_cut(input_path, output_path, start, end, threads, on_progress, encoder)
+        return start
+
+    if mode == "copy":
+        snapped = snap_to_keyframe(keyframes, start)
+        _copy_cut(input_path, output_path, snapped, end)
+        return snapped
+
+    # Smart cut: the head [start, first keyframe) is re-encoded, the tail is stream-copied.
+    # Only safe when the head can be encoded to match the source's streams (smart_cut_args)
+    # so both halves can be joined with the concat demuxer.
+    i = bisect.bisect_left(keyframes, start)
+    keyframe = keyframes[i] if i < len(keyframes) else None
+    head_args = smart_cut_args(probe_media(input_path))
+    if keyframe is None or keyframe >= end or head_args is None:
+        _encode_cut(input_path, output_path, start, end, threads, on_progress, encoder)
+        return start
+    if keyframe - start < 0.001:
+        _copy_cut(input_path, output_path, keyframe, end)
+        return start
+
+    head_path = output_path.replace(".mp4", "_head.mp4")
+    tail_path = output_path.replace(".mp4", "_tail.mp4")
+    try:
+        _encode_cut(input_path, head_path, start, keyframe, threads, encoder=encoder, extra_args=head_args)
+        _copy_cut(input_path, tail_path, keyframe, end)
+        concat_videos([head_path, tail_path], output_path)
+    finally:
+        for p in (head_path, tail_path):
+            if os.path.exists(p): os.remove(p)
+    return start
+
+# Upscale to 4k (3840x2160) using Lanczos and Unsharp Mask
+UPSCALE_HEIGHT = 2160
+UPSCALE_FILTER = "scale=3840:2160:flags=lanczos,unsharp=5:5:1.0:5:5:0.0"
+# Upscale quality/speed knob:
+#   high     - Lanczos straight to 4k, 5x5 unsharp at 4k (original behaviour)
+#   balanced - bicubic to 1440p, sharpen there (2.25x fewer pixels), Lanczos the rest of the way
+#   fast     - bicubic straight to 4k, no sharpening
+UPSCALE_QUALITIES = ("high", "balanced", "fast")
+INTERMEDIATE_HEIGHT = 1440
+
+def upscale_size(width: int, height: int) -> tuple[int, int]:
+    # 4k frame in the source's orientation: 2160x3840 (9:16) for vertical sources
+    if height > width:
+        return UPSCALE_HEIGHT, UPSCALE_HEIGHT * 16 // 9
+    return UPSCALE_HEIGHT * 16 // 9, UPSCALE_HEIGHT
+
+def _fit(width: int, height: int, flags: str) -> str:
+    # Scale into the box without distorting; pad centres whatever aspect is left over
+    return (f"scale={width}:{height}:flags={flags}:force_original_aspect_ratio=decrease:force_divisible_by=2,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2")
+
+def upscale_filter(width: int = 1920, height: int = 1080, quality: str = "high") -> str:
+    """
+    Filter chain taking a width x height source to 4k in its own orientation with the
+    aspect ratio preserved. quality is one of UPSCALE_QUALITIES.
+    """
+    out_w, out_h = upscale_size(width, height)
+    if quality == "fast":
+        return _fit(out_w, out_h, "bicubic")
+    if quality == "balanced":
+        mid_w, mid_h = out_w * INTERMEDIATE_HEIGHT // UPSCALE_HEIGHT, out_h * INTERMEDIATE_HEIGHT // UPSCALE_HEIGHT
+        return (f"scale={mid_w}:{mid_h}:flags=bicubic:force_original_aspect_ratio=decrease:force_divisible_by=2,"
+                f"unsharp=3:3:0.8:3:3:0.0,"
+                f"{_fit(out_w, out_h, 'lanczos')}")
+    if (out_w, out_h) == (3840, 2160) and width * 9 == height * 16:
+        # Exact 16:9 input: the original filter, unchanged (and its cache keys with it)
+        return UPSCALE_FILTER
+    return f"{_fit(out_w, out_h, 'lanczos')},unsharp=5:5:1.0:5:5:0.0"
+
+def caption_font_size(height: int) -> int:
+    # 26 reads well at 1080p (52 at 4k); scale with the output's short side
+    if height <= 0:
+        return 26
+    return max(12, round(26 * height / 1080))
+
+def filter_path(p: str) -> str:
     # Note: path escaping for filters can be tricky on Windows.
     # Using forward slashes and escaping colon might be needed.
     # A simple way is to use relative paths if possible, or correct escaping.
-    
-    # helper to fix path for ffmpeg filter
-    def ffmpeg_path(p):
-        return p.replace("\\", "/").replace(":", "\\:")
+    return p.replace("\\", "/").replace(":", "\\:")
 
-    srt_arg = ffmpeg_path(srt_path)
-    
+def subtitles_filter(srt_path: str, font_size: int = 26) -> str:
+    srt_arg = filter_path(srt_path)
+    return f"subtitles='{srt_arg}':force_style='Alignment=10,Fontsize={font_size},MarginV=70,Outline=2,Shadow=1'"
+
+def burn_subtitles(video_path: str, srt_path: str, output_path: str, font_size: int = 26, threads: int = 0,
+                   start: float = None, end: float = None, on_progress=None, encoder: dict = None):
+    # Hard burn subtitles
+    # start/end read a range of video_path directly (deferred cut); subtitle times are clip-relative
+    encoder = encoder or resolve_encoder()
     cmd = [
         "ffmpeg", "-y",
+        *seek_args(start, end),
         "-i", video_path,
-        "-vf", f"subtitles='{srt_arg}':force_style='Alignment=10,Fontsize={font_size},MarginV=70,Outline=2,Shadow=1'",
+        "-vf", subtitles_filter(srt_path, font_size),
+        *encoder_args(encoder, threads),
+        *pix_fmt_args(video_path),
         "-c:a", "copy",
         output_path
     ]
-    subprocess.run(cmd, check=True)
+    run_encode(cmd, encoder, output_path, on_progress, quiet=False)
 
-def upscale_video(input_path: str, output_path: str):
-    # Upscale to 4k (3840x2160) using Lanczos and Unsharp Mask
+def upscale_video(input_path: str, output_path: str, threads: int = 0, start: float = None, end: float = None,
+                  on_progress=None, encoder: dict = None, scale_filter: str = UPSCALE_FILTER):
+    # start/end read a range of input_path directly (deferred cut)
+    # scale_filter comes from upscale_filter() for the source's size and the job's quality
+    encoder = encoder or resolve_encoder(upscale=True)
     cmd = [
         "ffmpeg", "-y",
+        *seek_args(start, end),
         "-i", input_path,
-        "-vf", "scale=3840:2160:flags=lanczos,unsharp=5:5:1.0:5:5:0.0",
-        "-c:v", "libx264", "-preset", "veryfast", "-crf", "20", # slightly better quality for 4k
+        "-vf", scale_filter,
+        *encoder_args(encoder, threads),
+        *pix_fmt_args(input_path),
         "-c:a", "copy",
         output_path
     ]
-    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    run_encode(cmd, encoder, output_path, on_progress)
+
+def reframe_video(input_path: str, output_path: str, crop_filter: str, threads: int = 0, start: float = None,
+                  end: float = None, on_progress=None, encoder: dict = None):
+    # Staged-mode reframing; crop_filter comes from reframe.plan_reframe()
+    encoder = encoder or resolve_encoder()
+    cmd = [
+        "ffmpeg", "-y",
+        *seek_args(start, end),
+        "-i", input_path,
+        "-vf", crop_filter,
+        *encoder_args(encoder, threads),
+        *pix_fmt_args(input_path),
+        "-c:a", "aac",
+        output_path
+    ]
+    run_encode(cmd, encoder, output_path, on_progress)
+
+# Merge mode opens the source once per range up to this many ranges (each input seeks
+# straight to its range); beyond it, one decode is split and trimmed, as long as the
+# ranges run in source order
+MERGE_MAX_INPUTS = int(os.getenv("MERGE_MAX_INPUTS", "16"))
+
+def build_clip_command(input_path: str, output_path: str, start: float = None, end: float = None,
+                       upscale: bool = False, srt_path: str = None, font_size: int = 26, threads: int = 0,
+                       encoder: dict = None, scale_filter: str = UPSCALE_FILTER, crop_filter: str = None) -> list[str]:
+    """
+    Composes seek, vertical reframing, 4k upscale and subtitle burn into a single ffmpeg
+    invocation, so a clip is decoded and encoded once with no intermediate files.
+    """
+    filters = []
+    if crop_filter:
+        # Crop first so scaling and subtitles work on the reframed picture
+        filters.append(crop_filter)
+    if upscale:
+        filters.append(scale_filter)
+    if srt_path:
+        # Subtitles go after scaling so they render at output resolution
+        filters.append(subtitles_filter(srt_path, font_size))
+
+    cmd = ["ffmpeg", "-y", *seek_args(start, end), "-i", input_path]
+    if filters:
+        cmd += ["-vf", ",".join(filters)]
+    cmd += [
+        *encoder_args(encoder or resolve_encoder(upscale=upscale), threads),
+        *pix_fmt_args(input_path),
+        "-c:a", "aac",
+        output_path
+    ]
+    return cmd
+
+def render_clip(input_path: str, output_path: str, start: float = None, end: float = None,
+                upscale: bool = False, srt_path: str = None, font_size: int = 26, threads: int = 0,
+                on_progress=None, encoder: dict = None, scale_filter: str = UPSCALE_FILTER, crop_filter: str = None):
+    encoder = encoder or resolve_encoder(upscale=upscale)
+    cmd = build_clip_command(input_path, output_path, start, end, upscale, srt_path, font_size, threads, encoder,
+                             scale_filter, crop_filter)
+    run_encode(cmd, encoder, output_path, on_progress)
+
+def build_merge_command(input_path: str, output_path: str, ranges: list[tuple[float, float]], has_audio: bool = True,
+                        crop_filters: list[str] = None, upscale: bool = False, srt_path: str = None,
+                        font_size: int = 26, threads: int = 0, encoder: dict = None,
+                        scale_filter: str = UPSCALE_FILTER) -> list[str]:
+    """
+    Joins ranges of input_path into one clip in a single ffmpeg run with no segment files:
+    each range is read through its own input-side seek (or, beyond MERGE_MAX_INPUTS ranges
+    in source order, trimmed out of one shared decode) and the concat filter joins them,
+    followed by the same
+    upscale/subtitle chain as build_clip_command. crop_filters holds one reframing crop per
+    range; its crop track times are relative to the start of the range.
+    """
+    n = len(ranges)
+    # A shared decode only streams when each range starts after the previous one ends;
+    # otherwise split would hold every decoded frame of the later ranges in memory until
+    # concat got to them
+    in_order = all(end <= start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    per_input = n <= MERGE_MAX_INPUTS or not in_order
+    cmd = ["ffmpeg", "-y"]
+    graph = []
+    if per_input:
+        for start, end in ranges:
+            cmd += [*seek_args(start, end), "-i", input_path]
+    else:
+        cmd += ["-i", input_path]
+        graph.append(f"[0:v]split={n}" + "".join(f"[sv{i}]" for i in range(n)))
+        if has_audio:
+            graph.append(f"[0:a]asplit={n}" + "".join(f"[sa{i}]" for i in range(n)))
+
+    joined = ""
+    for i, (start, end) in enumerate(ranges):
+        video_in, audio_in = (f"[{i}:v]", f"[{i}:a]") if per_input else (f"[sv{i}]", f"[sa{i}]")
+        video = [] if per_input else [f"trim=start={start}:end={end},setpts=PTS-STARTPTS"]
+        if crop_filters and crop_filters[i]:
+            video.append(crop_filters[i])
+        graph.append(f"{video_in}{','.join(video) or 'null'}[v{i}]")
+        joined += f"[v{i}]"
+        if has_audio:
+            audio = "anull" if per_input else f"atrim=start={start}:end={end},asetpts=PTS-STARTPTS"
+            graph.append(f"{audio_in}{audio}[a{i}]")
+            joined += f"[a{i}]"
+    graph.append(f"{joined}concat=n={n}:v=1:a={1 if has_audio else 0}[vc]" + ("[ac]" if has_audio else ""))
+
+    filters = []
+    if upscale:
+        filters.append(scale_filter)
+    if srt_path:
+        filters.append(subtitles_filter(srt_path, font_size))
+    graph.append(f"[vc]{','.join(filters) or 'null'}[vout]")
+
+    cmd += ["-filter_complex", ";".join(graph), "-map", "[vout]"]
+    if has_audio:
+        cmd += ["-map", "[ac]", "-c:a", "aac"]
+    cmd += [
+        *encoder_args(encoder or resolve_encoder(upscale=upscale), threads),
+        *pix_fmt_args(input_path),
+        output_path
+    ]
+    return cmd
+
+def merge_video(input_path: str, output_path: str, ranges: list[tuple[float, float]], has_audio: bool = True,
+                crop_filters: list[str] = None, upscale: bool = False, srt_path: str = None, font_size: int = 26,
+                threads: int = 0, on_progress=None, encoder: dict = None, scale_filter: str = UPSCALE_FILTER):
+    encoder = encoder or resolve_encoder(upscale=upscale)
+    cmd = build_merge_command(input_path, output_path, ranges, has_audio, crop_filters, upscale, srt_path,
+                              font_size, threads, encoder, scale_filter)
+    run_encode(cmd, encoder, output_path, on_progress)
+
+def merge_copy(input_path: str, output_path: str, ranges: list[tuple[float, float]],
+               keyframes: list[float]) -> list[tuple[float, float]]:
+    """
+    Stream-copies ranges of input_path into one file through the concat demuxer's
+    inpoint/outpoint directives: nothing is decoded or encoded and no segment files are
+    written. Starts snap back to keyframes; returns the ranges actually copied.
+    """
+    snapped = [(snap_to_keyframe(keyframes, start), end) for start, end in ranges]
+    list_path = output_path.replace(".mp4", ".txt")
+    safe_path = os.path.abspath(input_path).replace("\\", "/").replace("'", "'\\''")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for start, end in snapped:
+            f.write(f"file '{safe_path}'\ninpoint {start:.3f}\noutpoint {end:.3f}\n")
+    cmd = [
+        "ffmpeg", "-y",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", list_path,
+        "-c", "copy",
+        "-avoid_negative_ts", "make_zero",
+        output_path
+    ]
+    try:
+        run_ffmpeg(cmd)
+    finally:
+        if os.path.exists(list_path):
+            os.remove(list_path)
+    return snapped
+
+def split_video(input_path: str, output_pattern: str, split_times: list[float], threads: int = 0,
+                on_segment=None, start_number: int = 1, encoder: dict = None):
+    """
+    Splits the whole source into consecutive parts with one decode and one encode, using the
+    segment muxer. output_pattern contains %d for the part number. Keyframes are forced at
+    every split point so parts are frame-accurate. on_segment(number, path) fires as each part
+    is finalized, so downstream stages can start before the split has finished.
+    """
+    encoder = encoder or resolve_encoder()
+    times = ",".join(f"{t:.3f}" for t in split_times)
+    cmd = [
+        "ffmpeg", "-y",
+        "-i", input_path,
+        "-map", "0:v:0", "-map", "0:a?",
+        *encoder_args(encoder, threads),
+        *pix_fmt_args(input_path),
+        "-c:a", "aac",
+    ]
+    if times:
+        cmd += ["-force_key_frames", times, "-segment_times", times]
+    cmd += [
+        "-f", "segment",
+        "-segment_start_number", str(start_number),
+        "-reset_timestamps", "1",
+        # The segment list on stdout gets one csv line per finished part
+        "-segment_list", "pipe:1",
+        "-segment_list_type", "csv",
+        output_pattern
+    ]
+    output_dir = os.path.dirname(output_pattern)
+    number = start_number
+    started = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    for line in proc.stdout:
+        name = line.strip().split(",")[0]
+        if not name:
+            continue
+        if on_segment:
+            on_segment(number, os.path.join(output_dir, os.path.basename(name)))
+        number += 1
+    if wait_ffmpeg(proc, cmd) != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    source = probe_media(input_path)
+    speed_history.record(encoder["preset"], source.duration, time.perf_counter() - started,
+                         source.width * source.height)
 
 def concat_videos(video_paths: list[str], output_path: str):
     # Create a temporary file list for ffmpeg concat demuxer
@@ -92,7 +701,7 @@ def concat_videos(video_paths: list[str], output_path: str):
         output_path
     ]
     try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        run_ffmpeg(cmd)
     finally:
         if os.path.exists(list_path):
             os.remove(list_path)
@@ -0,0 +1,143 @@
+import re
+import subprocess
+import numpy as np
+from .ffmpeg_utils import stream_audio, AUDIO_RATE
+
+# Analysis resolution: one feature value per hop
+HOP_SECONDS = 0.5
+SILENCE_DB = -45.0 # frames quieter than this (dBFS) count as silence
+SNAP_TOLERANCE = 4.0 # seconds a boundary may move to land on a sentence end
+SCENE_THRESHOLD = 0.3
+
+# Score weights for the z-scored window features
+WEIGHTS = {"energy": 1.0, "speech": 1.5, "silence": 2.0, "scene": 0.5}
+
+SENTENCE_END = re.compile(r"[.!?…]['\")\]]*$")
+
+
+def frame_rms(chunks, rate: int = AUDIO_RATE, hop: float = HOP_SECONDS) -> np.ndarray:
+    """
+    RMS level per hop of mono float32 PCM given as an iterable of chunks (e.g. streamed
+    from ffmpeg), so long sources never have to be held in memory as a whole.
+    """
+    hop_samples = max(1, int(rate * hop))
+    levels = []
+    carry = np.zeros(0, dtype=np.float32)
+    for chunk in chunks:
+        samples = np.concatenate((carry, chunk)) if len(carry) else chunk
+        usable = len(samples) // hop_samples * hop_samples
+        carry = samples[usable:]
+        if usable == 0:
+            continue
+        frames = samples[:usable].reshape(-1, hop_samples)
+        levels.append(np.sqrt(np.mean(frames * frames, axis=1)))
+    return np.concatenate(levels) if levels else np.zeros(0, dtype=np.float32)
+
+
+def scene_changes(video_path: str, threshold: float = SCENE_THRESHOLD) -> list[float]:
+    # Scene scores on a tiny downscaled copy of the video; only the cut times are kept
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostats",
+        "-i", video_path,
+        "-an", "-vf", f"scale=160:-2,select='gt(scene,{threshold})',showinfo",
+        "-f", "null", "-"
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    return [float(t) for t in re.findall(r"pts_time:([\d.]+)", result.stderr)]
+
+
+def _zscore(x: np.ndarray) -> np.ndarray:
+    std = x.std()
+    return (x - x.mean()) / std if std > 0 else np.zeros_like(x)
+
+
+def _window_sums(values: np.ndarray, width: int) -> np.ndarray:
+    # Sum over every window of `width` hops via a cumulative sum (O(n) for all windows)
+    csum = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    return csum[width:] - csum[:-width]
+
+
+def score_windows(rms: np.ndarray, clip_duration: float, words: list[dict] = None,
+                  scenes: list[float] = None, hop: float = HOP_SECONDS) -> np.ndarray:
+    """
+    Scores every window of clip_duration (one per hop) by loudness, speech rate, silence
+    and scene-cut density. Returns an array indexed by window start hop.
+    """
+    n = len(rms)
+    width = max(1, int(round(clip_duration / hop)))
+    if n < width:
+        return np.zeros(0)
+
+    db = 20 * np.log10(np.maximum(rms, 1e-6))
+    silent = (db < SILENCE_DB).astype(np.float32)
+    voiced_db = np.where(silent > 0, SILENCE_DB, db)
+
+    score = WEIGHTS["energy"] * _zscore(_window_sums(voiced_db, width) / width)
+    score -= WEIGHTS["silence"] * _window_sums(silent, width) / width
+
+    if words:
+        mids = np.array([(w["start"] + w["end"]) / 2 for w in words])
+        per_hop = np.bincount(np.clip((mids / hop).astype(int), 0, n - 1), minlength=n)
+        score += WEIGHTS["speech"] * _zscore(_window_sums(per_hop, width))
+
+    if scenes:
+        per_hop = np.bincount(np.clip((np.array(scenes) / hop).astype(int), 0, n - 1), minlength=n)
+        score += WEIGHTS["scene"] * _zscore(_window_sums(per_hop, width))
+
+    return score
+
+
+def _snap(t: float, sentence_ends: np.ndarray, lo: float, hi: float) -> float:
+    if len(sentence_ends) == 0:
+        return t
+    candidates = sentence_ends[(sentence_ends >= max(lo, t - SNAP_TOLERANCE)) & (sentence_ends <= min(hi, t + SNAP_TOLERANCE))]
+    if len(candidates) == 0:
+        return t
+    return float(candidates[np.argmin(np.abs(candidates - t))])
+
+
+def pick_highlights(score: np.ndarray, clip_duration: float, top_k: int, source_duration: float,
+                    words: list[dict] = None, hop: float = HOP_SECONDS) -> list[tuple[float, float]]:
+    """
+    Greedily takes the best-scoring non-overlapping windows, then moves each boundary to the
+    nearest sentence end (from word timestamps) so clips don't start or stop mid-sentence.
+    Returned in source order.
+    """
+    width = max(1, int(round(clip_duration / hop)))
+    taken = np.zeros(len(score) + width, dtype=bool)
+    picks = []
+    for i in np.argsort(score)[::-1]:
+        if len(picks) >= top_k:
+            break
+        # taken marks every start whose window would overlap an earlier pick
+        if taken[i]:
+            continue
+        taken[max(0, i - width + 1):i + width] = True
+        picks.append(float(i * hop))
+
+    sentence_ends = np.array(sorted(w["end"] for w in words or [] if SENTENCE_END.search(w["word"].strip())))
+    clips = []
+    previous_end = 0.0
+    for start in sorted(picks):
+        end = min(start + clip_duration, source_duration)
+        # Start right after a sentence ends (never inside the previous clip); stop where one ends
+        start = max(_snap(start, sentence_ends, previous_end, end - 5), previous_end)
+        end = _snap(end, sentence_ends, start + 5, source_duration)
+        clips.append((round(float(start), 3), round(float(end), 3)))
+        previous_end = end
+    return clips
+
+
+def find_highlights(video_path: str, clip_duration: float, top_k: int, source_duration: float,
+                    words: list[dict] = None, scenes: bool = False) -> list[tuple[float, float]]:
+    """
+    Picks the top_k clip ranges worth encoding from the source's audio, streamed from
+    ffmpeg (and, with scenes, scene changes). Cheap enough to run well ahead of real
+    time on CPU.
+    """
+    rms = frame_rms(stream_audio(video_path))
+    scenes = scene_changes(video_path) if scenes else None
+    score = score_windows(rms, clip_duration, words, scenes)
+    if len(score) == 0:
+        return [(0.0, source_duration)] if source_duration > 5 else []
+    return pick_highlights(score, clip_duration, top_k, source_duration, words)
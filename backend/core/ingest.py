@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import yt_dlp
+from .jobstore import job_store
+
+UPLOAD_DIR = "temp/uploads"
+# url/video-id -> downloaded path, so the same video is only fetched once
+INDEX_PATH = os.path.join(UPLOAD_DIR, "url_index.json")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+FRAGMENT_CONCURRENCY = int(os.getenv("INGEST_FRAGMENTS", "4"))
+PROGRESS_INTERVAL = 0.5 # seconds between progress writes to the store
+
+ingest_pool = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+_lock = threading.Lock()
+_inflight = {} # url -> ingest id
+_callbacks = {} # ingest id -> on_complete callbacks
+
+
+def _load_index() -> dict:
+    # Callers hold _lock
+    if not os.path.exists(INDEX_PATH):
+        return {}
+    with open(INDEX_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _lookup(*keys):
+    with _lock:
+        index = _load_index()
+    for key in keys:
+        path = index.get(key)
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def _remember(path: str, *keys):
+    with _lock:
+        index = _load_index()
+        for key in keys:
+            index[key] = path
+        # Written aside and renamed into place, so a crash mid-write can't corrupt the index
+        tmp_path = INDEX_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, INDEX_PATH)
+
+
+def fail_stale_ingests():
+    """
+    Downloads run on this process's thread pool, so any ingest still in progress at startup
+    died with the previous process; mark it failed so pollers stop waiting for it.
+    """
+    for ingest_id in job_store.ids_in_state("ingesting"):
+        job_store.update(ingest_id, status="failed", error="Download interrupted by a server restart")
+        job_store.set_state(ingest_id, "failed")
+        print(f"Ingest {ingest_id} was interrupted; marked failed")
+
+
+def _result(file_id: str, path: str) -> dict:
+    # Same shape as the /upload response so the frontend can go straight to /job
+    return {"id": file_id, "path": path, "filename": os.path.basename(path)}
+
+
+def start_ingest(url: str, on_complete=None) -> str:
+    """
+    Queues a download of url and returns its ingest id; GET /job/{id} reports progress.
+    on_complete(ingest_id, result) runs once the file has landed (used to chain a job).
+    Identical URLs share one in-flight download, and already-downloaded ones finish at once.
+    """
+    url = url.strip()
+    with _lock:
+        ingest_id = _inflight.get(url)
+        if ingest_id is None:
+            ingest_id = str(uuid.uuid4())
+            job_store.create(ingest_id, {"url": url}, state="ingesting", type="ingest", progress={})
+            _inflight[url] = ingest_id
+            _callbacks[ingest_id] = []
+            ingest_pool.submit(_run_ingest, ingest_id, url)
+        if on_complete:
+            _callbacks[ingest_id].append(on_complete)
+    return ingest_id
+
+
+def _finish(ingest_id: str, url: str, result: dict):
+    record = job_store[ingest_id]
+    record["result"] = result
+    record["status"] = "completed"
+    job_store.set_state(ingest_id, "completed")
+    with _lock:
+        callbacks = _callbacks.pop(ingest_id, [])
+        if _inflight.get(url) == ingest_id:
+            del _inflight[url]
+    for callback in callbacks:
+        try:
+            callback(ingest_id, result)
+        except Exception as e:
+            print(f"Ingest {ingest_id} follow-up failed: {e}")
+
+
+def _run_ingest(ingest_id: str, url: str):
+    record = job_store[ingest_id]
+    try:
+        existing = _lookup(url)
+        if existing:
+            _finish(ingest_id, url, _result(ingest_id, existing))
+            return
+
+        last_write = [0.0]
+
+        def progress_hook(d):
+            now = time.monotonic()
+            if d.get("status") == "downloading" and now - last_write[0] < PROGRESS_INTERVAL:
+                return
+            last_write[0] = now
+            record["progress"] = {
+                "state": d.get("status"),
+                "downloaded_bytes": d.get("downloaded_bytes"),
+                "total_bytes": d.get("total_bytes") or d.get("total_bytes_estimate"),
+                "speed": d.get("speed"),
+                "eta": d.get("eta"),
+                "fragment_index": d.get("fragment_index"),
+                "fragment_count": d.get("fragment_count")
+            }
+
+        ydl_opts = {
+            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+            'outtmpl': f'{UPLOAD_DIR}/{ingest_id}_%(title)s.%(ext)s',
+            'noplaylist': True,
+            'concurrent_fragment_downloads': FRAGMENT_CONCURRENCY,
+            'progress_hooks': [progress_hook],
+            'quiet': True,
+        }
+
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            # Resolve metadata first (cheap) so a different URL for the same video is deduplicated
+            record["status"] = "resolving"
+            info = ydl.extract_info(url, download=False)
+            video_key = f"{info.get('extractor_key')}:{info.get('id')}"
+            existing = _lookup(video_key)
+            if existing:
+                _remember(existing, url)
+                _finish(ingest_id, url, _result(ingest_id, existing))
+                return
+
+            record["status"] = "downloading"
+            info = ydl.process_ie_result(info, download=True)
+            # Merged formats change the extension after prepare_filename; prefer what was written
+            downloads = info.get("requested_downloads") or []
+            filename = downloads[0].get("filepath") if downloads else None
+            if not filename or not os.path.exists(filename):
+                filename = ydl.prepare_filename(info)
+
+        _remember(filename, url, video_key)
+        _finish(ingest_id, url, _result(ingest_id, filename))
+    except Exception as e:
+        record["status"] = "failed"
+        record["error"] = str(e)
+        job_store.set_state(ingest_id, "failed")
+        print(f"Ingest {ingest_id} failed: {e}")
+    finally:
+        with _lock:
+            _callbacks.pop(ingest_id, None)
+            if _inflight.get(url) == ingest_id:
+                del _inflight[url]
@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "temp/jobs.db")
+# Jobs allowed to run at once across every worker sharing the database
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
+# A worker that hasn't heartbeated for this long is presumed dead and its job is re-queued
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# A job whose worker died this many times is failed instead of leased again
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Separate worker processes publish their counters this often; the API drops ones that
+# haven't been refreshed for a few intervals (the worker has gone)
+STATS_INTERVAL = float(os.getenv("WORKER_STATS_INTERVAL", "5"))
+STATS_MAX_AGE = 3 * STATS_INTERVAL
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (state, priority DESC, created_at);
+CREATE TABLE IF NOT EXISTS process_stats (
+    process_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+
+class JobRecord(dict):
+    """
+    A job's status record. Assigning a key writes it through to the store, so
+    process_job can keep doing jobs_store[job_id]["status"] = "...".
+    """
+
+    def __init__(self, store, job_id, data):
+        super().__init__(data)
+        self._store = store
+        self._job_id = job_id
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._store.update(self._job_id, **{key: value})
+
+
+class JobStore:
+    """
+    Durable job store and queue backed by SQLite.
+
+    `state` drives the queue (queued -> running -> completed/failed); the JSON `data`
+    column is the record clients see (status, config, output_files, error, ...).
+    """
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit connection per call; explicit BEGIN IMMEDIATE where we need atomicity
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def create(self, job_id: str, config: dict, priority: int = 0, state: str = "queued", **fields):
+        # Only state 'queued' is picked up by workers; other states are for records
+        # driven elsewhere (e.g. URL ingests running in the API process)
+        data = {"status": state, "config": config, **fields}
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, state, priority, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                (job_id, state, priority, time.time(), json.dumps(data))
+            )
+
+    def create_many(self, jobs: list[tuple[str, dict, int]]):
+        # (job_id, config, priority) rows in one transaction; they lease in list order
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO jobs (id, state, priority, created_at, data) VALUES (?, 'queued', ?, ?, ?)",
+                [(job_id, priority, now, json.dumps({"status": "queued", "config": config}))
+                 for job_id, config, priority in jobs]
+            )
+            conn.execute("COMMIT")
+
+    def set_state(self, job_id: str, state: str):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET state = ? WHERE id = ?", (state, job_id))
+
+    def get(self, job_id: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, job_ids: list[str]) -> dict:
+        # Records of several jobs in one query; missing ids are left out
+        found = {}
+        with self._connect() as conn:
+            for i in range(0, len(job_ids), 500):
+                chunk = job_ids[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT id, data FROM jobs WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update((job_id, json.loads(data)) for job_id, data in rows)
+        return found
+
+    def __contains__(self, job_id):
+        return self.get(job_id) is not None
+
+    def __getitem__(self, job_id):
+        data = self.get(job_id)
+        if data is None:
+            raise KeyError(job_id)
+        return JobRecord(self, job_id, data)
+
+    def update(self, job_id: str, **fields):
+        # Read-modify-write under an immediate transaction so concurrent updates don't drop fields
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return
+            data = json.loads(row[0])
+            data.update(fields)
+            conn.execute("UPDATE jobs SET data = ? WHERE id = ?", (json.dumps(data), job_id))
+            conn.execute("COMMIT")
+
+    def lease(self, worker_id: str):
+        """
+        Claims the next runnable job for worker_id, or returns None. Runnable means queued,
+        or running under a lease that has expired (its worker crashed). Highest priority
+        first, then FIFO (insertion order for jobs created together). Returns (job_id, config).
+        Expired jobs that have already been leased MAX_ATTEMPTS times are failed on the way.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                running = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE state = 'running' AND lease_expires >= ?", (now,)
+                ).fetchone()[0]
+                if running >= MAX_CONCURRENT_JOBS:
+                    conn.execute("ROLLBACK")
+                    return None
+                while True:
+                    row = conn.execute(
+                        "SELECT id, data, attempts FROM jobs WHERE state = 'queued' OR (state = 'running' AND lease_expires < ?) "
+                        "ORDER BY priority DESC, created_at, rowid LIMIT 1", (now,)
+                    ).fetchone()
+                    if row is None or row[2] < MAX_ATTEMPTS:
+                        break
+                    # Every worker that ran it died (or stalled) mid-job; don't let it take down another
+                    data = json.loads(row[1])
+                    data.update(status="failed", error=f"Gave up after {row[2]} attempts")
+                    conn.execute(
+                        "UPDATE jobs SET state = 'failed', lease_owner = NULL, lease_expires = NULL, data = ? WHERE id = ?",
+                        (json.dumps(data), row[0])
+                    )
+                    print(f"Job {row[0]} failed after {row[2]} attempts")
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET state = 'running', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                    (worker_id, now + LEASE_SECONDS, row[0])
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return row[0], json.loads(row[1])["config"]
+
+    def active(self) -> dict:
+        # Queued and running jobs (including ones with expired leases, which will be
+        # re-leased) mapped to their configs
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, data FROM jobs WHERE state IN ('queued', 'running')").fetchall()
+        return {job_id: json.loads(data)["config"] for job_id, data in rows}
+
+    def ids_in_state(self, state: str) -> list[str]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM jobs WHERE state = ? ORDER BY rowid", (state,)).fetchall()
+        return [row[0] for row in rows]
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        # Returns False if the lease was lost (another worker took the job over)
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND state = 'running'",
+                (time.time() + LEASE_SECONDS, job_id, worker_id)
+            )
+        return cur.rowcount == 1
+
+    def finish(self, job_id: str, worker_id: str):
+        # process_job leaves "completed" or "failed" in the record; mirror it into the queue state
+        data = self.get(job_id) or {}
+        state = "completed" if data.get("status") == "completed" else "failed"
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, lease_owner = NULL, lease_expires = NULL WHERE id = ? AND lease_owner = ?",
+                (state, job_id, worker_id)
+            )
+
+    def publish_stats(self, process_id: str, stats: dict):
+        # Latest counters of one worker process (metrics, cache, transcription)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO process_stats (process_id, updated_at, data) VALUES (?, ?, ?)",
+                (process_id, time.time(), json.dumps(stats))
+            )
+
+    def process_stats(self, max_age: float = STATS_MAX_AGE) -> list[dict]:
+        # Counters published by worker processes that are still reporting
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT data FROM process_stats WHERE updated_at >= ? ORDER BY process_id", (time.time() - max_age,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+job_store = JobStore()
@@ -1,24 +1,34 @@
 import os
-import google.generativeai as genai
+import re
+import time
+import hashlib
+import asyncio
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Dict
 
-def generate_viral_metadata(transcript: str) -> Dict[str, str]:
-    """
-    Generates viral title, description, and hashtags based on the transcript using Gemini.
-    """
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        return {
-            "title": "Shorts Video",
-            "description": "Generated by Local Shorts Generator",
-            "hashtags": "#shorts #video"
-        }
+# "gemini" (needs GEMINI_API_KEY) or "stub" (local, deterministic; for tests and offline
+# deployments). Defaults to gemini when a key is set.
+METADATA_BACKEND = os.getenv("METADATA_BACKEND", "")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro")
+# Generated metadata is reused for this long per transcript
+METADATA_TTL = float(os.getenv("METADATA_TTL", "86400"))
+METADATA_CACHE_ENTRIES = int(os.getenv("METADATA_CACHE_ENTRIES", "1000"))
+# Remote calls: at most this many at once, and this many per minute
+METADATA_CONCURRENCY = int(os.getenv("METADATA_CONCURRENCY", "2"))
+METADATA_RATE_PER_MINUTE = float(os.getenv("METADATA_RATE_PER_MINUTE", "30"))
+# Threads of the service's own executor: requests waiting on the rate limit or on a
+# coalesced call park here, not in the event loop's default executor
+METADATA_WORKERS = int(os.getenv("METADATA_WORKERS", "8"))
 
-    try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-pro')
+FALLBACK = {
+    "title": "New Short",
+    "description": "Watch this amazing clip!",
+    "hashtags": "#shorts #viral #trending"
+}
 
-        prompt = f"""
+PROMPT = """
         You are a social media expert. Based on the following transcript from a short video, generate:
         1. A catchy, viral Title (max 60 chars).
         2. A compelling Description (max 150 chars).
@@ -33,33 +43,194 @@ def generate_viral_metadata(transcript: str) -> Dict[str, str]:
         Hashtags: [Your Hashtags]
         """
 
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-        
-        # Parse logic
-        lines = text.split('\n')
-        title = "Cool Video"
-        desc = "Check this out!"
-        tags = "#shorts"
-
-        for line in lines:
-            if line.startswith("Title:"):
-                title = line.replace("Title:", "").strip()
-            elif line.startswith("Description:"):
-                desc = line.replace("Description:", "").strip()
-            elif line.startswith("Hashtags:"):
-                tags = line.replace("Hashtags:", "").strip()
-        
-        return {
-            "title": title,
-            "description": desc,
-            "hashtags": tags
-        }
 
-    except Exception as e:
-        print(f"Metadata generation failed: {e}")
+def parse_metadata(text: str) -> Dict[str, str]:
+    title = "Cool Video"
+    desc = "Check this out!"
+    tags = "#shorts"
+    for line in text.strip().split('\n'):
+        line = line.strip()
+        if line.startswith("Title:"):
+            title = line.replace("Title:", "").strip()
+        elif line.startswith("Description:"):
+            desc = line.replace("Description:", "").strip()
+        elif line.startswith("Hashtags:"):
+            tags = line.replace("Hashtags:", "").strip()
+    return {"title": title, "description": desc, "hashtags": tags}
+
+
+class GeminiBackend:
+    """Gemini via google-generativeai; the client is configured and the model built once."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str = GEMINI_MODEL):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.name = f"gemini:{model}"
+        self.model = genai.GenerativeModel(model)
+
+    def generate(self, transcript: str) -> Dict[str, str]:
+        response = self.model.generate_content(PROMPT.format(transcript=transcript))
+        return parse_metadata(response.text)
+
+
+class StubBackend:
+    """
+    Offline stand-in: a title from the opening words and hashtags from the most frequent
+    longer words of the transcript. Deterministic, so tests can assert on it.
+    """
+
+    name = "stub"
+
+    def generate(self, transcript: str) -> Dict[str, str]:
+        words = re.findall(r"[A-Za-z0-9']+", transcript)
+        if not words:
+            return {"title": "Shorts Video", "description": "Generated by Local Shorts Generator",
+                    "hashtags": "#shorts #video"}
+        title = " ".join(words[:8])
+        description = " ".join(words[:25])
+        common = [w for w, _ in Counter(w.lower() for w in words if len(w) > 4).most_common(5)]
         return {
-            "title": "New Short",
-            "description": "Watch this amazing clip!",
-            "hashtags": "#shorts #viral #trending"
+            "title": title[:60],
+            "description": description[:150],
+            "hashtags": " ".join(["#shorts"] + [f"#{w}" for w in common])
         }
+
+
+# name -> factory(); register_backend() adds more (e.g. a local LLM)
+BACKENDS = {
+    "gemini": lambda: GeminiBackend(os.getenv("GEMINI_API_KEY")),
+    "stub": StubBackend,
+}
+
+
+def register_backend(name: str, factory):
+    BACKENDS[name] = factory
+
+
+class MetadataService:
+    """
+    Metadata generation shared by every /share request: one backend instance, results
+    cached per transcript for `ttl` seconds, identical requests in flight coalesced onto
+    one call, and remote calls limited in concurrency and rate. generate() blocks; async
+    callers use agenerate(), which runs it on the service's own threads.
+    """
+
+    def __init__(self, backend=None, ttl: float = METADATA_TTL, max_entries: int = METADATA_CACHE_ENTRIES,
+                 concurrency: int = METADATA_CONCURRENCY, rate_per_minute: float = METADATA_RATE_PER_MINUTE,
+                 workers: int = METADATA_WORKERS):
+        self._backend = backend
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="metadata")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self._slots = threading.BoundedSemaphore(max(1, concurrency))
+        self._lock = threading.Lock()
+        self._cache = OrderedDict() # key -> (expires, metadata)
+        self._in_flight = {} # key -> Future
+        self._next_call = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    @property
+    def backend(self):
+        # Built on first use, so importing this module never touches the network
+        with self._lock:
+            if self._backend is None:
+                name = METADATA_BACKEND or ("gemini" if os.getenv("GEMINI_API_KEY") else "stub")
+                self._backend = BACKENDS[name]()
+            return self._backend
+
+    def set_backend(self, backend):
+        # Swap the backend (tests, offline mode); cached results of the old one are dropped
+        with self._lock:
+            self._backend = backend
+            self._cache.clear()
+
+    def _throttle(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def generate(self, transcript: str) -> Dict[str, str]:
+        try:
+            backend = self.backend
+        except Exception as e:
+            # Misconfigured backend (missing package, bad key): fall back, retry next request
+            print(f"Metadata backend unavailable: {e}")
+            with self._lock:
+                self.failures += 1
+            return dict(FALLBACK)
+        key = hashlib.sha256(f"{backend.name}\0{transcript}".encode("utf-8")).hexdigest()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return dict(entry[1])
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                self._in_flight[key] = produced = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if in_flight is not None:
+            return dict(in_flight.result())
+
+        try:
+            with self._slots:
+                self._throttle()
+                metadata = backend.generate(transcript)
+            with self._lock:
+                self._cache[key] = (time.monotonic() + self.ttl, metadata)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        except Exception as e:
+            # Failures aren't cached; the next request tries again
+            print(f"Metadata generation failed: {e}")
+            metadata = FALLBACK
+            with self._lock:
+                self.failures += 1
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        produced.set_result(metadata)
+        return dict(metadata)
+
+    async def agenerate(self, transcript: str) -> Dict[str, str]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.generate, transcript)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": self._backend.name if self._backend else None, "entries": len(self._cache),
+                    "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                    "failures": self.failures}
+
+
+metadata_service = MetadataService()
+
+
+def srt_text(srt_path: str) -> str:
+    # Caption text of an SRT, without numbers and timings
+    transcript_lines = []
+    with open(srt_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.isdigit() or "-->" in line:
+                continue
+            transcript_lines.append(line)
+    return " ".join(transcript_lines)
+
+
+def generate_viral_metadata(transcript: str) -> Dict[str, str]:
+    """
+    Generates viral title, description, and hashtags based on the transcript, through the
+    shared service (Gemini, or the local stub without an API key).
+    """
+    return metadata_service.generate(transcript)
@@ -0,0 +1,265 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+DURATION_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+# Seconds between writes of a job's spans to its record (the last write is forced)
+TRACE_INTERVAL = 1.0
+
+_local = threading.local()
+
+
+def _stack() -> list:
+    # Open spans of this thread, innermost last
+    if not hasattr(_local, "spans"):
+        _local.spans = []
+    return _local.spans
+
+
+class MetricsRegistry:
+    """
+    Process-wide totals per stage, rendered in the Prometheus text format for /metrics.
+    Separate worker processes publish snapshot() through the job store and the API process
+    renders its own totals plus theirs.
+    """
+
+    def __init__(self, buckets: tuple = DURATION_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._stages = {} # stage -> totals
+        self._in_progress = {} # stage -> open spans
+        self._jobs = {} # final status -> count
+        self._ffmpeg = {"runs": 0, "failures": 0, "cpu": 0.0}
+
+    def _totals(self, stage: str) -> dict:
+        if stage not in self._stages:
+            self._stages[stage] = {"buckets": [0] * len(self.buckets), "count": 0, "wall": 0.0, "cpu": 0.0,
+                                   "bytes_in": 0, "bytes_out": 0, "errors": 0, "speed_sum": 0.0, "speed_count": 0}
+        return self._stages[stage]
+
+    def opened(self, stage: str, delta: int = 1):
+        with self._lock:
+            self._in_progress[stage] = self._in_progress.get(stage, 0) + delta
+
+    def observe(self, span: dict):
+        with self._lock:
+            self._in_progress[span["stage"]] = self._in_progress.get(span["stage"], 1) - 1
+            totals = self._totals(span["stage"])
+            for i, bound in enumerate(self.buckets):
+                if span["wall"] <= bound:
+                    totals["buckets"][i] += 1
+            totals["count"] += 1
+            totals["wall"] += span["wall"]
+            totals["cpu"] += span["cpu"]
+            totals["bytes_in"] += span["bytes_in"]
+            totals["bytes_out"] += span["bytes_out"]
+            totals["errors"] += 1 if span.get("error") else 0
+            if span.get("speed"):
+                totals["speed_sum"] += span["speed"]
+                totals["speed_count"] += 1
+
+    def ffmpeg_finished(self, cpu: float, failed: bool):
+        with self._lock:
+            self._ffmpeg["runs"] += 1
+            self._ffmpeg["failures"] += 1 if failed else 0
+            self._ffmpeg["cpu"] += cpu
+
+    def job_finished(self, status: str):
+        with self._lock:
+            self._jobs[status] = self._jobs.get(status, 0) + 1
+
+    def snapshot(self) -> dict:
+        # Plain (JSON-safe) copy of every total
+        with self._lock:
+            return {
+                "stages": {stage: dict(t, buckets=list(t["buckets"])) for stage, t in self._stages.items()},
+                "in_progress": dict(self._in_progress),
+                "jobs": dict(self._jobs),
+                "ffmpeg": dict(self._ffmpeg)
+            }
+
+    def render(self, others: list[dict] = ()) -> str:
+        # others: snapshot()s of other processes, summed into this one's totals
+        merged = merge_snapshots([self.snapshot(), *others])
+        stages = dict(sorted(merged["stages"].items()))
+        in_progress, jobs, ffmpeg = merged["in_progress"], merged["jobs"], merged["ffmpeg"]
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}" if label_text else f"{name}{suffix} {value}")
+
+        histogram = []
+        for stage, t in stages.items():
+            for bound, count in zip(self.buckets, t["buckets"]):
+                histogram.append(("_bucket", {"stage": stage, "le": bound}, count))
+            histogram.append(("_bucket", {"stage": stage, "le": "+Inf"}, t["count"]))
+            histogram.append(("_sum", {"stage": stage}, round(t["wall"], 6)))
+            histogram.append(("_count", {"stage": stage}, t["count"]))
+        metric("shorts_stage_duration_seconds", "histogram", "Wall time of pipeline stages.", histogram)
+        metric("shorts_stage_cpu_seconds_total", "counter",
+               "CPU time of pipeline stages (calling thread plus the ffmpeg processes they ran).",
+               [("", {"stage": s}, round(t["cpu"], 6)) for s, t in stages.items()])
+        metric("shorts_stage_read_bytes_total", "counter", "Size of the files stages fed to ffmpeg.",
+               [("", {"stage": s}, t["bytes_in"]) for s, t in stages.items()])
+        metric("shorts_stage_written_bytes_total", "counter", "Bytes stages wrote through ffmpeg.",
+               [("", {"stage": s}, t["bytes_out"]) for s, t in stages.items()])
+        metric("shorts_stage_errors_total", "counter", "Stages that raised.",
+               [("", {"stage": s}, t["errors"]) for s, t in stages.items()])
+        metric("shorts_stage_ffmpeg_speed", "summary", "Encode speed ffmpeg reported (x realtime) per stage.",
+               [sample for s, t in stages.items() for sample in
+                (("_sum", {"stage": s}, round(t["speed_sum"], 6)), ("_count", {"stage": s}, t["speed_count"]))])
+        metric("shorts_stage_in_progress", "gauge", "Stages running right now.",
+               [("", {"stage": s}, n) for s, n in sorted(in_progress.items())])
+        metric("shorts_ffmpeg_runs_total", "counter", "ffmpeg processes run.", [("", {}, ffmpeg["runs"])])
+        metric("shorts_ffmpeg_failures_total", "counter", "ffmpeg processes that exited non-zero.",
+               [("", {}, ffmpeg["failures"])])
+        metric("shorts_ffmpeg_cpu_seconds_total", "counter", "CPU time of ffmpeg processes.",
+               [("", {}, round(ffmpeg["cpu"], 6))])
+        metric("shorts_jobs_total", "counter", "Finished jobs by final status.",
+               [("", {"status": s}, n) for s, n in sorted(jobs.items())])
+        return "\n".join(lines) + "\n"
+
+
+def merge_snapshots(snapshots: list[dict]) -> dict:
+    # Sums MetricsRegistry snapshots (same bucket bounds) field by field
+    merged = {"stages": {}, "in_progress": {}, "jobs": {}, "ffmpeg": {"runs": 0, "failures": 0, "cpu": 0.0}}
+    for snapshot in snapshots:
+        for stage, t in snapshot.get("stages", {}).items():
+            totals = merged["stages"].get(stage)
+            if totals is None:
+                merged["stages"][stage] = dict(t, buckets=list(t["buckets"]))
+                continue
+            for key, value in t.items():
+                if key == "buckets":
+                    totals["buckets"] = [a + b for a, b in zip(totals["buckets"], value)]
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        for key in ("in_progress", "jobs", "ffmpeg"):
+            for name, value in snapshot.get(key, {}).items():
+                merged[key][name] = merged[key].get(name, 0) + value
+    return merged
+
+
+registry = MetricsRegistry()
+
+
+class JobTrace:
+    """
+    The spans of one job, written to its record as `timings` (at most every `interval`
+    seconds while it runs) with a per-stage `timing_summary`.
+    """
+
+    def __init__(self, record=None, interval: float = TRACE_INTERVAL):
+        self.record = record
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    def add(self, span: dict):
+        with self._lock:
+            self.spans.append(span)
+        self.flush()
+
+    def summary(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        totals = {}
+        for span in spans:
+            t = totals.setdefault(span["stage"], {"count": 0, "wall": 0.0, "cpu": 0.0, "bytes_in": 0, "bytes_out": 0})
+            t["count"] += 1
+            t["wall"] += span["wall"]
+            t["cpu"] += span["cpu"]
+            t["bytes_in"] += span["bytes_in"]
+            t["bytes_out"] += span["bytes_out"]
+        for t in totals.values():
+            t["wall"] = round(t["wall"], 3)
+            t["cpu"] = round(t["cpu"], 3)
+        return {"elapsed": round(time.perf_counter() - self.started, 3), "stages": totals}
+
+    def flush(self, force: bool = False):
+        if self.record is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_write < self.interval:
+                return
+            self._last_write = now
+            spans = [dict(s) for s in self.spans]
+        self.record["timings"] = spans
+        self.record["timing_summary"] = self.summary()
+
+
+@contextmanager
+def span(stage: str, trace: JobTrace = None, clip=None):
+    """
+    Times a block as one stage: wall time, CPU time of this thread, and whatever ffmpeg
+    processes it ran (CPU, bytes, reported speed) via ffmpeg_finished(). Spans nest per
+    thread; an inner span inherits the outer one's trace and passes its ffmpeg totals up, so
+    an outer span's figures include its inner spans'.
+    """
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    if trace is None and parent is not None:
+        trace = parent["trace"]
+    state = {"trace": trace, "ffmpeg_cpu": 0.0, "bytes_in": 0, "bytes_out": 0, "speed": None, "media_seconds": 0.0}
+    entry = {"stage": stage, "clip": clip}
+    stack.append(state)
+    registry.opened(stage)
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield entry
+    except BaseException as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        stack.pop()
+        wall = time.perf_counter() - wall_start
+        entry.update({
+            "start": round(wall_start - trace.started, 3) if trace else None,
+            "wall": round(wall, 3),
+            "cpu": round(time.thread_time() - cpu_start + state["ffmpeg_cpu"], 3),
+            "bytes_in": state["bytes_in"],
+            "bytes_out": state["bytes_out"],
+            "speed": state["speed"],
+            "media_seconds": round(state["media_seconds"], 3)
+        })
+        if parent is not None:
+            for key in ("ffmpeg_cpu", "bytes_in", "bytes_out", "media_seconds"):
+                parent[key] += state[key]
+        registry.observe(entry)
+        if trace is not None:
+            trace.add(entry)
+
+
+def ffmpeg_finished(cpu: float = 0.0, bytes_in: int = 0, bytes_out: int = 0, speed: float = None,
+                    media_seconds: float = 0.0, failed: bool = False):
+    # Called by the ffmpeg helpers when a process exits; credited to this thread's open span
+    registry.ffmpeg_finished(cpu, failed)
+    stack = _stack()
+    if not stack:
+        return
+    state = stack[-1]
+    state["ffmpeg_cpu"] += cpu
+    state["bytes_in"] += bytes_in
+    state["bytes_out"] += bytes_out
+    state["media_seconds"] += media_seconds
+    if speed:
+        state["speed"] = speed
+
+
+def input_bytes(cmd: list[str]) -> int:
+    # Total size of the files an ffmpeg command opens with -i
+    total = 0
+    for flag, value in zip(cmd, cmd[1:]):
+        if flag == "-i" and os.path.isfile(value):
+            total += os.path.getsize(value)
+    return total
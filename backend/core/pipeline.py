@@ -0,0 +1,86 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import span
+
+# Stage concurrency. Cuts are mostly I/O and seeking; encodes (upscale/burn) are CPU heavy.
+CUT_WORKERS = int(os.getenv("CUT_WORKERS", "4"))
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", "2"))
+# Total threads handed out to concurrent ffmpeg processes so they don't oversubscribe the CPU.
+FFMPEG_THREAD_BUDGET = int(os.getenv("FFMPEG_THREADS", str(os.cpu_count() or 4)))
+
+# Job-level transcription runs here so it overlaps the clip stages. The decoding itself is
+# serialized (and batched across jobs) by the transcription service on one warm model; these
+# threads mostly wait on it, so several jobs can have requests queued at once.
+TRANSCRIBE_JOBS = int(os.getenv("TRANSCRIBE_JOBS", "4"))
+transcription_lane = ThreadPoolExecutor(max_workers=TRANSCRIBE_JOBS, thread_name_prefix="transcribe")
+
+
+def threads_per_process(concurrency: int, budget: int = FFMPEG_THREAD_BUDGET) -> int:
+    return max(1, budget // max(1, concurrency))
+
+
+class Stage:
+    def __init__(self, name: str, fn, workers: int):
+        # fn(item, threads) -> item passed to the next stage
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.slots = threading.BoundedSemaphore(self.workers)
+
+
+class ClipPipeline:
+    """
+    Runs items through a fixed sequence of stages. Each stage has its own concurrency
+    limit, so while one clip is being upscaled the next ones can already be cut.
+    Results come back in input order regardless of completion order.
+    """
+
+    def __init__(self, stages: list[Stage], thread_budget: int = FFMPEG_THREAD_BUDGET, on_progress=None, on_result=None,
+                 trace=None, cancel: threading.Event = None):
+        self.stages = stages
+        self.thread_budget = thread_budget
+        # on_progress(index, stage_name) is called as each item enters a stage ("done" at the end)
+        self.on_progress = on_progress
+        # on_result(index, item) is called as soon as an item has been through every stage
+        self.on_result = on_result
+        # Every stage run is timed as a span of this JobTrace (clip = the item's suffix)
+        self.trace = trace
+        # Set from outside (e.g. the worker lost the job's lease) to stop starting new stages
+        self.cancel = cancel
+        self._cancelled = threading.Event()
+
+    def _threads_per_process(self) -> int:
+        # Split the budget across every ffmpeg that can be running at once
+        return threads_per_process(sum(s.workers for s in self.stages), self.thread_budget)
+
+    def _run_item(self, index, item):
+        for stage in self.stages:
+            with stage.slots:
+                if self._cancelled.is_set() or (self.cancel is not None and self.cancel.is_set()):
+                    return None
+                if self.on_progress:
+                    self.on_progress(index, stage.name)
+                clip = item.get("suffix", index) if isinstance(item, dict) else index
+                with span(stage.name, self.trace, clip=clip):
+                    item = stage.fn(item, self._threads_per_process())
+        if self.cancel is not None and self.cancel.is_set():
+            return None
+        if self.on_result:
+            self.on_result(index, item)
+        if self.on_progress:
+            self.on_progress(index, "done")
+        return item
+
+    def run(self, items: list):
+        if not items:
+            return []
+        max_workers = min(len(items), sum(s.workers for s in self.stages))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="clip") as pool:
+            futures = [pool.submit(self._run_item, i, item) for i, item in enumerate(items)]
+            try:
+                return [f.result() for f in futures]
+            except Exception:
+                # Stop feeding the remaining clips; in-flight ffmpeg runs finish on their own
+                self._cancelled.set()
+                raise
@@ -1,7 +1,27 @@
 import os
 import math
-from .ffmpeg_utils import get_video_duration, extract_audio, cut_video, burn_subtitles, concat_videos, upscale_video
-from .transcription import transcribe_audio
+import threading
+import subprocess
+from concurrent.futures import Future
+from .ffmpeg_utils import probe_media, caption_font_size, read_audio, cut_video, burn_subtitles, upscale_video, render_clip, reframe_video, split_video, merge_video, merge_copy, snap_to_keyframe, upscale_filter, UPSCALE_HEIGHT
+from .pipeline import ClipPipeline, Stage, CUT_WORKERS, ENCODE_WORKERS, transcription_lane
+from .transcription import transcribe_words, chunk_words, slice_words, save_transcript, load_transcript, caption_settings, COMPUTE_TYPE
+from .progress import ProgressReporter
+from .highlights import find_highlights
+from .transcription_service import transcription_service
+from .encoders import resolve_encoder
+from .reframe import plan_reframe, vertical_crop_size, reframe_settings
+from .storage import storage
+from .metrics import JobTrace, span, registry
+from .cache import ArtifactCache, artifact_cache, cached, source_hash, file_hash
+
+# Route transcription through the cross-job batching service (WHISPER_BATCHED=0 decodes each job directly)
+BATCHED_TRANSCRIPTION = os.getenv("WHISPER_BATCHED", "1") != "0"
+
+# Transcripts being produced right now, by cache key. Jobs on the same source (a batch's
+# clip specs) wait for the one in flight instead of decoding the same audio again.
+_transcripts_in_flight = {} # key -> Future of (words, language, stats)
+_transcripts_lock = threading.Lock()
 
 def generate_srt(segments, output_path):
     with open(output_path, "w", encoding="utf-8") as f:
@@ -18,10 +38,120 @@ def generate_srt(segments, output_path):
             end_str = fmt_time(seg['end'])
             f.write(f"{i}\n{start_str} --> {end_str}\n{seg['text'].strip()}\n\n")
 
-def process_job(job_id: str, job_config: dict, jobs_store: dict):
+def transcribe_source(job_id: str, video_path: str, on_progress=None, settings: dict = None, record=None,
+                      trace: JobTrace = None):
+    """
+    Job-level transcript stage: decodes 16k audio from the original once, transcribes it
+    with word timestamps and persists the word list so every clip can slice from it.
+    Decode stats (VAD skip fraction, speedup) are written to record["transcription"].
+    """
+    with span("transcribing", trace):
+        return _transcribe_source(job_id, video_path, on_progress, settings, record)
+
+def _transcribe_source(job_id, video_path, on_progress, settings, record):
+    settings = settings or caption_settings()
+    transcript_path = storage.scratch(job_id, "transcript.json")
+    source = source_hash(video_path)
+    transcript_key = ArtifactCache.key(source, "transcript", compute_type=COMPUTE_TYPE, **settings)
+
+    # Under the lock a finished transcript is either in the cache or still in flight
+    # (the producer stores it before letting go), so it's never decoded twice
+    with _transcripts_lock:
+        hit = os.path.exists(transcript_path) or artifact_cache.fetch(transcript_key, transcript_path)
+        in_flight = None if hit else _transcripts_in_flight.get(transcript_key)
+        if not hit and in_flight is None:
+            _transcripts_in_flight[transcript_key] = produced = Future()
+    if hit:
+        words, language, stats = load_transcript(transcript_path)
+        if record is not None:
+            record["transcription"] = {**(stats or {}), "cached": True}
+        return words, language
+    if in_flight is not None:
+        words, language, stats = in_flight.result()
+        save_transcript(transcript_path, words, language, stats)
+        if record is not None:
+            record["transcription"] = {**(stats or {}), "shared": True}
+        return words, language
+
+    try:
+        # Decoded PCM goes straight from ffmpeg's stdout to the model; no WAV is written
+        with span("extracting_audio"):
+            audio = read_audio(video_path)
+        if BATCHED_TRANSCRIPTION:
+            words, language, stats = transcription_service.submit(audio, settings, on_progress).result()
+        else:
+            words, language, stats = transcribe_words(audio, on_progress=on_progress, settings=settings)
+        del audio
+        save_transcript(transcript_path, words, language, stats)
+        artifact_cache.store(transcript_key, transcript_path)
+        produced.set_result((words, language, stats))
+    except Exception as e:
+        produced.set_exception(e)
+        raise
+    finally:
+        with _transcripts_lock:
+            _transcripts_in_flight.pop(transcript_key, None)
+    if record is not None:
+        record["transcription"] = stats
+    return words, language
+
+def detect_highlights(video_path: str, clip_duration: float, top_k: int, source_duration: float,
+                      words=None, scenes: bool = False):
+    # Levels are computed on the fly from ffmpeg's PCM stream
+    return find_highlights(video_path, clip_duration, top_k, source_duration, words, scenes=scenes)
+
+def parse_time(t_str) -> float:
+    """
+    Seconds from a timestamp: "SS", "MM:SS" or "HH:MM:SS", each optionally with a
+    fraction ("01:02:03.250", or "01:02:03,250" as in SRT). Numbers pass through;
+    negative and non-finite values are rejected.
+    """
+    if t_str is None or t_str == "":
+        return 0.0
+    if isinstance(t_str, (int, float)):
+        seconds = float(t_str)
+    else:
+        parts = str(t_str).strip().replace(",", ".").split(":")
+        if len(parts) > 3:
+            raise ValueError(f"Invalid timestamp: {t_str!r}")
+        try:
+            seconds = 0.0
+            for part in parts:
+                seconds = seconds * 60 + float(part)
+        except ValueError:
+            raise ValueError(f"Invalid timestamp: {t_str!r}")
+    # float() also accepts "inf" and "nan"
+    if seconds < 0 or not math.isfinite(seconds):
+        raise ValueError(f"Invalid timestamp: {t_str!r}")
+    return seconds
+
+def write_clip_srt(words, ranges, srt_path):
+    # Rebase the source transcript onto the clip timeline and chunk it into captions
+    with span("writing_srt"):
+        generate_srt(chunk_words(slice_words(words, ranges)), srt_path)
+
+def caption_sidecar(output_path: str) -> str:
+    # The .srt next to a burned clip, as single_pass_paths and the caption stage name it
+    return output_path.replace("_burned.mp4", ".srt") if output_path.endswith("_burned.mp4") else None
+
+def single_pass_paths(clip_path: str, upscale: bool, captions: bool, reframe: bool = False):
+    # Same names the staged path produces (_9x16, _4k, then .srt/_burned next to it)
+    path = clip_path.replace(".mp4", "_9x16.mp4") if reframe else clip_path
+    path = path.replace(".mp4", "_4k.mp4") if upscale else path
+    srt_path = path.replace(".mp4", ".srt") if captions else None
+    output_path = path.replace(".mp4", "_burned.mp4") if captions else path
+    return output_path, srt_path
+
+def process_job(job_id: str, job_config: dict, jobs_store: dict, cancel: threading.Event = None):
     # jobs_store is passed by reference to update status
     # In a real app, use a database.
-    
+    # Per-stage spans (wall/CPU time, bytes, ffmpeg speed) go to the record as `timings`
+    trace = JobTrace(jobs_store[job_id])
+    # cancel is set when this worker no longer owns the job (its lease went to another
+    # worker): nothing more is published and the new owner's record and scratch are left alone
+    def cancelled():
+        return cancel is not None and cancel.is_set()
+
     try:
         jobs_store[job_id]["status"] = "processing"
         
@@ -33,7 +163,11 @@ def process_job(job_id: str, job_config: dict, jobs_store: dict):
             jobs_store[job_id]["error"] = "Video file not found"
             return
 
-        duration = get_video_duration(video_path)
+        # One ffprobe per source version; every stage below reads from this
+        with span("probing", trace):
+            media = probe_media(video_path)
+        jobs_store[job_id]["media"] = media.to_dict()
+        video_duration = media.duration
         clip_duration = job_config.get('duration', 60)
         mode = job_config.get('mode', 'auto')
         
@@ -45,12 +179,82 @@ def process_job(job_id: str, job_config: dict, jobs_store: dict):
 
         output_files = []
 
+        # Vertical 9:16 reframing: a crop window that follows motion/faces, applied inside the
+        # clip's encode. Everything after it works on the cropped frame size.
+        media_size = (media.width, media.height)
+        crop_size = vertical_crop_size(*media_size) if job_config.get('reframe') else None
+        reframe = crop_size is not None
+        frame_w, frame_h = crop_size or media_size
+        reframe_key = reframe_settings() if reframe else None
+
+        # Frames that are already 4k skip the upscale; the rest go to 4k in their own
+        # orientation (vertical frames to 2160x3840) without being stretched
+        upscale = bool(job_config.get('enhance_4k')) and min(frame_w, frame_h) < UPSCALE_HEIGHT
+        scale_filter = upscale_filter(frame_w, frame_h, job_config.get('upscale_quality') or "high")
+        # Captions are sized for the resolution they end up burned at
+        source_font_size = caption_font_size(min(frame_w, frame_h))
+        upscaled_font_size = caption_font_size(UPSCALE_HEIGHT)
+        # x264 settings, fixed for the whole job so cache keys stay stable. Adaptive picks
+        # the preset from encode speeds measured on this host by earlier jobs.
+        encoder_profile = job_config.get('encoder_profile') or "standard"
+        encoder = resolve_encoder(encoder_profile, frame_w * frame_h)
+        upscale_encoder = resolve_encoder(encoder_profile, 3840 * UPSCALE_HEIGHT, upscale=True)
+        jobs_store[job_id]["encoder"] = upscale_encoder if upscale else encoder
+
+        # Cut mode: when a later stage re-encodes anyway, defer the cut into it
+        # instead of paying for an extra encode.
+        has_encode_stage = upscale or reframe or job_config.get('captions')
+        cut_mode = job_config.get('cut_mode') or "auto"
+        if cut_mode == "auto":
+            cut_mode = "defer" if has_encode_stage else "reencode"
+        if cut_mode == "defer" and not has_encode_stage:
+            cut_mode = "reencode"
+        # Single pass: one ffmpeg per clip does seek + reframe + upscale + subtitles. The staged
+        # cut/reframe/upscale/burn path stays as the "staged" render mode and as a fallback.
+        render_mode = job_config.get('render_mode') or "single_pass"
+        single_pass = render_mode == "single_pass" and has_encode_stage
+        # Cache keys for every artifact derive from the source content
+        source = source_hash(video_path)
+        # One keyframe index for the source, shared by every clip
+        keyframes = media.keyframes if cut_mode in ("copy", "smart") else None
+
+        # Structured progress (per-clip percent, transcription position) for streaming clients
+        reporter = ProgressReporter(jobs_store[job_id])
+
+        transcript = None
+        if job_config.get('captions'):
+            # Transcribe the whole source once on the shared transcription lane; clips get
+            # their captions by slicing it, so cutting/upscaling can run meanwhile.
+            settings = caption_settings(job_config.get('caption_profile') or "standard",
+                                        job_config.get('beam_size'), job_config.get('vad'))
+            transcript = transcription_lane.submit(transcribe_source, job_id, video_path, reporter.transcribing,
+                                                   settings, jobs_store[job_id], trace)
+
+        def reframed(input_path, clip_path, start=None, end=None):
+            # Crop filter following the action in [start, end) of input_path (None without
+            # reframing); the crop track is written next to the clip
+            if not reframe:
+                return None
+            return plan_reframe(input_path, clip_path.replace(".mp4", "_crop.txt"), media_size, start, end)
+
         # Determine clips to process
         clips_to_process = [] # list of (start, end, suffix_index)
         
-        if mode == "auto":
+        # Auto mode with highlight_clips > 0 only keeps the best-scoring windows
+        highlight_clips = int(job_config.get('highlight_clips') or 0)
+
+        if mode == "auto" and highlight_clips > 0:
+            duration_per_clip = int(job_config.get('duration', 60))
+            jobs_store[job_id]["status"] = "analyzing"
+            # Speech rate comes from the transcript when captions are on anyway
+            words = transcript.result()[0] if transcript else None
+            with span("analyzing", trace):
+                ranges = detect_highlights(video_path, duration_per_clip, highlight_clips, video_duration, words,
+                                           scenes=job_config.get('scene_detection'))
+            clips_to_process = [(start, end, i + 1) for i, (start, end) in enumerate(ranges)]
+
+        elif mode == "auto":
             duration_per_clip = int(job_config.get('duration', 60))
-            video_duration = get_video_duration(video_path)
             for i, start in enumerate(range(0, int(video_duration), duration_per_clip)):
                 end = min(start + duration_per_clip, video_duration)
                 if start >= video_duration: break
@@ -58,132 +262,281 @@ def process_job(job_id: str, job_config: dict, jobs_store: dict):
                     clips_to_process.append((start, end, i + 1))
                 
         elif mode == "manual":
-            # Parse MM:SS to seconds
-            def parse_time(t_str):
-                if not t_str: return 0
-                parts = t_str.split(":")
-                return int(parts[0]) * 60 + int(parts[1])
-                
             start = parse_time(job_config.get('manual_start', "00:00"))
             end = parse_time(job_config.get('manual_end', "00:30"))
             if end > start:
                 clips_to_process.append((start, end, 1))
 
         elif mode == "merge":
-            # Special handling for merge: we create ONE final clip from multiple segments
-            
-            def parse_time(t_str):
-                if not t_str: return 0
-                parts = t_str.split(":")
-                return int(parts[0]) * 60 + int(parts[1])
+            # Merge makes ONE clip out of several ranges of the source, in a single ffmpeg run:
+            # the ranges are joined by a concat filter graph (reframe crop per range, then
+            # upscale and captions on the joined picture), so there is one decode/encode and no
+            # segment files. Copy mode without any encode stage stream-copies the ranges instead.
+            merge_ranges = []
+            for seg in job_config.get('merge_segments') or []:
+                start, end = parse_time(seg['start']), parse_time(seg['end'])
+                if start >= video_duration:
+                    raise ValueError(f"Merge segment {seg['start']}-{seg['end']} starts at or after the end "
+                                     f"of the source ({video_duration:.3f}s)")
+                if end > start:
+                    merge_ranges.append((start, min(end, video_duration)))
+            if not merge_ranges:
+                raise ValueError("No valid merge segments")
 
-            segments = job_config.get('merge_segments', [])
-            temp_segment_files = []
-            
-            jobs_store[job_id]["status"] = "cutting_segments"
-            
-            for i, seg in enumerate(segments):
-                start = parse_time(seg['start'])
-                end = parse_time(seg['end'])
-                seg_path = os.path.join("temp/output", f"{job_id}_seg_{i}.mp4")
-                cut_video(video_path, seg_path, start, end)
-                temp_segment_files.append(seg_path)
-                
-            # Merge them
+            merged_path = storage.scratch(job_id, f"{base_name}_Merged.mp4")
             jobs_store[job_id]["status"] = "merging"
-            merged_filename = f"{base_name}_Merged.mp4"
-            merged_path = os.path.join("temp/output", merged_filename)
-            concat_videos(temp_segment_files, merged_path)
-            
-            # Cleanup segments
-            for p in temp_segment_files:
-                if os.path.exists(p): os.remove(p)
-                
-            # Now we have a single "clip" that is the merged video. 
-            # We treat it as if it was the result of the cutting phase, 
-            # so the rest of the pipeline (Upscale -> Transcribe) works on it.
-            # We'll just define one item in clips_to_process but bypass the cut_video step?
-            # Actually easier to just restructure the loop below. 
-            # But to minimize code change, let's just make clips_to_process empty 
-            # and handle the rest here? Or trick the loop?
-            # Let's handle the post-processing here and return, or adapt the loop.
-            
-            # We'll bypass the loop for merge mode because the loop assumes cutting from original.
-            # So we process the merged_path directly below.
-            
-            final_clip_path = merged_path
-            current_font_size = 26
-            
-            if job_config.get('enhance_4k'):
-                jobs_store[job_id]["status"] = "upscaling"
-                upscaled_path = merged_path.replace(".mp4", "_4k.mp4")
-                upscale_video(merged_path, upscaled_path)
-                final_clip_path = upscaled_path
-                current_font_size = 52
-
-            if job_config.get('captions'):
-                jobs_store[job_id]["status"] = "transcribing"
-                audio_path = final_clip_path.replace(".mp4", ".wav")
-                extract_audio(final_clip_path, audio_path)
-                
-                segments, lang = transcribe_audio(audio_path)
-                srt_path = final_clip_path.replace(".mp4", ".srt")
-                generate_srt(segments, srt_path)
-                
-                burned_path = final_clip_path.replace(".mp4", "_burned.mp4")
-                burn_subtitles(final_clip_path, srt_path, burned_path, font_size=current_font_size)
-                final_clip_path = burned_path
-                
-                if os.path.exists(audio_path): os.remove(audio_path)
 
-            output_files.append(final_clip_path)
+            if cut_mode == "copy" and not has_encode_stage:
+                final_clip_path = merged_path
+                # Starts snap back to keyframes; the key only depends on the requested ranges
+                merged_key = ArtifactCache.key(source, "merge", ranges=merge_ranges, mode="copy")
+                with span("merging", trace, clip="merged"):
+                    cached(merged_key, merged_path, lambda: merge_copy(video_path, merged_path, merge_ranges,
+                                                                       media.keyframes))
+            else:
+                final_clip_path, srt_path = single_pass_paths(merged_path, upscale, job_config.get('captions'), reframe)
+                merged_length = sum(end - start for start, end in merge_ranges)
+                render_encoder = upscale_encoder if upscale else encoder
+                with span("merging", trace, clip="merged"):
+                    if srt_path:
+                        words, lang = transcript.result()
+                        write_clip_srt(words, merge_ranges, srt_path)
+                    merged_key = ArtifactCache.key(source, "merge", ranges=merge_ranges, upscale=upscale,
+                                                   filter=scale_filter, srt=file_hash(srt_path) if srt_path else None,
+                                                   encoder=render_encoder, reframe=reframe_key)
+                    cached(merged_key, final_clip_path, lambda: merge_video(
+                        video_path, final_clip_path, merge_ranges, has_audio=media.has_audio,
+                        crop_filters=[reframed(video_path, storage.scratch(job_id, f"{base_name}_Merged_{i}.mp4"),
+                                               start, end)
+                                      for i, (start, end) in enumerate(merge_ranges)],
+                        upscale=upscale, srt_path=srt_path, encoder=render_encoder, scale_filter=scale_filter,
+                        font_size=upscaled_font_size if upscale else source_font_size,
+                        on_progress=lambda t: reporter.clip("merged", "merging", 100.0 * t / merged_length)))
+
+            if cancelled():
+                return
+            # Only the finished clip (and its captions, for /share) leaves scratch
+            output_files.append(storage.publish(final_clip_path, sidecars=[caption_sidecar(final_clip_path)]))
             jobs_store[job_id]["output_files"] = output_files
             jobs_store[job_id]["status"] = "completed"
             return # Exit function, we are done for merge mode
 
 
-        for idx, (start, end, suffix_idx) in enumerate(clips_to_process):
-            clip_name = f"{base_name}_Part_{suffix_idx}.mp4"
-            clip_path = os.path.join("temp/output", f"{job_id}_{clip_name}")
-            
-            jobs_store[job_id]["status"] = f"cutting_{idx+1}/{len(clips_to_process)}"
-            cut_video(video_path, clip_path, start, end)
-            
-            final_clip_path = clip_path
-            current_font_size = 26 # default for 1080p typically
+        def clip_progress(clip, stage_name):
+            # ffmpeg reports seconds written; turn that into a percentage of this clip
+            length = clip["end"] - clip["start"]
+            return lambda t: reporter.clip(clip["suffix"], stage_name, 100.0 * t / length if length > 0 else 0.0)
+
+        # Per-clip pipeline: cut -> upscale -> caption, each stage with its own worker pool
+        # clip["path"] names the outputs, clip["input"] is the media the next stage reads,
+        # clip["seek"] is set when the cut was deferred into that stage, and clip["key"]
+        # is the cache key of whatever clip["input"] holds.
+        def cut_stage(clip, threads):
+            start, end = clip["start"], clip["end"]
+            if cut_mode == "defer":
+                clip["input"] = video_path
+                clip["seek"] = (start, end)
+                clip["key"] = ArtifactCache.key(source, "range", start=start, end=end)
+                return clip
+            clip["key"] = ArtifactCache.key(source, "cut", start=start, end=end, mode=cut_mode, encoder=encoder)
+            cached(clip["key"], clip["path"], lambda: cut_video(video_path, clip["path"], start, end, threads=threads,
+                                                                mode=cut_mode, keyframes=keyframes, encoder=encoder,
+                                                                on_progress=clip_progress(clip, "cutting")))
+            if cut_mode == "copy":
+                clip["start"] = snap_to_keyframe(keyframes, start)
+            clip["input"] = clip["path"]
+            return clip
+
+        def reframe_stage(clip, threads):
+            start, end = clip.pop("seek", None) or (None, None)
+            reframed_path = clip["path"].replace(".mp4", "_9x16.mp4")
+            clip["key"] = ArtifactCache.key(clip["key"], "reframe", reframe=reframe_key, encoder=encoder)
+            cached(clip["key"], reframed_path, lambda: reframe_video(clip["input"], reframed_path,
+                                                                     reframed(clip["input"], clip["path"], start, end),
+                                                                     threads=threads, start=start, end=end,
+                                                                     encoder=encoder,
+                                                                     on_progress=clip_progress(clip, "reframing")))
+            # Each stage deletes the intermediate it consumed (never the source, which isn't in scratch)
+            storage.release(clip["input"])
+            clip["path"] = reframed_path
+            clip["input"] = reframed_path
+            return clip
+
+        def upscale_stage(clip, threads):
+            start, end = clip.pop("seek", None) or (None, None)
+            upscaled_path = clip["path"].replace(".mp4", "_4k.mp4")
+            clip["key"] = ArtifactCache.key(clip["key"], "upscale", filter=scale_filter, encoder=upscale_encoder)
+            cached(clip["key"], upscaled_path, lambda: upscale_video(clip["input"], upscaled_path, threads=threads,
+                                                                     start=start, end=end, encoder=upscale_encoder,
+                                                                     scale_filter=scale_filter,
+                                                                     on_progress=clip_progress(clip, "upscaling")))
+            storage.release(clip["input"])
+            clip["path"] = upscaled_path
+            clip["input"] = upscaled_path
+            clip["font_size"] = upscaled_font_size
+            clip["encoder"] = upscale_encoder
+            return clip
+
+        def caption_stage(clip, threads):
+            words, lang = transcript.result()
+            srt_path = clip["path"].replace(".mp4", ".srt")
+            write_clip_srt(words, [(clip["start"], clip["end"])], srt_path)
             
-            if job_config.get('enhance_4k'):
-                jobs_store[job_id]["status"] = f"upscaling_{idx+1}"
-                upscaled_path = clip_path.replace(".mp4", "_4k.mp4")
-                upscale_video(clip_path, upscaled_path)
-                final_clip_path = upscaled_path
-                current_font_size = 52 # Scale font for 4k
-
-            if job_config.get('captions'):
-                jobs_store[job_id]["status"] = f"transcribing_{idx+1}"
-                # Audio extraction needs to happen from the clip (upscaled or not, audio is same/copied)
-                audio_path = clip_path.replace(".mp4", ".wav") # Use original cut for audio speed if wanted, or final
-                extract_audio(final_clip_path, audio_path)
-                
-                segments, lang = transcribe_audio(audio_path)
-                srt_path = final_clip_path.replace(".mp4", ".srt")
-                generate_srt(segments, srt_path)
-                
-                # Burn captions
-                burned_path = final_clip_path.replace(".mp4", "_burned.mp4")
-                burn_subtitles(final_clip_path, srt_path, burned_path, font_size=current_font_size)
-                final_clip_path = burned_path
-                
-                # Cleanup audio
-                if os.path.exists(audio_path):
-                    os.remove(audio_path)
+            # Burn captions
+            start, end = clip.pop("seek", None) or (None, None)
+            burned_path = clip["path"].replace(".mp4", "_burned.mp4")
+            clip["key"] = ArtifactCache.key(clip["key"], "burn", srt=file_hash(srt_path), font_size=clip["font_size"],
+                                            encoder=clip["encoder"])
+            cached(clip["key"], burned_path, lambda: burn_subtitles(clip["input"], srt_path, burned_path,
+                                                                    font_size=clip["font_size"], threads=threads,
+                                                                    encoder=clip["encoder"],
+                                                                    start=start, end=end,
+                                                                    on_progress=clip_progress(clip, "captioning")))
+            storage.release(clip["input"])
+            clip["path"] = burned_path
+            clip["input"] = burned_path
+            return clip
+
+        staged = [Stage("cutting", cut_stage, CUT_WORKERS)]
+        if reframe:
+            staged.append(Stage("reframing", reframe_stage, ENCODE_WORKERS))
+        if upscale:
+            staged.append(Stage("upscaling", upscale_stage, ENCODE_WORKERS))
+        if job_config.get('captions'):
+            staged.append(Stage("captioning", caption_stage, ENCODE_WORKERS))
 
-            output_files.append(final_clip_path)
+        def render_stage(clip, threads):
+            output_path, srt_path = single_pass_paths(clip["path"], upscale, job_config.get('captions'), reframe)
+            if srt_path:
+                words, lang = transcript.result()
+                write_clip_srt(words, [(clip["start"], clip["end"])], srt_path)
+            render_encoder = upscale_encoder if upscale else encoder
+            key = ArtifactCache.key(source, "render", start=clip["start"], end=clip["end"], upscale=upscale,
+                                    filter=scale_filter, srt=file_hash(srt_path) if srt_path else None,
+                                    encoder=render_encoder, reframe=reframe_key)
+            try:
+                cached(key, output_path, lambda: render_clip(video_path, output_path, clip["start"], clip["end"],
+                                                             upscale=upscale, srt_path=srt_path, encoder=render_encoder,
+                                                             scale_filter=scale_filter,
+                                                             crop_filter=reframed(video_path, clip["path"],
+                                                                                  clip["start"], clip["end"]),
+                                                             font_size=upscaled_font_size if upscale else source_font_size,
+                                                             threads=threads,
+                                                             on_progress=clip_progress(clip, "rendering")))
+            except subprocess.CalledProcessError as e:
+                print(f"Single-pass render failed for {output_path}, falling back to staged: {e}")
+                for stage in staged:
+                    clip = stage.fn(clip, threads)
+                return clip
+            clip["path"] = output_path
+            clip["input"] = output_path
+            return clip
+
+        stages = [Stage("rendering", render_stage, ENCODE_WORKERS)] if single_pass else staged
+
+        # Resume: clips an earlier, interrupted attempt at this job already finished are kept
+        completed = {
+            suffix: path for suffix, path in (jobs_store[job_id].get("completed_clips") or {}).items()
+            if os.path.exists(path)
+        }
+        all_cuts_cached = all(
+            artifact_cache.contains(ArtifactCache.key(source, "cut", start=start, end=end, mode=cut_mode, encoder=encoder),
+                                    ".mp4")
+            for start, end, _ in clips_to_process
+        )
+
+        # Auto mode cutting every part out of the source separately re-opens and re-decodes
+        # it per part; instead split it in one decode and feed parts on as they land.
+        if (mode == "auto" and not highlight_clips and not single_pass and cut_mode == "reencode"
+                and clips_to_process and not completed and not all_cuts_cached):
+            parts = {suffix_idx: Future() for _, _, suffix_idx in clips_to_process}
+            split_pattern = storage.scratch(job_id, f"{base_name}_Part_%d.mp4")
+            # Split at every part end so a dropped short tail becomes its own segment
+            split_times = [end for _, end, _ in clips_to_process if end < video_duration]
+
+            def on_segment(number, path):
+                if number in parts:
+                    parts[number].set_result(path)
+                elif os.path.exists(path):
+                    # Trailing part below the minimum length
+                    os.remove(path)
+
+            def run_split():
+                try:
+                    with span("splitting_source", trace):
+                        split_video(video_path, split_pattern, split_times, on_segment=on_segment, encoder=encoder)
+                    error = RuntimeError("Split finished without producing every part")
+                except Exception as e:
+                    error = e
+                for part in parts.values():
+                    if not part.done():
+                        part.set_exception(error)
+
+            def split_stage(clip, threads):
+                clip["input"] = parts[clip["suffix"]].result()
+                # Parts are frame-accurate re-encoded cuts, so they cache like cut_video output
+                clip["key"] = ArtifactCache.key(source, "cut", start=clip["start"], end=clip["end"], mode="reencode",
+                                                encoder=encoder)
+                artifact_cache.store(clip["key"], clip["input"])
+                return clip
+
+            threading.Thread(target=run_split, daemon=True).start()
+            stages = [Stage("splitting", split_stage, CUT_WORKERS)] + staged[1:]
+
+        clips = []
+        for start, end, suffix_idx in clips_to_process:
+            clip_name = f"{base_name}_Part_{suffix_idx}.mp4"
+            clips.append({
+                "suffix": suffix_idx,
+                "start": start,
+                "end": end,
+                "path": storage.scratch(job_id, clip_name),
+                "font_size": source_font_size,
+                "encoder": encoder
+            })
+
+        # Status is derived from counts under a lock so it only moves forward,
+        # whatever order the workers finish in.
+        status_lock = threading.Lock()
+        clip_status = ["done" if str(clip["suffix"]) in completed else "queued" for clip in clips]
+        pending = [i for i, clip in enumerate(clips) if str(clip["suffix"]) not in completed]
+        jobs_store[job_id]["clip_status"] = clip_status
+        jobs_store[job_id]["status"] = f"processing_{len(clips) - len(pending)}/{len(clips)}"
+
+        def on_progress(index, stage_name):
+            reporter.clip(clips[pending[index]]["suffix"], stage_name, 100.0 if stage_name == "done" else 0.0)
+            with status_lock:
+                clip_status[pending[index]] = stage_name
+                done = clip_status.count("done")
+                jobs_store[job_id]["clip_status"] = list(clip_status)
+                jobs_store[job_id]["status"] = f"processing_{done}/{len(clips)}"
+
+        def on_result(index, clip):
+            path = storage.publish(clip["input"], sidecars=[caption_sidecar(clip["input"])])
+            with status_lock:
+                completed[str(clip["suffix"])] = path
+                jobs_store[job_id]["completed_clips"] = dict(completed)
+
+        ClipPipeline(stages, on_progress=on_progress, on_result=on_result,
+                     trace=trace, cancel=cancel).run([clips[i] for i in pending])
+        if cancelled():
+            return
+        output_files = [completed[str(clip["suffix"])] for clip in clips]
 
         jobs_store[job_id]["status"] = "completed"
         jobs_store[job_id]["output_files"] = output_files
         
     except Exception as e:
+        if cancelled():
+            print(f"Job {job_id} stopped after losing its lease: {e}")
+            return
         jobs_store[job_id]["status"] = "failed"
         jobs_store[job_id]["error"] = str(e)
         print(f"Job {job_id} failed: {e}")
+    finally:
+        if cancelled():
+            registry.job_finished("lease_lost")
+        else:
+            storage.cleanup_job(job_id)
+            trace.flush(force=True)
+            registry.job_finished(jobs_store[job_id].get("status"))
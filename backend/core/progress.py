@@ -0,0 +1,113 @@
+import time
+import json
+import asyncio
+import threading
+
+PROGRESS_INTERVAL = 0.5 # seconds between progress writes / pushes
+
+
+class ProgressReporter:
+    """
+    Collects fine-grained progress for one job (per-clip stage and percentage, transcription
+    position) and writes it to the job record as `progress`, at most every `interval` seconds.
+    """
+
+    def __init__(self, record, interval: float = PROGRESS_INTERVAL):
+        self.record = record
+        self.interval = interval
+        self.clips = {}
+        self.transcription = None
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    def clip(self, suffix, stage: str, percent: float = 0.0):
+        with self._lock:
+            self.clips[str(suffix)] = {"stage": stage, "percent": round(min(percent, 100.0), 1)}
+        self.flush(force=stage == "done")
+
+    def transcribing(self, position: float, duration: float):
+        with self._lock:
+            self.transcription = {
+                "position": round(position, 1),
+                "duration": round(duration, 1),
+                "percent": round(min(100.0 * position / duration, 100.0), 1) if duration else None
+            }
+        self.flush(force=duration > 0 and position >= duration)
+
+    def flush(self, force: bool = False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_write < self.interval:
+                return
+            self._last_write = now
+            snapshot = {"clips": dict(self.clips), "transcription": self.transcription}
+        self.record["progress"] = snapshot
+
+
+class ProgressHub:
+    """
+    Fans job record changes out to streaming subscribers. One poller per watched job reads
+    the store and pushes only when something changed, so N viewers cost one store read per
+    interval instead of N polls against the API.
+    """
+
+    def __init__(self, store, interval: float = PROGRESS_INTERVAL):
+        self.store = store
+        self.interval = interval
+        self._subscribers = {} # job_id -> set of asyncio.Queue
+        self._pollers = {} # job_id -> asyncio.Task
+        self._latest = {} # job_id -> last snapshot a poller pushed, for subscribers joining later
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, item):
+        # Subscribers only care about the latest snapshot; replace anything unread
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    @staticmethod
+    def _final(data) -> bool:
+        # Nothing more will change: the job is gone or finished, or it's a batch record
+        # (whose own fields never move; GET /batch/{id} derives its progress)
+        return data is None or data.get("status") in ("completed", "failed") or "job_ids" in data
+
+    async def _poll(self, job_id: str):
+        last = None
+        while self._subscribers.get(job_id):
+            data = await asyncio.to_thread(self.store.get, job_id)
+            encoded = json.dumps(data, sort_keys=True)
+            if encoded != last:
+                last = encoded
+                self._latest[job_id] = data
+                for queue in list(self._subscribers.get(job_id, ())):
+                    self._offer(queue, data)
+            if self._final(data):
+                break
+            await asyncio.sleep(self.interval)
+        self._pollers.pop(job_id, None)
+        self._latest.pop(job_id, None)
+
+    async def subscribe(self, job_id: str):
+        """
+        Async generator of job record snapshots, starting with the current one and ending once
+        the job completes or fails.
+        """
+        queue = asyncio.Queue(maxsize=1)
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        if job_id not in self._pollers:
+            self._pollers[job_id] = asyncio.create_task(self._poll(job_id))
+        elif job_id in self._latest:
+            # The poller only pushes changes; catch this subscriber up with what it already sent
+            self._offer(queue, self._latest[job_id])
+        try:
+            while True:
+                data = await queue.get()
+                yield data
+                if self._final(data):
+                    return
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[job_id]
@@ -0,0 +1,157 @@
+import os
+import subprocess
+import numpy as np
+from .ffmpeg_utils import seek_args, filter_path
+
+try:
+    import cv2 # optional: face-centred framing
+except ImportError:
+    cv2 = None
+
+# Analysis runs on a few grey low-res frames per second; the decode is the only real cost
+SAMPLE_FPS = 4
+SAMPLE_WIDTH = 320
+# Crop positions are emitted at this rate and interpolated from the samples
+COMMAND_FPS = 10
+# Seconds of Gaussian smoothing on the centre track, so the window glides instead of jittering
+SMOOTHING_SECONDS = 1.0
+# Frame differences (0-255) below this are treated as sensor/compression noise, and a
+# sample with less than MOTION_MIN_FRACTION of its pixels moving counts as static
+MOTION_NOISE = 12
+MOTION_MIN_FRACTION = 0.002
+USE_FACES = os.getenv("REFRAME_FACES", "1") != "0"
+
+_face_detector = None
+
+
+def vertical_crop_size(width: int, height: int):
+    # Largest 9:16 window of the frame, or None when the frame is already that narrow
+    crop_w = int(height * 9 / 16) // 2 * 2
+    if width <= 0 or height <= 0 or crop_w >= width:
+        return None
+    return crop_w, height
+
+
+def sample_frames(video_path: str, start: float = None, end: float = None, fps: int = SAMPLE_FPS,
+                  width: int = SAMPLE_WIDTH, source_size: tuple = None) -> np.ndarray:
+    """
+    Grey frames of width x (proportional height) at `fps`, piped from ffmpeg as raw bytes.
+    Returns an (n, h, w) uint8 array.
+    """
+    src_w, src_h = source_size
+    height = max(2, int(round(width * src_h / src_w / 2)) * 2)
+    cmd = [
+        "ffmpeg", "-nostdin",
+        # Frames only feed a 320px analysis; skipping the deblocking filter speeds decode up
+        "-skip_loop_filter", "all",
+        *seek_args(start, end),
+        "-i", video_path,
+        "-an", "-vf", f"fps={fps},scale={width}:{height}:flags=fast_bilinear,format=gray",
+        "-f", "rawvideo", "pipe:1"
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+    frame_bytes = width * height
+    count = len(result.stdout) // frame_bytes
+    return np.frombuffer(result.stdout[:count * frame_bytes], dtype=np.uint8).reshape(count, height, width)
+
+
+def _faces(frame: np.ndarray):
+    global _face_detector
+    if cv2 is None or not USE_FACES:
+        return []
+    if _face_detector is None:
+        _face_detector = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    return _face_detector.detectMultiScale(frame, scaleFactor=1.15, minNeighbors=4, minSize=(20, 20))
+
+
+def saliency_centres(frames: np.ndarray) -> np.ndarray:
+    """
+    Horizontal point of interest per frame as a fraction of the width: the largest face
+    when OpenCV finds one, otherwise the centroid of motion (absolute difference to the
+    previous frame, summed per column). NaN where neither says anything.
+    """
+    n, _, w = frames.shape
+    centres = np.full(n, np.nan)
+    columns = np.arange(w) + 0.5
+    previous = None
+    for i, frame in enumerate(frames):
+        faces = _faces(frame)
+        if len(faces):
+            x, _, fw, _ = max(faces, key=lambda f: f[2] * f[3])
+            centres[i] = (x + fw / 2) / w
+        elif previous is not None:
+            diff = np.abs(frame.astype(np.int16) - previous)
+            moving = diff > MOTION_NOISE
+            if moving.mean() >= MOTION_MIN_FRACTION:
+                energy = np.where(moving, diff, 0).sum(axis=0).astype(np.float64)
+                centres[i] = float((columns * energy).sum() / energy.sum()) / w
+        previous = frame.astype(np.int16)
+    return centres
+
+
+def smooth_track(centres: np.ndarray, fps: float = SAMPLE_FPS, sigma_seconds: float = SMOOTHING_SECONDS) -> np.ndarray:
+    # Gaps hold the last known centre (frame centre before anything is seen), then a
+    # Gaussian blur takes out the jitter
+    filled = np.empty(len(centres))
+    last = 0.5
+    for i, c in enumerate(centres):
+        if not np.isnan(c):
+            last = c
+        filled[i] = last
+    sigma = sigma_seconds * fps
+    if len(filled) < 2 or sigma <= 0:
+        return filled
+    radius = int(3 * sigma)
+    kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+    kernel /= kernel.sum()
+    padded = np.pad(filled, radius, mode="edge")
+    return np.convolve(padded, kernel, mode="valid")
+
+
+def crop_offsets(track: np.ndarray, width: int, crop_w: int) -> np.ndarray:
+    # Centre fractions -> even left offsets that keep the window inside the frame
+    x = np.clip(track * width - crop_w / 2, 0, width - crop_w)
+    return (x // 2 * 2).astype(int)
+
+
+def write_sendcmd(offsets: np.ndarray, fps: float, cmd_path: str, rate: int = COMMAND_FPS):
+    # One crop x command per 1/rate seconds, interpolated between samples; unchanged
+    # positions are skipped
+    times = np.arange(len(offsets)) / fps
+    out_times = np.arange(0, times[-1] + 1e-9, 1 / rate) if len(times) else np.zeros(0)
+    values = np.interp(out_times, times, offsets) if len(times) else np.zeros(0)
+    with open(cmd_path, "w", encoding="utf-8") as f:
+        previous = None
+        for t, x in zip(out_times, values):
+            x = int(x) // 2 * 2
+            if x != previous:
+                f.write(f"{t:.3f} crop x {x};\n")
+                previous = x
+
+
+def plan_reframe(video_path: str, cmd_path: str, source_size: tuple, start: float = None, end: float = None) -> str:
+    """
+    Analyses [start, end) of video_path and returns a filter that crops it to a moving
+    9:16 window: sendcmd replays the smoothed crop track from cmd_path into crop while the
+    clip encodes, so no frame goes through Python at full resolution. Timestamps are
+    relative to the start of the (input-seeked) range. Returns None if the source is
+    already 9:16 or narrower.
+    """
+    width, height = source_size
+    size = vertical_crop_size(width, height)
+    if size is None:
+        return None
+    crop_w, crop_h = size
+    frames = sample_frames(video_path, start, end, source_size=source_size)
+    offsets = crop_offsets(smooth_track(saliency_centres(frames)), width, crop_w)
+    if len(offsets) == 0:
+        # Nothing decoded (very short range): a static centre crop
+        return f"crop={crop_w}:{crop_h}:{(width - crop_w) // 4 * 2}:0"
+    write_sendcmd(offsets, SAMPLE_FPS, cmd_path)
+    return f"sendcmd=f='{filter_path(cmd_path)}',crop={crop_w}:{crop_h}:{int(offsets[0])}:0"
+
+
+def reframe_settings() -> dict:
+    # Everything that changes the crop track, for cache keys
+    return {"fps": SAMPLE_FPS, "width": SAMPLE_WIDTH, "smoothing": SMOOTHING_SECONDS,
+            "faces": cv2 is not None and USE_FACES}
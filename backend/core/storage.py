@@ -0,0 +1,154 @@
+import os
+import time
+import shutil
+import threading
+from .uploads import UPLOAD_DIR
+
+# Finished clips, served under /static
+OUTPUT_DIR = os.getenv("OUTPUT_DIR", "temp/output")
+# Intermediates (cuts, upscales, transcripts, crop tracks). Point this at a tmpfs or fast
+# local disk; nothing in it is published and it's emptied per job.
+SCRATCH_DIR = os.getenv("SCRATCH_DIR", "temp/scratch")
+# Budget for uploads + published outputs together; the least recently used files of
+# finished jobs are evicted beyond it
+STORAGE_QUOTA_BYTES = int(float(os.getenv("STORAGE_QUOTA_GB", "50")) * 1024 ** 3)
+# Files younger than this are never evicted (an upload waiting for its job, a clip just
+# published by a worker in another process)
+MIN_AGE_SECONDS = float(os.getenv("STORAGE_MIN_AGE", "3600"))
+
+JOB_ID_LENGTH = 36 # uuid4 prefix on every job file
+
+
+class StorageManager:
+    """
+    File lifecycle for jobs. Every job file is named "<job_id>_<name>", so the files of a
+    job can be found (and removed) without a separate index, including after a restart:
+    - intermediates live in scratch and are deleted once the next stage has consumed them,
+      and whatever is left when the job ends;
+    - finished clips are published into the output directory;
+    - uploads and outputs together are kept under a quota by LRU eviction.
+    """
+
+    def __init__(self, scratch_dir: str = SCRATCH_DIR, output_dir: str = OUTPUT_DIR, upload_dir: str = UPLOAD_DIR,
+                 quota_bytes: int = STORAGE_QUOTA_BYTES, min_age: float = MIN_AGE_SECONDS):
+        self.scratch_dir = scratch_dir
+        self.output_dir = output_dir
+        self.upload_dir = upload_dir
+        self.quota_bytes = quota_bytes
+        self.min_age = min_age
+        for d in (scratch_dir, output_dir, upload_dir):
+            os.makedirs(d, exist_ok=True)
+        self._lock = threading.Lock()
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.released_bytes = 0
+
+    def scratch(self, job_id: str, name: str) -> str:
+        return os.path.join(self.scratch_dir, f"{job_id}_{name}")
+
+    def _in_scratch(self, path: str) -> bool:
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.scratch_dir)
+
+    def release(self, *paths: str):
+        """
+        Deletes intermediates a downstream stage has consumed. Anything outside scratch
+        (the source upload, published clips) is left alone.
+        """
+        for path in paths:
+            if path and self._in_scratch(path) and os.path.exists(path):
+                size = os.path.getsize(path)
+                os.remove(path)
+                with self._lock:
+                    self.released_bytes += size
+
+    def publish(self, path: str, sidecars: list[str] = ()) -> str:
+        """
+        Moves a finished clip (and sidecars such as its .srt, if present) from scratch into
+        the output directory. Returns the published path.
+        """
+        published = None
+        for src in [path, *sidecars]:
+            if not src or not os.path.exists(src):
+                continue
+            dst = os.path.join(self.output_dir, os.path.basename(src))
+            if os.path.abspath(src) != os.path.abspath(dst):
+                if os.path.exists(dst):
+                    os.remove(dst)
+                # rename when scratch shares the filesystem, copy across (e.g. from tmpfs)
+                shutil.move(src, dst)
+            if src == path:
+                published = dst
+        return published or path
+
+    def job_files(self, job_id: str) -> dict:
+        prefix = f"{job_id}_"
+        return {
+            "scratch": sorted(os.path.join(self.scratch_dir, n) for n in os.listdir(self.scratch_dir) if n.startswith(prefix)),
+            "outputs": sorted(os.path.join(self.output_dir, n) for n in os.listdir(self.output_dir) if n.startswith(prefix))
+        }
+
+    def cleanup_job(self, job_id: str):
+        # Whatever a job left in scratch (crop tracks, transcripts, clips from a failed stage)
+        self.release(*self.job_files(job_id)["scratch"])
+
+    def sweep_scratch(self, active: dict):
+        # Startup: drop scratch left behind by jobs that are no longer queued or running
+        for name in os.listdir(self.scratch_dir):
+            if name[:JOB_ID_LENGTH] not in active:
+                self.release(os.path.join(self.scratch_dir, name))
+
+    def touch(self, path: str):
+        # Downloads count as use for LRU eviction
+        if os.path.exists(path):
+            os.utime(path)
+
+    def _usage(self):
+        entries = []
+        for d in (self.output_dir, self.upload_dir):
+            for name in os.listdir(d):
+                path = os.path.join(d, name)
+                if os.path.isfile(path):
+                    st = os.stat(path)
+                    entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def enforce_quota(self, active: dict = None):
+        """
+        Evicts the least recently used uploads and outputs until usage fits the quota.
+        `active` maps queued/running job ids to their configs; their outputs and source
+        uploads are kept, as are resumable-upload parts and files younger than min_age.
+        """
+        active = active or {}
+        protected = {os.path.abspath(c.get("video_path") or "") for c in active.values()}
+        with self._lock:
+            entries = self._usage()
+            total = sum(size for _, size, _ in entries)
+            now = time.time()
+            for mtime, size, path in sorted(entries):
+                if total <= self.quota_bytes:
+                    break
+                name = os.path.basename(path)
+                if (now - mtime < self.min_age or name[:JOB_ID_LENGTH] in active
+                        or os.path.abspath(path) in protected or ".part" in name or name.endswith(".json")):
+                    continue
+                os.remove(path)
+                total -= size
+                self.evicted_files += 1
+                self.evicted_bytes += size
+                print(f"Storage quota: evicted {path} ({size / 1024 ** 2:.0f} MB)")
+
+    def stats(self) -> dict:
+        entries = self._usage()
+        scratch = sum(os.path.getsize(os.path.join(self.scratch_dir, n)) for n in os.listdir(self.scratch_dir))
+        with self._lock:
+            return {
+                "used_bytes": sum(size for _, size, _ in entries),
+                "quota_bytes": self.quota_bytes,
+                "scratch_bytes": scratch,
+                "released_bytes": self.released_bytes,
+                "evicted_files": self.evicted_files,
+                "evicted_bytes": self.evicted_bytes
+            }
+
+
+storage = StorageManager()
@@ -1,5 +1,10 @@
 from faster_whisper import WhisperModel
+from collections import OrderedDict
+import threading
+import time
+import json
 import os
+from .metrics import span
 
 # Initialize model (lazy loading or global)
 # Using 'small' or 'base' for CPU usage as requested. 'int8' quantization.
@@ -7,17 +12,186 @@ MODEL_SIZE = "small"
 DEVICE = "cpu"
 COMPUTE_TYPE = "int8"
 
-def transcribe_audio(audio_path: str):
+# Caption profiles. "standard" is the original behaviour plus VAD; "fast" is for drafts:
+# greedy decoding on a smaller model.
+CAPTION_PROFILES = {
+    "standard": {"model": MODEL_SIZE, "beam_size": 5, "vad": True},
+    "fast": {"model": "base", "beam_size": 1, "vad": True},
+}
+# Silero VAD (built into faster-whisper) settings: drop pauses/music beds longer than this
+VAD_PARAMETERS = {"min_silence_duration_ms": 500, "speech_pad_ms": 200}
+
+# Warm model pool limits. Each 'small' int8 model is a few hundred MB of RAM.
+MAX_LOADED_MODELS = int(os.getenv("WHISPER_MAX_MODELS", "2"))
+MODEL_IDLE_TIMEOUT = float(os.getenv("WHISPER_IDLE_TIMEOUT", "900")) # seconds
+
+
+class ModelPool:
     """
-    Transcribes the audio file and returns segments.
+    Process-wide registry of loaded Whisper models keyed by (size, device, compute_type).
+    Keeps at most `max_models` warm instances, evicting the least recently used one
+    and any model that has been idle longer than `idle_timeout` seconds (checked by a
+    background reaper, so an idle process actually gives the memory back).
+    """
+
+    def __init__(self, max_models: int = MAX_LOADED_MODELS, idle_timeout: float = MODEL_IDLE_TIMEOUT):
+        self.max_models = max(1, max_models)
+        self.idle_timeout = idle_timeout
+        self._models = OrderedDict() # key -> [model, last_used]
+        self._loading = {} # key -> lock held while that model loads
+        self._lock = threading.Lock()
+        self._reaper = None
+        self.loads = 0
+
+    def get(self, size: str = MODEL_SIZE, device: str = DEVICE, compute_type: str = COMPUTE_TYPE):
+        key = (size, device, compute_type)
+        with self._lock:
+            self._start_reaper()
+            model = self._touch(key)
+            if model is not None:
+                return model
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        # Concurrent callers for the same model wait for one load instead of each building
+        # their own copy; other models stay available while it loads.
+        with key_lock:
+            with self._lock:
+                model = self._touch(key)
+                if model is not None:
+                    return model
+            try:
+                print(f"Loading Whisper Model: {size} on {device}...")
+                with span("loading_model"):
+                    model = WhisperModel(size, device=device, compute_type=compute_type)
+                with self._lock:
+                    self._models[key] = [model, time.monotonic()]
+                    self.loads += 1
+                    while len(self._models) > self.max_models:
+                        evicted, _ = self._models.popitem(last=False)
+                        print(f"Evicting Whisper Model: {evicted[0]} on {evicted[1]}")
+                return model
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+
+    def _touch(self, key):
+        # The loaded model for key, marked most recently used; None if not loaded
+        entry = self._models.get(key)
+        if entry is None:
+            return None
+        self._models.move_to_end(key)
+        entry[1] = time.monotonic()
+        return entry[0]
+
+    def _start_reaper(self):
+        if self.idle_timeout <= 0 or self._reaper is not None:
+            return
+        self._reaper = threading.Thread(target=self._reap, daemon=True, name="whisper-reaper")
+        self._reaper.start()
+
+    def _reap(self):
+        interval = min(60.0, self.idle_timeout / 2)
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                self._evict_idle()
+
+    def _evict_idle(self):
+        if self.idle_timeout <= 0:
+            return
+        now = time.monotonic()
+        for key in [k for k, (_, last_used) in self._models.items() if now - last_used > self.idle_timeout]:
+            print(f"Unloading idle Whisper Model: {key[0]} on {key[1]}")
+            del self._models[key]
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models.keys())
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+model_pool = ModelPool()
+
+
+def get_model(size: str = MODEL_SIZE, device: str = DEVICE, compute_type: str = COMPUTE_TYPE):
+    return model_pool.get(size, device, compute_type)
+
+
+def warm_up(size: str = MODEL_SIZE, device: str = DEVICE, compute_type: str = COMPUTE_TYPE):
+    """
+    Loads the default model ahead of the first job so its load time is paid at startup.
+    """
+    start = time.perf_counter()
+    get_model(size, device, compute_type)
+    print(f"Whisper Model ready in {time.perf_counter() - start:.1f}s")
+
+
+def caption_settings(profile: str = "standard", beam_size: int = None, vad: bool = None) -> dict:
+    """
+    Resolves a caption profile plus per-job overrides into {"model", "beam_size", "vad"}.
+    """
+    settings = dict(CAPTION_PROFILES.get(profile) or CAPTION_PROFILES["standard"])
+    if beam_size:
+        settings["beam_size"] = beam_size
+    if vad is not None:
+        settings["vad"] = vad
+    return settings
+
+
+def transcribe_words(audio, on_progress=None, settings: dict = None):
+    """
+    Transcribes audio (a file path, or 16 kHz mono float32 samples as read_audio returns)
+    and returns a flat list of timed words, the language and
+    decode stats. Words are plain dicts ({"start", "end", "word"}) so they can be persisted
+    and sliced. With VAD on, non-speech spans are dropped before decoding; faster-whisper
+    maps the timestamps back onto the original timeline.
+    on_progress(position, duration) is called after each decoded segment.
     """
-    print(f"Loading Whisper Model: {MODEL_SIZE} on {DEVICE}...")
-    model = WhisperModel(MODEL_SIZE, device=DEVICE, compute_type=COMPUTE_TYPE)
+    settings = settings or caption_settings()
+    model = get_model(settings["model"])
     
-    print(f"Transcribing {audio_path}...")
+    label = audio if isinstance(audio, str) else f"{len(audio) / 16000:.0f}s of in-memory audio"
+    print(f"Transcribing {label}...")
+    start = time.perf_counter()
     # Request word timestamps
-    segments, info = model.transcribe(audio_path, beam_size=5, word_timestamps=True)
+    segments, info = model.transcribe(
+        audio,
+        beam_size=settings["beam_size"],
+        word_timestamps=True,
+        vad_filter=settings["vad"],
+        vad_parameters=VAD_PARAMETERS if settings["vad"] else None
+    )
     
+    words = []
+    for segment in segments:
+        for word in segment.words or []:
+            words.append({"start": word.start, "end": word.end, "word": word.word})
+        if on_progress:
+            on_progress(segment.end, info.duration)
+
+    # Decoder time scales with the audio actually decoded, so the VAD speedup is roughly
+    # total / speech duration
+    speech = info.duration_after_vad if settings["vad"] and info.duration_after_vad is not None else info.duration
+    wall = time.perf_counter() - start
+    stats = {
+        **settings,
+        "audio_seconds": round(info.duration, 2),
+        "speech_seconds": round(speech, 2),
+        "skipped_fraction": round(1 - speech / info.duration, 3) if info.duration else 0.0,
+        "estimated_speedup": round(info.duration / speech, 2) if speech else None,
+        "wall_seconds": round(wall, 2),
+        "realtime_factor": round(info.duration / wall, 2) if wall > 0 else None
+    }
+    
+    return words, info.language, stats
+
+
+def chunk_words(words: list[dict]):
+    """
+    Groups timed words into short caption segments.
+    """
     result = []
     
     # Custom segmentation: simpler, shorter phrases (karaoke style)
@@ -26,42 +200,79 @@ def transcribe_audio(audio_path: str):
     current_chunk = []
     chunk_start = 0.0
     
-    for segment in segments:
-        words = segment.words
-        if not words:
+    for word in words:
+        if not current_chunk:
+            chunk_start = word["start"]
+            current_chunk.append(word)
             continue
-            
-        for word in words:
-            if not current_chunk:
-                chunk_start = word.start
-                current_chunk.append(word)
-                continue
-            
-            # Conditions to break chunk:
-            # 1. Chunk has 4 words
-            # 2. Duration > 2.0s
-            # 3. Gap > 0.5s
-            duration = word.end - chunk_start
-            gap = word.start - current_chunk[-1].end
-            
-            if len(current_chunk) >= 4 or duration > 2.0 or gap > 0.5:
-                # Flush current chunk
-                result.append({
-                    "start": chunk_start,
-                    "end": current_chunk[-1].end,
-                    "text": " ".join([w.word for w in current_chunk]).strip()
-                })
-                current_chunk = [word]
-                chunk_start = word.start
-            else:
-                current_chunk.append(word)
+        
+        # Conditions to break chunk:
+        # 1. Chunk has 4 words
+        # 2. Duration > 2.0s
+        # 3. Gap > 0.5s
+        duration = word["end"] - chunk_start
+        gap = word["start"] - current_chunk[-1]["end"]
+        
+        if len(current_chunk) >= 4 or duration > 2.0 or gap > 0.5:
+            # Flush current chunk
+            result.append({
+                "start": chunk_start,
+                "end": current_chunk[-1]["end"],
+                "text": " ".join([w["word"] for w in current_chunk]).strip()
+            })
+            current_chunk = [word]
+            chunk_start = word["start"]
+        else:
+            current_chunk.append(word)
                 
     # Flush remaining
     if current_chunk:
         result.append({
             "start": chunk_start,
-            "end": current_chunk[-1].end,
-            "text": " ".join([w.word for w in current_chunk]).strip()
+            "end": current_chunk[-1]["end"],
+            "text": " ".join([w["word"] for w in current_chunk]).strip()
         })
     
-    return result, info.language
+    return result
+
+
+def slice_words(words: list[dict], ranges: list[tuple[float, float]]):
+    """
+    Cuts a source-level word list down to the given (start, end) ranges and rebases
+    the timestamps onto the output timeline, where the ranges play back to back.
+    A word belongs to a range if its midpoint falls inside it, so words straddling
+    a cut are kept whole on one side instead of being chopped.
+    """
+    result = []
+    offset = 0.0
+    for start, end in ranges:
+        length = end - start
+        for word in words:
+            mid = (word["start"] + word["end"]) / 2
+            if start <= mid < end:
+                result.append({
+                    "start": offset + max(word["start"] - start, 0.0),
+                    "end": offset + min(word["end"] - start, length),
+                    "word": word["word"]
+                })
+        offset += length
+    return result
+
+
+def save_transcript(path: str, words: list[dict], language: str, stats: dict = None):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"language": language, "words": words, "stats": stats}, f)
+
+
+def load_transcript(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data["words"], data["language"], data.get("stats")
+
+
+def transcribe_audio(audio_path: str):
+    """
+    Transcribes the audio file and returns segments.
+    """
+    words, language, stats = transcribe_words(audio_path)
+    return chunk_words(words), language
@@ -0,0 +1,265 @@
+import os
+import mmap
+import time
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+from faster_whisper import BatchedInferencePipeline
+from .transcription import get_model, caption_settings, transcribe_words, VAD_PARAMETERS
+from .ffmpeg_utils import read_audio, AUDIO_RATE
+from .metrics import span
+
+SAMPLE_RATE = AUDIO_RATE
+# Chunks decoded together per forward pass of the batched pipeline
+BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+# How long the first request of a batch may wait for others to join it
+MAX_BATCH_LATENCY = float(os.getenv("WHISPER_MAX_LATENCY", "2.0"))
+# Requests are concatenated up to this much audio; anything longer runs on its own
+MAX_BATCH_AUDIO = float(os.getenv("WHISPER_MAX_BATCH_AUDIO", "900"))
+# Silence between concatenated requests so no word can straddle two of them
+GAP_SECONDS = 2.0
+# Threads decoding audio and detecting the language of submitted requests, so that work
+# overlaps the batch being decoded instead of running in front of it
+PREPARE_WORKERS = int(os.getenv("WHISPER_PREPARE_WORKERS", "2"))
+
+
+def _is_mapped(audio) -> bool:
+    # read_audio backs long sources with an anonymous mmap; follow the views to the buffer
+    base = audio
+    while isinstance(base, np.ndarray):
+        base = base.base
+    if isinstance(base, memoryview):
+        base = base.obj
+    return isinstance(base, mmap.mmap)
+
+
+class TranscriptionRequest:
+    def __init__(self, audio, settings: dict, on_progress=None):
+        # A media path (decoded through ffmpeg's PCM pipe) or samples already in memory
+        self.audio = audio
+        self.settings = settings
+        self.on_progress = on_progress
+        self.future = Future()
+        self.submitted = time.monotonic()
+        self.language = None
+
+    @property
+    def duration(self) -> float:
+        return len(self.audio) / SAMPLE_RATE
+
+    @property
+    def solo(self) -> bool:
+        # Decoded on its own through transcribe_words: the batched pipeline needs VAD to
+        # find its chunks, and joining an mmap'd buffer would copy it onto the heap
+        return not self.settings["vad"] or _is_mapped(self.audio)
+
+
+class TranscriptionService:
+    """
+    One lane in front of the warm model pool that every job's transcription goes through.
+    Pending requests with the same settings and language are concatenated (with silence
+    between them) and decoded together by faster-whisper's batched pipeline, then the
+    words are split back out per request. A request waits at most MAX_BATCH_LATENCY for
+    company, so a lone small job is never held back for long. Requests without VAD, and
+    sources long enough to be memory-mapped, are decoded alone.
+    """
+
+    def __init__(self, batch_size: int = BATCH_SIZE, max_latency: float = MAX_BATCH_LATENCY,
+                 max_batch_audio: float = MAX_BATCH_AUDIO, prepare_workers: int = PREPARE_WORKERS):
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.max_batch_audio = max_batch_audio
+        self._queue = queue.Queue()
+        self._preparer = ThreadPoolExecutor(max_workers=max(1, prepare_workers),
+                                            thread_name_prefix="transcription-prepare")
+        self._pending = []
+        self._thread = None
+        self._lock = threading.Lock()
+        # Throughput counters: audio seconds decoded per CPU second of the process
+        # (CTranslate2 decodes on its own threads, so thread CPU time would undercount)
+        self.audio_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.batches = 0
+
+    def submit(self, audio, settings: dict = None, on_progress=None) -> Future:
+        """
+        Queues a transcription of a media path or 16 kHz mono float32 samples. The future resolves to (words, language, stats), the same
+        shape transcribe_words returns.
+        """
+        request = TranscriptionRequest(audio, settings or caption_settings(), on_progress)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="transcription-service", daemon=True)
+                self._thread.start()
+        self._preparer.submit(self._prepare, request)
+        return request.future
+
+    def _prepare(self, request: TranscriptionRequest):
+        # Decode and identify the language up front so batches never mix languages; runs on
+        # the prepare threads, then the request joins the queue
+        try:
+            if isinstance(request.audio, str):
+                request.audio = read_audio(request.audio, SAMPLE_RATE)
+            model = get_model(request.settings["model"])
+            if not request.solo and hasattr(model, "detect_language"):
+                request.language, _, _ = model.detect_language(audio=request.audio, vad_filter=request.settings["vad"])
+        except Exception as e:
+            request.future.set_exception(e)
+            return
+        self._queue.put(request)
+
+    def _next_batch(self):
+        # Oldest request leads; others with matching settings/language join while they fit
+        lead = self._pending[0]
+        batch = [lead]
+        total = lead.duration
+        for request in self._pending[1:] if not lead.solo else []:
+            if request.solo or request.settings != lead.settings or request.language != lead.language:
+                continue
+            if total + request.duration > self.max_batch_audio:
+                continue
+            batch.append(request)
+            total += request.duration
+        for request in batch:
+            self._pending.remove(request)
+        return batch
+
+    def _run(self):
+        while True:
+            if not self._pending:
+                self._pending.append(self._queue.get())
+                continue
+            # Gather more requests until the lead has waited max_latency or the batch is full
+            lead = self._pending[0]
+            while not lead.solo and lead.duration < self.max_batch_audio:
+                remaining = self.max_latency - (time.monotonic() - lead.submitted)
+                if remaining <= 0:
+                    break
+                try:
+                    self._pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                if sum(r.duration for r in self._pending) >= self.max_batch_audio:
+                    break
+            batch = self._next_batch()
+            try:
+                # Shared by several jobs, so it only shows in the process-wide metrics
+                with span("transcribing_batch"):
+                    if batch[0].solo:
+                        self._transcribe_solo(batch[0])
+                    else:
+                        self._transcribe_batch(batch)
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _transcribe_solo(self, request: TranscriptionRequest):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        words, language, stats = transcribe_words(request.audio, request.on_progress, request.settings)
+        with self._lock:
+            self.audio_seconds += request.duration
+            self.cpu_seconds += time.process_time() - cpu_start
+            self.batches += 1
+        stats.update(batched_with=0, queue_seconds=round(wall_start - request.submitted, 2))
+        request.future.set_result((words, language, stats))
+
+    def _transcribe_batch(self, batch: list[TranscriptionRequest]):
+        settings = batch[0].settings
+        offsets = [0.0]
+        if len(batch) == 1:
+            # Nothing to join; decode the request's own buffer without copying it
+            audio = batch[0].audio
+            position = batch[0].duration
+        else:
+            gap = np.zeros(int(GAP_SECONDS * SAMPLE_RATE), dtype=np.float32)
+            parts = []
+            position = 0.0
+            for request in batch:
+                parts += [request.audio, gap]
+                position += request.duration + GAP_SECONDS
+                offsets.append(position)
+            offsets.pop()
+            audio = np.concatenate(parts)
+
+        pipeline = BatchedInferencePipeline(model=get_model(settings["model"]))
+        print(f"Transcribing batch of {len(batch)} ({position:.0f}s of audio)...")
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        segments, info = pipeline.transcribe(
+            audio,
+            language=batch[0].language,
+            beam_size=settings["beam_size"],
+            word_timestamps=True,
+            vad_filter=settings["vad"],
+            vad_parameters=VAD_PARAMETERS if settings["vad"] else None,
+            batch_size=self.batch_size
+        )
+
+        words = [[] for _ in batch]
+        # Decoded (speech) seconds per request: its share of the segments, so neither the
+        # other requests' audio nor the silence between them counts towards its VAD savings
+        speech = [0.0] * len(batch)
+        for segment in segments:
+            for j, offset in enumerate(offsets):
+                speech[j] += max(0.0, float(min(segment.end, offset + batch[j].duration) - max(segment.start, offset)))
+            for word in segment.words or []:
+                mid = (word.start + word.end) / 2
+                # Offsets are ascending; the word belongs to the last request starting before it
+                i = max(j for j, offset in enumerate(offsets) if offset <= mid)
+                offset = offsets[i]
+                words[i].append({"start": word.start - offset, "end": word.end - offset, "word": word.word})
+            i = max(j for j, offset in enumerate(offsets) if offset <= segment.end)
+            if batch[i].on_progress:
+                batch[i].on_progress(min(segment.end - offsets[i], batch[i].duration), batch[i].duration)
+
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        audio_seconds = sum(r.duration for r in batch)
+        if len(batch) == 1 and info.duration_after_vad is not None:
+            # Alone in the batch: faster-whisper's own figure covers exactly this request
+            speech = [min(info.duration_after_vad, batch[0].duration)]
+        with self._lock:
+            self.audio_seconds += audio_seconds
+            self.cpu_seconds += cpu
+            self.batches += 1
+
+        for request, request_words, request_speech in zip(batch, words, speech):
+            share = request.duration / audio_seconds if audio_seconds else 0.0
+            # Same keys as transcribe_words, plus how the request was batched
+            stats = {
+                **settings,
+                "batched_with": len(batch) - 1,
+                "audio_seconds": round(request.duration, 2),
+                "speech_seconds": round(request_speech, 2),
+                "skipped_fraction": round(1 - request_speech / request.duration, 3) if request.duration else 0.0,
+                "estimated_speedup": round(request.duration / request_speech, 2) if request_speech else None,
+                "wall_seconds": round(wall * share, 2),
+                "queue_seconds": round(wall_start - request.submitted, 2),
+                "realtime_factor": round(audio_seconds / wall, 2) if wall > 0 else None
+            }
+            request.future.set_result((request_words, request.language, stats))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return _throughput(self.batches, self.audio_seconds, self.cpu_seconds)
+
+
+def _throughput(batches: int, audio_seconds: float, cpu_seconds: float) -> dict:
+    return {
+        "batches": batches,
+        "audio_seconds": round(audio_seconds, 1),
+        "cpu_seconds": round(cpu_seconds, 1),
+        "audio_seconds_per_cpu_second": round(audio_seconds / cpu_seconds, 2) if cpu_seconds else None
+    }
+
+
+def merge_stats(stats: list[dict]) -> dict:
+    # Throughput of several processes' services (stats()) taken together
+    return _throughput(sum(s.get("batches", 0) for s in stats), sum(s.get("audio_seconds", 0.0) for s in stats),
+                       sum(s.get("cpu_seconds", 0.0) for s in stats))
+
+
+transcription_service = TranscriptionService()
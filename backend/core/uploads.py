@@ -0,0 +1,182 @@
+import os
+import json
+import uuid
+import struct
+import hashlib
+import threading
+from .ffmpeg_utils import probe_media
+
+UPLOAD_DIR = "temp/uploads"
+
+
+def find_moov_end(path: str, available: int):
+    """
+    Walks the top-level MP4 boxes in the first `available` bytes of path and returns the
+    offset where the moov box ends, or None if it hasn't fully arrived yet (or isn't MP4).
+    Once moov is in, ffprobe can read duration/streams from the partial file.
+    """
+    offset = 0
+    with open(path, "rb") as f:
+        while offset + 8 <= available:
+            f.seek(offset)
+            size, box_type = struct.unpack(">I4s", f.read(8))
+            if size == 1:
+                if offset + 16 > available:
+                    return None
+                size = struct.unpack(">Q", f.read(8))[0]
+            if size < 8:
+                # size 0 means "to end of file", which only mdat does; nothing after it
+                return None
+            if box_type == b"moov":
+                return offset + size if offset + size <= available else None
+            offset += size
+    return None
+
+
+class UploadSession:
+    """
+    A resumable upload written straight into temp/uploads. Chunks must arrive at the
+    current offset; the SHA-256 of the whole file is computed as bytes land, and the
+    session state is persisted next to the partial file so an upload survives restarts.
+    """
+
+    def __init__(self, upload_id: str, filename: str, size: int = None, offset: int = 0):
+        self.id = upload_id
+        self.filename = filename
+        self.size = size
+        self.offset = offset
+        self.path = os.path.join(UPLOAD_DIR, f"{upload_id}_{filename}")
+        self.part_path = self.path + ".part"
+        self.meta_path = self.part_path + ".json"
+        self.probe = None
+        self.finalized = False
+        self._probing = False
+        self._probe_started = False
+        self._hasher = None
+        self.lock = threading.Lock()
+
+    def _save(self):
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump({"filename": self.filename, "size": self.size, "offset": self.offset}, f)
+
+    def hasher(self):
+        if self._hasher is None:
+            # Fresh process resuming an upload: re-hash what's already on disk once
+            self._hasher = hashlib.sha256()
+            with open(self.part_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    self._hasher.update(chunk)
+        return self._hasher
+
+    def begin_chunk(self, offset: int):
+        if self.finalized:
+            raise ValueError("Upload already finalized")
+        if offset != self.offset:
+            raise ValueError(f"Expected offset {self.offset}, got {offset}")
+        # Drop any bytes left behind by an interrupted chunk
+        if os.path.getsize(self.part_path) > self.offset:
+            with open(self.part_path, "r+b") as f:
+                f.truncate(self.offset)
+        # Snapshot so a bad chunk can be rolled back
+        return self.hasher().copy(), hashlib.sha256()
+
+    def abort_chunk(self, snapshot):
+        with open(self.part_path, "r+b") as f:
+            f.truncate(self.offset)
+        self._hasher = snapshot
+
+    def write(self, f, data: bytes, chunk_hasher):
+        f.write(data)
+        self._hasher.update(data)
+        chunk_hasher.update(data)
+
+    def end_chunk(self, written: int, snapshot, chunk_hasher, checksum: str = None):
+        if checksum and chunk_hasher.hexdigest() != checksum.lower():
+            # Drop the corrupt chunk; the client retries from the old offset
+            self.abort_chunk(snapshot)
+            raise ValueError("Chunk checksum mismatch")
+        self.offset += written
+        self._save()
+        self.maybe_probe()
+
+    def maybe_probe(self):
+        # Start ffprobe in the background as soon as the moov atom has landed
+        if self._probe_started:
+            return
+        complete = self.size is not None and self.offset >= self.size
+        if not complete and find_moov_end(self.part_path, self.offset) is None:
+            return
+        self._probe_started = True
+        self._probing = True
+        threading.Thread(target=self._run_probe, daemon=True).start()
+
+    def _run_probe(self):
+        path = self.path if self.finalized else self.part_path
+        try:
+            self.probe = probe_media(path).to_dict()
+        except Exception as e:
+            print(f"Probe failed for upload {self.id}: {e}")
+        finally:
+            self._probing = False
+
+    def finalize(self, checksum: str = None) -> str:
+        if self.size is not None and self.offset != self.size:
+            raise ValueError(f"Upload incomplete: {self.offset}/{self.size} bytes")
+        digest = self.hasher().hexdigest()
+        if checksum and digest != checksum.lower():
+            raise ValueError("File checksum mismatch")
+        os.replace(self.part_path, self.path)
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+        self.finalized = True
+        if self.probe is None and not self._probing:
+            self._run_probe()
+        return digest
+
+    def info(self) -> dict:
+        return {
+            "upload_id": self.id,
+            "filename": self.filename,
+            "size": self.size,
+            "offset": self.offset,
+            "probe": self.probe
+        }
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def create_session(filename: str, size: int = None) -> UploadSession:
+    filename = os.path.basename(filename.replace("\\", "/")) or "video.mp4"
+    session = UploadSession(str(uuid.uuid4()), filename, size)
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    open(session.part_path, "wb").close()
+    session._hasher = hashlib.sha256()
+    session._save()
+    with _sessions_lock:
+        _sessions[session.id] = session
+    return session
+
+
+def get_session(upload_id: str):
+    with _sessions_lock:
+        session = _sessions.get(upload_id)
+        if session is not None:
+            return session
+        # Not in memory (e.g. after a restart): rebuild from the persisted state
+        for name in os.listdir(UPLOAD_DIR) if os.path.isdir(UPLOAD_DIR) else []:
+            if name.startswith(upload_id + "_") and name.endswith(".part.json"):
+                with open(os.path.join(UPLOAD_DIR, name), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                session = UploadSession(upload_id, meta["filename"], meta["size"], meta["offset"])
+                # Bytes past the last committed offset belong to an unfinished chunk
+                session.offset = min(session.offset, os.path.getsize(session.part_path))
+                _sessions[upload_id] = session
+                return session
+    return None
+
+
+def drop_session(upload_id: str):
+    with _sessions_lock:
+        _sessions.pop(upload_id, None)
@@ -0,0 +1,96 @@
+import os
+import uuid
+import socket
+import threading
+from .jobstore import job_store, LEASE_SECONDS, STATS_INTERVAL
+from .processing import process_job
+from .storage import storage
+from .metrics import registry
+from .cache import artifact_cache
+from .transcription_service import transcription_service
+
+POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "1.0"))
+
+
+def run_leased_job(job_id: str, config: dict, worker_id: str):
+    # Heartbeat while the job runs so other workers don't take it over
+    done = threading.Event()
+    lost = threading.Event()
+
+    def heartbeat():
+        while not done.wait(LEASE_SECONDS / 3):
+            if not job_store.heartbeat(job_id, worker_id):
+                # Another worker has (or will) run it; stop here without publishing or cleaning up
+                print(f"Worker {worker_id} lost the lease on job {job_id}")
+                lost.set()
+                return
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    try:
+        process_job(job_id, config, job_store, cancel=lost)
+    finally:
+        done.set()
+        if not lost.is_set():
+            job_store.finish(job_id, worker_id)
+            # The finished job's outputs just landed; keep uploads + outputs under the quota
+            storage.enforce_quota(job_store.active())
+
+
+def worker_loop(worker_id: str = None, stop: threading.Event = None):
+    """
+    Leases jobs from the store one at a time and runs them until `stop` is set.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    stop = stop or threading.Event()
+    print(f"Worker {worker_id} started")
+    while not stop.is_set():
+        leased = job_store.lease(worker_id)
+        if leased is None:
+            stop.wait(POLL_INTERVAL)
+            continue
+        job_id, config = leased
+        print(f"Worker {worker_id} running job {job_id}")
+        try:
+            run_leased_job(job_id, config, worker_id)
+        except Exception as e:
+            print(f"Worker {worker_id} crashed on job {job_id}: {e}")
+
+
+def start_workers(count: int, stop: threading.Event = None):
+    # In-process worker threads, used when the API runs without separate worker processes
+    # Scratch left by jobs that died with an earlier process
+    storage.sweep_scratch(job_store.active())
+    threads = []
+    for _ in range(count):
+        t = threading.Thread(target=worker_loop, kwargs={"stop": stop}, daemon=True)
+        t.start()
+        threads.append(t)
+    return threads
+
+
+def start_stats_reporter(stop: threading.Event = None, interval: float = STATS_INTERVAL):
+    """
+    Publishes this process's counters (stage metrics, cache and transcription stats) to the
+    job store every `interval` seconds. Separate worker processes serve no HTTP, so this is
+    how their numbers reach /metrics and the API's stats endpoints.
+    """
+    process_id = f"{socket.gethostname()}-{os.getpid()}"
+    stop = stop or threading.Event()
+
+    def report():
+        while True:
+            try:
+                job_store.publish_stats(process_id, {
+                    "metrics": registry.snapshot(),
+                    "cache": artifact_cache.stats(),
+                    "transcription": transcription_service.stats()
+                })
+            except Exception as e:
+                print(f"Publishing stats of {process_id} failed: {e}")
+            if stop.wait(interval):
+                return
+
+    t = threading.Thread(target=report, daemon=True, name="stats-reporter")
+    t.start()
+    return t
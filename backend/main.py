@@ -24,16 +24,60 @@ app.add_middleware(
 from api.endpoints import router as api_router
 app.include_router(api_router, prefix="/api")
 
-# Ensure temp directories exist
-os.makedirs("temp/uploads", exist_ok=True)
-os.makedirs("temp/output", exist_ok=True)
+# Upload, scratch and output directories are created by the storage manager
+from core.storage import storage, OUTPUT_DIR
+
+class PublishedFiles(StaticFiles):
+    # Serving a clip counts as use, so eviction removes what nobody downloads first
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            storage.touch(os.path.join(OUTPUT_DIR, path))
+        return response
+
+# Job workers running inside the API process. Set EMBEDDED_WORKERS=0 when jobs are
+# handled by separate `python worker.py` processes.
+EMBEDDED_WORKERS = int(os.getenv("EMBEDDED_WORKERS", "1"))
+
+@app.on_event("startup")
+def start_embedded_workers():
+    if EMBEDDED_WORKERS <= 0:
+        return
+    from core.worker import start_workers
+    start_workers(EMBEDDED_WORKERS)
+
+@app.on_event("startup")
+def fail_interrupted_ingests():
+    # URL downloads run inside this process; ones left over from a previous run are dead
+    from core.ingest import fail_stale_ingests
+    fail_stale_ingests()
+
+@app.on_event("startup")
+def warm_up_models():
+    # Load the Whisper model once in the background so the first captioned job
+    # doesn't pay the load cost. Set WHISPER_WARMUP=0 to skip.
+    if os.getenv("WHISPER_WARMUP", "1") == "0" or EMBEDDED_WORKERS <= 0:
+        return
+    import threading
+    from core.transcription import warm_up
+    threading.Thread(target=warm_up, daemon=True).start()
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text format: this process's totals plus those separate worker processes
+    # publish through the job store
+    from fastapi.responses import PlainTextResponse
+    from core.metrics import registry
+    from core.jobstore import job_store
+    others = [p["metrics"] for p in job_store.process_stats()]
+    return PlainTextResponse(registry.render(others), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def read_root():
     return {"message": "Local Shorts Generator API is running"}
 
 # Mount static directory for downloads
-app.mount("/static", StaticFiles(directory="temp/output"), name="static")
+app.mount("/static", PublishedFiles(directory=OUTPUT_DIR), name="static")
 
 # We will mount the frontend build later, or just run them separately for dev.
 # app.mount("/", StaticFiles(directory="../frontend/dist", html=True), name="static")
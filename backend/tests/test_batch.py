@@ -0,0 +1,40 @@
+import pytest
+import core.batch as batch
+from core.batch import plan_batch, batch_status
+
+
+def test_jobs_grouped_per_source_captioned_first():
+    sources = [{"video_path": "/a.mp4"}, {"video_path": "/b.mp4"}, {"video_path": "/a.mp4", "filename": "again"}]
+    specs = [{"captions": False}, {"captions": True}]
+    jobs = plan_batch(sources, specs)
+    assert [(j["video_path"], j["batch_item"]["spec"]) for j in jobs] == [
+        ("/a.mp4", 1), ("/a.mp4", 0), ("/a.mp4", 1), ("/a.mp4", 0), ("/b.mp4", 1), ("/b.mp4", 0)
+    ]
+    assert jobs[0]["filename"] == "a.mp4"
+    assert jobs[2]["filename"] == "again"
+
+
+def test_batch_size_limit(monkeypatch):
+    monkeypatch.setattr(batch, "MAX_BATCH_JOBS", 3)
+    with pytest.raises(ValueError):
+        plan_batch([{"video_path": "/a.mp4"}, {"video_path": "/b.mp4"}], [{}, {}])
+
+
+def test_status_aggregates_jobs():
+    record = {"batch_id": "b", "job_ids": ["1", "2", "3"]}
+    jobs = {
+        "1": {"status": "completed", "config": {"batch_item": {"source": 0, "spec": 0}}},
+        "2": {"status": "processing_1/2", "clip_status": ["done", "cutting"],
+              "config": {"batch_item": {"source": 0, "spec": 1}}},
+    }
+    status = batch_status(record, jobs)
+    assert status["status"] == "running"
+    assert status["counts"] == {"completed": 1, "running": 1, "failed": 1}
+    # The missing job counts as failed and finished
+    assert status["progress"] == round((1.0 + 0.5 + 1.0) / 3, 3)
+
+
+def test_status_with_failures():
+    record = {"job_ids": ["1", "2"]}
+    jobs = {"1": {"status": "completed"}, "2": {"status": "failed", "error": "boom"}}
+    assert batch_status(record, jobs)["status"] == "completed_with_errors"
@@ -0,0 +1,57 @@
+import os
+import pytest
+from core.cache import ArtifactCache, merge_cache_stats
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArtifactCache(str(tmp_path / "cache"), max_bytes=10)
+
+
+def write(path, data):
+    with open(path, "w") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_store_then_fetch(cache, tmp_path):
+    source = write(tmp_path / "a.mp4", "12345")
+    assert not cache.fetch("cut-1", str(tmp_path / "b.mp4"))
+    cache.store("cut-1", source)
+    assert cache.fetch("cut-1", str(tmp_path / "b.mp4"))
+    with open(tmp_path / "b.mp4") as f:
+        assert f.read() == "12345"
+    assert cache.stats() == {"hits": {"cut": 1}, "misses": {"cut": 1}}
+
+
+def test_fetch_replaces_an_existing_output(cache, tmp_path):
+    cache.store("cut-1", write(tmp_path / "a.mp4", "new"))
+    out = write(tmp_path / "b.mp4", "old")
+    assert cache.fetch("cut-1", out)
+    with open(out) as f:
+        assert f.read() == "new"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_least_recently_used_is_evicted(cache, tmp_path):
+    cache.store("cut-1", write(tmp_path / "a.mp4", "123456"))
+    os.utime(cache._path("cut-1", ".mp4"), (1, 1))
+    cache.store("cut-2", write(tmp_path / "b.mp4", "123456"))
+    assert not cache.contains("cut-1", ".mp4")
+    assert cache.contains("cut-2", ".mp4")
+
+
+def test_evicted_entry_is_a_miss(cache, tmp_path):
+    cache.store("cut-1", write(tmp_path / "a.mp4", "123"))
+    os.remove(cache._path("cut-1", ".mp4"))
+    assert not cache.fetch("cut-1", str(tmp_path / "b.mp4"))
+
+
+def test_key_depends_on_every_param():
+    assert ArtifactCache.key("src", "cut", start=1) != ArtifactCache.key("src", "cut", start=2)
+    assert ArtifactCache.key("src", "cut", start=1, end=2) == ArtifactCache.key("src", "cut", end=2, start=1)
+
+
+def test_merge_cache_stats():
+    merged = merge_cache_stats([{"hits": {"cut": 1}, "misses": {}}, {"hits": {"cut": 2, "srt": 1}, "misses": {"cut": 1}}])
+    assert merged == {"hits": {"cut": 3, "srt": 1}, "misses": {"cut": 1}}
@@ -0,0 +1,36 @@
+import numpy as np
+from core.highlights import pick_highlights, HOP_SECONDS
+
+
+def scores(source_duration, clip_duration, best):
+    # One score per window start hop; `best` maps start seconds -> score
+    width = int(round(clip_duration / HOP_SECONDS))
+    score = np.zeros(int(source_duration / HOP_SECONDS) - width + 1)
+    for start, value in best.items():
+        score[int(start / HOP_SECONDS)] = value
+    return score
+
+
+def test_adjacent_windows_are_not_excluded():
+    score = scores(180, 60, {60: 2.0, 0: 1.0})
+    assert pick_highlights(score, 60, 2, 180) == [(0.0, 60.0), (60.0, 120.0)]
+
+
+def test_fills_top_k_when_clips_fit_end_to_end():
+    score = scores(180, 60, {60: 2.0, 0: 1.0})
+    assert pick_highlights(score, 60, 3, 180) == [(0.0, 60.0), (60.0, 120.0), (120.0, 180.0)]
+
+
+def test_picks_never_overlap():
+    rng = np.random.default_rng(0)
+    clips = pick_highlights(rng.random(1000), 30, 8, 530)
+    assert len(clips) == 8
+    for (_, end), (start, _) in zip(clips, clips[1:]):
+        assert start >= end
+
+
+def test_snapped_start_stays_after_previous_clip():
+    # The only sentence end near the second pick lies inside the first clip
+    words = [{"start": 4.0, "end": 4.5, "word": "done."}]
+    score = scores(30, 6, {6: 2.0, 0: 1.0})
+    assert pick_highlights(score, 6, 2, 30, words) == [(0.0, 6.0), (6.0, 12.0)]
@@ -0,0 +1,67 @@
+import pytest
+import core.jobstore as jobstore
+from core.jobstore import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+def test_lease_order_is_priority_then_fifo(store):
+    store.create_many([("a", {"n": 1}, 0), ("b", {"n": 2}, 5), ("c", {"n": 3}, 0)])
+    assert [store.lease("w")[0] for _ in range(2)] == ["b", "a"]
+
+
+def test_lease_respects_concurrency_limit(store, monkeypatch):
+    monkeypatch.setattr(jobstore, "MAX_CONCURRENT_JOBS", 1)
+    store.create("a", {})
+    store.create("b", {})
+    assert store.lease("w1") == ("a", {})
+    assert store.lease("w2") is None
+
+
+def test_heartbeat_only_for_lease_owner(store):
+    store.create("a", {})
+    store.lease("w1")
+    assert store.heartbeat("a", "w1")
+    assert not store.heartbeat("a", "w2")
+
+
+def test_expired_lease_is_taken_over(store, monkeypatch):
+    store.create("a", {})
+    monkeypatch.setattr(jobstore, "LEASE_SECONDS", -1)
+    store.lease("w1")
+    assert store.lease("w2") == ("a", {})
+    # The first worker lost the job; its heartbeat and finish no longer apply
+    assert not store.heartbeat("a", "w1")
+    store["a"]["status"] = "completed"
+    store.finish("a", "w1")
+    assert store.ids_in_state("running") == ["a"]
+    store.finish("a", "w2")
+    assert store.ids_in_state("completed") == ["a"]
+
+
+def test_job_fails_after_max_attempts(store, monkeypatch):
+    monkeypatch.setattr(jobstore, "LEASE_SECONDS", -1)
+    monkeypatch.setattr(jobstore, "MAX_ATTEMPTS", 2)
+    store.create("a", {})
+    store.create("b", {})
+    leased = [store.lease("w")[0] for _ in range(3)]
+    assert leased == ["a", "a", "b"]
+    assert store.ids_in_state("failed") == ["a"]
+    assert store.get("a")["status"] == "failed"
+    assert "2 attempts" in store.get("a")["error"]
+
+
+def test_record_writes_through(store):
+    store.create("a", {"x": 1})
+    store["a"]["status"] = "processing"
+    assert store.get("a") == {"status": "processing", "config": {"x": 1}}
+    assert store.get_many(["a", "missing"]) == {"a": store.get("a")}
+
+
+def test_process_stats_drop_stale_entries(store):
+    store.publish_stats("w1", {"cache": {"hits": {}, "misses": {}}})
+    assert store.process_stats() == [{"cache": {"hits": {}, "misses": {}}}]
+    assert store.process_stats(max_age=-1) == []
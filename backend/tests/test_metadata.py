@@ -0,0 +1,60 @@
+import threading
+import time
+from core.metadata import MetadataService, StubBackend, FALLBACK
+
+
+class SlowBackend:
+    name = "slow"
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+
+    def generate(self, transcript):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {"title": transcript, "description": "", "hashtags": ""}
+
+
+class BrokenBackend:
+    name = "broken"
+
+    def generate(self, transcript):
+        raise RuntimeError("quota exceeded")
+
+
+def test_results_are_cached():
+    backend = SlowBackend(0)
+    service = MetadataService(backend, rate_per_minute=0)
+    assert service.generate("hello") == service.generate("hello")
+    assert backend.calls == 1
+    assert service.stats()["hits"] == 1
+
+
+def test_identical_requests_in_flight_are_coalesced():
+    backend = SlowBackend()
+    service = MetadataService(backend, rate_per_minute=0)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.generate("same"))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert backend.calls == 1
+    assert len(results) == 4 and all(r == results[0] for r in results)
+
+
+def test_rate_limit_spaces_calls():
+    service = MetadataService(SlowBackend(0), rate_per_minute=600) # one call per 0.1 s
+    start = time.monotonic()
+    for i in range(3):
+        service.generate(f"text {i}")
+    assert time.monotonic() - start >= 0.2
+
+
+def test_failures_fall_back_and_are_not_cached():
+    service = MetadataService(BrokenBackend(), rate_per_minute=0)
+    assert service.generate("x") == FALLBACK
+    service.set_backend(StubBackend())
+    assert service.generate("x")["title"] == "x"
+    assert service.stats()["failures"] == 1
@@ -0,0 +1,18 @@
+import pytest
+
+pytest.importorskip("faster_whisper")
+from core.processing import parse_time
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("", 0.0), (None, 0.0), (12, 12.0), ("90", 90.0), ("01:30", 90.0),
+    ("01:02:03.250", 3723.25), ("00:00:01,500", 1.5),
+])
+def test_parses(value, seconds):
+    assert parse_time(value) == seconds
+
+
+@pytest.mark.parametrize("value", ["abc", "1:2:3:4", "-5", "inf", "nan", "00:inf", float("inf"), -1])
+def test_rejects(value):
+    with pytest.raises(ValueError):
+        parse_time(value)
@@ -0,0 +1,72 @@
+import hashlib
+import pytest
+import core.uploads as uploads
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(uploads, "_sessions", {})
+    return tmp_path
+
+
+def append(session, offset, data, checksum=None):
+    snapshot, chunk_hasher = session.begin_chunk(offset)
+    with open(session.part_path, "r+b") as f:
+        f.seek(offset)
+        session.write(f, data, chunk_hasher)
+    session.end_chunk(len(data), snapshot, chunk_hasher, checksum)
+
+
+def test_chunks_must_arrive_at_the_offset():
+    session = uploads.create_session("clip.mp4")
+    append(session, 0, b"abc")
+    with pytest.raises(ValueError):
+        session.begin_chunk(0)
+    append(session, 3, b"def")
+    assert session.info()["offset"] == 6
+
+
+def test_bad_chunk_checksum_rolls_back():
+    session = uploads.create_session("clip.mp4")
+    append(session, 0, b"abc")
+    with pytest.raises(ValueError):
+        append(session, 3, b"def", checksum=hashlib.sha256(b"xyz").hexdigest())
+    assert session.offset == 3
+    append(session, 3, b"def", checksum=hashlib.sha256(b"def").hexdigest())
+    assert session.finalize(hashlib.sha256(b"abcdef").hexdigest()) == hashlib.sha256(b"abcdef").hexdigest()
+    with open(session.path, "rb") as f:
+        assert f.read() == b"abcdef"
+
+
+def test_resume_after_restart_drops_uncommitted_bytes():
+    session = uploads.create_session("My Clip.mp4", size=6)
+    append(session, 0, b"abc")
+    # An interrupted chunk left bytes past the committed offset
+    with open(session.part_path, "ab") as f:
+        f.write(b"zz")
+    uploads._sessions.clear()
+
+    resumed = uploads.get_session(session.id)
+    assert resumed is not session
+    assert resumed.offset == 3
+    append(resumed, 3, b"def")
+    assert resumed.finalize() == hashlib.sha256(b"abcdef").hexdigest()
+
+
+def test_finalize_rejects_incomplete_or_mismatched_uploads():
+    session = uploads.create_session("clip.mp4", size=6)
+    append(session, 0, b"abc")
+    with pytest.raises(ValueError):
+        session.finalize()
+    append(session, 3, b"def")
+    with pytest.raises(ValueError):
+        session.finalize(hashlib.sha256(b"other").hexdigest())
+
+
+def test_no_chunks_after_finalize():
+    session = uploads.create_session("clip.mp4")
+    append(session, 0, b"abc")
+    session.finalize()
+    with pytest.raises(ValueError):
+        session.begin_chunk(3)
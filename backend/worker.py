@@ -0,0 +1,23 @@
+import os
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Windows console encoding fix
+sys.stdout.reconfigure(encoding='utf-8')
+
+# Standalone job worker: python worker.py [num_threads]
+# Run as many of these as the host can take; MAX_CONCURRENT_JOBS caps the total across all of them.
+
+from core.worker import start_workers, start_stats_reporter # importing it sets up the temp directories
+
+if __name__ == "__main__":
+    if os.getenv("WHISPER_WARMUP", "1") != "0":
+        from core.transcription import warm_up
+        warm_up()
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    # This process has no HTTP server; the API serves its metrics from the job store
+    start_stats_reporter()
+    for t in start_workers(count):
+        t.join()
@@ -10,6 +10,7 @@ export default function JobConfig({ uploadData, onJobCreated }) {
     const [manualStart, setManualStart] = useState("00:00");
     const [manualEnd, setManualEnd] = useState("00:30");
     const [enhance4k, setEnhance4k] = useState(false);
+    const [reframe, setReframe] = useState(true);
 
     // Segments for Merge mode
     const [segments, setSegments] = useState([{ start: "00:00", end: "00:10" }]);
@@ -42,6 +43,7 @@ export default function JobConfig({ uploadData, onJobCreated }) {
                 manual_start: manualStart,
                 manual_end: manualEnd,
                 enhance_4k: enhance4k,
+                reframe: reframe,
                 merge_segments: segments
             };
             const res = await axios.post('http://localhost:8000/api/job', payload);
@@ -102,7 +104,7 @@ export default function JobConfig({ uploadData, onJobCreated }) {
                 {mode === 'manual' && (
                     <div className="grid grid-cols-2 gap-4">
                         <div>
-                            <label className="block text-gray-400 mb-2 font-medium text-xs">Start Time (MM:SS)</label>
+                            <label className="block text-gray-400 mb-2 font-medium text-xs">Start Time ([HH:]MM:SS[.mmm])</label>
                             <input
                                 type="text"
                                 value={manualStart}
@@ -112,7 +114,7 @@ export default function JobConfig({ uploadData, onJobCreated }) {
                             />
                         </div>
                         <div>
-                            <label className="block text-gray-400 mb-2 font-medium text-xs">End Time (MM:SS)</label>
+                            <label className="block text-gray-400 mb-2 font-medium text-xs">End Time ([HH:]MM:SS[.mmm])</label>
                             <input
                                 type="text"
                                 value={manualEnd}
@@ -176,6 +178,18 @@ export default function JobConfig({ uploadData, onJobCreated }) {
                 </label>
             </div>
 
+            <div className="mb-4 flex items-center bg-gray-700/50 p-3 rounded-lg border border-gray-600">
+                <input
+                    type="checkbox"
+                    checked={reframe}
+                    onChange={(e) => setReframe(e.target.checked)}
+                    className="w-5 h-5 text-blue-600 rounded focus:ring-blue-600 bg-gray-700 border-gray-600"
+                />
+                <label className="ml-3 text-gray-300 font-medium select-none cursor-pointer" onClick={() => setReframe(!reframe)}>
+                    📱 Vertical 9:16 (follow the action)
+                </label>
+            </div>
+
             <div className="mb-6 flex items-center bg-gray-700/50 p-3 rounded-lg border border-gray-600">
                 <input
                     type="checkbox"
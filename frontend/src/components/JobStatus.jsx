@@ -23,24 +23,42 @@ export default function JobStatus({ jobId, onReset }) {
     };
 
     useEffect(() => {
+        // Progress is pushed over server-sent events; fall back to polling if the stream fails
         let interval;
+        let source;
+        const update = (job) => {
+            setStatus(job.status);
+            setData(job);
+            return job.status === 'completed' || job.status === 'failed';
+        };
         const poll = async () => {
             try {
                 const res = await axios.get(`http://localhost:8000/api/job/${jobId}`);
-                setStatus(res.data.status);
-                setData(res.data);
-                if (res.data.status === 'completed' || res.data.status === 'failed') {
-                    clearInterval(interval);
-                }
+                if (update(res.data)) clearInterval(interval);
             } catch (err) {
                 console.error(err);
                 setError("Failed to fetch status");
             }
         };
 
-        poll(); // initial
-        interval = setInterval(poll, 2000);
-        return () => clearInterval(interval);
+        if (window.EventSource) {
+            source = new EventSource(`http://localhost:8000/api/job/${jobId}/events`);
+            source.onmessage = (event) => {
+                if (update(JSON.parse(event.data))) source.close();
+            };
+            source.onerror = () => {
+                source.close();
+                poll();
+                interval = setInterval(poll, 2000);
+            };
+        } else {
+            poll(); // initial
+            interval = setInterval(poll, 2000);
+        }
+        return () => {
+            if (source) source.close();
+            clearInterval(interval);
+        };
     }, [jobId]);
 
     return (
@@ -149,9 +167,27 @@ export default function JobStatus({ jobId, onReset }) {
                         )}
                     </div>
                 ) : (
-                    <div className="text-blue-400 flex flex-col items-center">
+                    <div className="text-blue-400 flex flex-col items-center w-full">
                         <Loader2 className="w-16 h-16 animate-spin mb-4" />
                         <p className="text-lg capitalize">{status.replace('_', ' ')}...</p>
+                        {data?.progress?.transcription?.percent != null && (
+                            <p className="text-sm text-gray-400 mt-2">
+                                Transcribing: {data.progress.transcription.percent}%
+                            </p>
+                        )}
+                        <div className="w-full mt-4 space-y-2">
+                            {Object.entries(data?.progress?.clips || {}).map(([clip, p]) => (
+                                <div key={clip} className="text-xs text-gray-400">
+                                    <div className="flex justify-between mb-1">
+                                        <span className="capitalize">Clip {clip} · {p.stage}</span>
+                                        <span>{p.percent}%</span>
+                                    </div>
+                                    <div className="w-full bg-gray-700 rounded-full h-1.5">
+                                        <div className="bg-blue-600 h-1.5 rounded-full" style={{ width: `${p.percent}%` }}></div>
+                                    </div>
+                                </div>
+                            ))}
+                        </div>
                     </div>
                 )}
             </div>
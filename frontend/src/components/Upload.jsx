@@ -9,18 +9,42 @@ export default function Upload({ onUploadComplete }) {
     const [url, setUrl] = useState('');
     const [progress, setProgress] = useState(0);
 
+    const CHUNK_SIZE = 8 * 1024 * 1024;
+    // Stop polling a URL download after this long
+    const INGEST_TIMEOUT_MS = 30 * 60 * 1000;
+
+    const sha256Hex = async (buffer) => {
+        const digest = await crypto.subtle.digest('SHA-256', buffer);
+        return Array.from(new Uint8Array(digest)).map((b) => b.toString(16).padStart(2, '0')).join('');
+    };
+
     const handleFile = async (file) => {
         if (!file) return;
         setUploading(true);
-        const formData = new FormData();
-        formData.append('file', file);
         try {
-            const res = await axios.post('http://localhost:8000/api/upload', formData, {
-                onUploadProgress: (progressEvent) => {
-                    const percentCompleted = Math.round((progressEvent.loaded * 100) / progressEvent.total);
-                    setProgress(percentCompleted);
+            // Chunked, resumable upload: each chunk goes at the server's committed offset,
+            // so a failed chunk is simply retried from there.
+            const init = await axios.post('http://localhost:8000/api/uploads', { filename: file.name, size: file.size });
+            const uploadId = init.data.upload_id;
+            let offset = 0;
+            let retries = 0;
+            while (offset < file.size) {
+                const chunk = await file.slice(offset, offset + CHUNK_SIZE).arrayBuffer();
+                try {
+                    const res = await axios.put(`http://localhost:8000/api/uploads/${uploadId}`, chunk, {
+                        params: { offset, checksum: await sha256Hex(chunk) },
+                        headers: { 'Content-Type': 'application/octet-stream' }
+                    });
+                    offset = res.data.offset;
+                    retries = 0;
+                } catch (err) {
+                    if (++retries > 5) throw err;
+                    const status = await axios.get(`http://localhost:8000/api/uploads/${uploadId}`);
+                    offset = status.data.offset;
                 }
-            });
+                setProgress(Math.round((offset * 100) / file.size));
+            }
+            const res = await axios.post(`http://localhost:8000/api/uploads/${uploadId}/finalize`, {});
             onUploadComplete(res.data);
         } catch (error) {
             console.error(error);
@@ -35,13 +59,28 @@ export default function Upload({ onUploadComplete }) {
         if (!url) return;
         setUploading(true);
         try {
+            // The download runs server-side as its own job; poll it until the file lands
             const res = await axios.post('http://localhost:8000/api/process-url', { url: url });
-            onUploadComplete(res.data);
+            const ingestId = res.data.ingest_id;
+            const deadline = Date.now() + INGEST_TIMEOUT_MS;
+            for (;;) {
+                if (Date.now() > deadline) throw new Error('Timed out waiting for the download');
+                await new Promise((resolve) => setTimeout(resolve, 1000));
+                const status = await axios.get(`http://localhost:8000/api/job/${ingestId}`);
+                const { downloaded_bytes, total_bytes } = status.data.progress || {};
+                if (total_bytes) setProgress(Math.round((downloaded_bytes * 100) / total_bytes));
+                if (status.data.status === 'completed') {
+                    onUploadComplete(status.data.result);
+                    break;
+                }
+                if (status.data.status === 'failed') throw new Error(status.data.error);
+            }
         } catch (error) {
             console.error(error);
             alert("Failed to process URL");
         } finally {
             setUploading(false);
+            setProgress(0);
         }
     };
 
@@ -123,7 +162,7 @@ export default function Upload({ onUploadComplete }) {
                         disabled={uploading || !url}
                         className="w-full bg-red-600 hover:bg-red-700 text-white font-bold py-3 px-4 rounded-lg transition-colors disabled:opacity-50 disabled:cursor-not-allowed flex items-center justify-center"
                     >
-                        {uploading ? <><Loader2 className="animate-spin mr-2 w-5 h-5" /> Downloading...</> : "Fetch & Process"}
+                        {uploading ? <><Loader2 className="animate-spin mr-2 w-5 h-5" /> Downloading... {progress > 0 && `${progress}%`}</> : "Fetch & Process"}
                     </button>
                 </div>
             )}
@@ -1,10 +1,15 @@
 @echo off
 echo Starting Local Shorts Generator...
 
-:: Start Backend
+:: Start Backend (jobs run in the separate worker process below)
 echo Starting Backend...
+set EMBEDDED_WORKERS=0
 start "Shorts Backend" cmd /k "cd backend && python -m uvicorn main:app --reload"
 
+:: Start Job Worker
+echo Starting Worker...
+start "Shorts Worker" cmd /k "cd backend && python worker.py"
+
 :: Start Frontend
 echo Starting Frontend...
 start "Shorts Frontend" cmd /k "cd frontend && npm run dev"